@@ -0,0 +1,60 @@
+"""add inventory stock levels
+
+Revision ID: 3b8d52c0e6f1
+Revises: a14e3987379f
+Create Date: 2026-02-12 10:04:27.551930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b8d52c0e6f1'
+down_revision: Union[str, Sequence[str], None] = 'a14e3987379f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('inventory_stock_levels',
+    sa.Column('inventory_item_id', sa.Integer(), nullable=False),
+    sa.Column('available_quantity', sa.Numeric(precision=14, scale=3), server_default='0', nullable=False),
+    sa.Column('near_expiry_quantity', sa.Numeric(precision=14, scale=3), server_default='0', nullable=False),
+    sa.Column('stock_value', sa.Numeric(precision=16, scale=4), server_default='0', nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('tenant_id', postgresql.UUID(as_uuid=True), nullable=False),
+    sa.ForeignKeyConstraint(['inventory_item_id'], ['inventory.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['tenant_id'], ['tenants.tenant_id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('inventory_item_id')
+    )
+    op.create_index(op.f('ix_inventory_stock_levels_tenant_id'), 'inventory_stock_levels', ['tenant_id'], unique=False)
+
+    # Backfill from the current batches
+    op.execute("""
+        INSERT INTO inventory_stock_levels
+            (tenant_id, inventory_item_id, available_quantity, near_expiry_quantity, stock_value)
+        SELECT
+            i.tenant_id,
+            i.id,
+            COALESCE(SUM(b.quantity_remaining) FILTER (WHERE b.lifecycle_stage IS DISTINCT FROM 'EXPIRED'), 0),
+            COALESCE(SUM(b.quantity_remaining) FILTER (WHERE b.lifecycle_stage = 'NEAR_EXPIRY'), 0),
+            COALESCE(SUM(b.quantity_remaining * COALESCE(b.unit_cost, 0))
+                     FILTER (WHERE b.lifecycle_stage IS DISTINCT FROM 'EXPIRED'), 0)
+        FROM inventory i
+        LEFT JOIN inventory_batches b
+            ON b.inventory_item_id = i.id
+           AND b.is_active = true
+           AND b.quantity_remaining > 0
+        GROUP BY i.tenant_id, i.id
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_inventory_stock_levels_tenant_id'), table_name='inventory_stock_levels')
+    op.drop_table('inventory_stock_levels')
@@ -0,0 +1,32 @@
+"""inventory keyset pagination index
+
+Revision ID: 4b8e1f2a9c07
+Revises: 9d4e2b7a1c63
+Create Date: 2026-02-20 09:41:18.552310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4b8e1f2a9c07'
+down_revision: Union[str, Sequence[str], None] = '9d4e2b7a1c63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination needs a non-null sort key
+    op.execute("UPDATE inventory SET date_added = COALESCE(updated_at, now()) WHERE date_added IS NULL")
+    op.alter_column('inventory', 'date_added', existing_type=sa.DateTime(), nullable=False, server_default=sa.text('now()'))
+    op.create_index('ix_inventory_tenant_date_added_id', 'inventory', ['tenant_id', 'date_added', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_tenant_date_added_id', table_name='inventory')
+    op.alter_column('inventory', 'date_added', existing_type=sa.DateTime(), nullable=True, server_default=None)
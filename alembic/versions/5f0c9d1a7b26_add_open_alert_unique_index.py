@@ -0,0 +1,48 @@
+"""add unique index on open inventory alerts
+
+Revision ID: 5f0c9d1a7b26
+Revises: 8e21f4a7c913
+Create Date: 2026-02-16 11:27:03.884512
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5f0c9d1a7b26'
+down_revision: Union[str, Sequence[str], None] = '8e21f4a7c913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Resolve duplicate open alerts left by the per-item sweep, keeping the oldest
+    op.execute("""
+        UPDATE inventory_alert
+        SET status = 'RESOLVED', resolved_at = now()
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY tenant_id, alert_type, inventory_item_id, COALESCE(batch_id, 0)
+                    ORDER BY created_at, id
+                ) AS rn
+                FROM inventory_alert
+                WHERE status IN ('ACTIVE', 'SNOOZED')
+            ) ranked
+            WHERE rn > 1
+        )
+    """)
+    op.execute("""
+        CREATE UNIQUE INDEX uq_inventory_alert_open
+        ON inventory_alert (tenant_id, alert_type, inventory_item_id, COALESCE(batch_id, 0))
+        WHERE status IN ('ACTIVE', 'SNOOZED')
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_inventory_alert_open', table_name='inventory_alert')
@@ -0,0 +1,45 @@
+"""trigram name search indexes
+
+Revision ID: 6c2d9e4f1a58
+Revises: 4b8e1f2a9c07
+Create Date: 2026-02-21 11:05:32.917264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6c2d9e4f1a58'
+down_revision: Union[str, Sequence[str], None] = '4b8e1f2a9c07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # GIN operator class for the leading tenant_id column
+    op.execute("CREATE EXTENSION IF NOT EXISTS btree_gin")
+    op.create_index(
+        'ix_inventory_tenant_name_trgm', 'inventory', ['tenant_id', 'name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_inventory_tenant_type_trgm', 'inventory', ['tenant_id', 'type'], unique=False,
+        postgresql_using='gin', postgresql_ops={'type': 'gin_trgm_ops'}
+    )
+    op.create_index(
+        'ix_dishes_tenant_name_trgm', 'dishes', ['tenant_id', 'name'], unique=False,
+        postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dishes_tenant_name_trgm', table_name='dishes')
+    op.drop_index('ix_inventory_tenant_type_trgm', table_name='inventory')
+    op.drop_index('ix_inventory_tenant_name_trgm', table_name='inventory')
+    # The extensions are left installed; other objects may depend on them
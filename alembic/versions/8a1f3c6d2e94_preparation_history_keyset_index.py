@@ -0,0 +1,44 @@
+"""preparation history keyset index
+
+Revision ID: 8a1f3c6d2e94
+Revises: 6c2d9e4f1a58
+Create Date: 2026-02-22 14:27:09.640183
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8a1f3c6d2e94'
+down_revision: Union[str, Sequence[str], None] = '6c2d9e4f1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination needs a non-null sort key
+    op.execute(
+        "UPDATE dish_preparation_batch_logs SET preparation_date = COALESCE(created_at, now()) "
+        "WHERE preparation_date IS NULL"
+    )
+    op.alter_column(
+        'dish_preparation_batch_logs', 'preparation_date',
+        existing_type=sa.DateTime(timezone=True), existing_server_default=sa.text('now()'), nullable=False
+    )
+    op.create_index(
+        'ix_dish_prep_logs_tenant_date_id', 'dish_preparation_batch_logs',
+        ['tenant_id', 'preparation_date', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dish_prep_logs_tenant_date_id', table_name='dish_preparation_batch_logs')
+    op.alter_column(
+        'dish_preparation_batch_logs', 'preparation_date',
+        existing_type=sa.DateTime(timezone=True), existing_server_default=sa.text('now()'), nullable=True
+    )
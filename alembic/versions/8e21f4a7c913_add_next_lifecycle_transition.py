@@ -0,0 +1,38 @@
+"""add next lifecycle transition to inventory batches
+
+Revision ID: 8e21f4a7c913
+Revises: 3b8d52c0e6f1
+Create Date: 2026-02-13 08:41:55.207316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e21f4a7c913'
+down_revision: Union[str, Sequence[str], None] = '3b8d52c0e6f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('inventory_batches', sa.Column('next_lifecycle_transition', sa.Date(), nullable=True))
+    op.create_index(op.f('ix_inventory_batches_next_lifecycle_transition'), 'inventory_batches', ['next_lifecycle_transition'], unique=False)
+
+    # Due today: the first scheduler run reclassifies every dated batch and
+    # stores its real next transition
+    op.execute("""
+        UPDATE inventory_batches
+        SET next_lifecycle_transition = CURRENT_DATE
+        WHERE expiry_date IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_inventory_batches_next_lifecycle_transition'), table_name='inventory_batches')
+    op.drop_column('inventory_batches', 'next_lifecycle_transition')
@@ -0,0 +1,28 @@
+"""add token_version to users
+
+Revision ID: 9d4e2b7a1c63
+Revises: e7b3f1c85a40
+Create Date: 2026-02-19 10:12:47.305118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2b7a1c63'
+down_revision: Union[str, Sequence[str], None] = 'e7b3f1c85a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'token_version')
@@ -0,0 +1,30 @@
+"""add version to stock batches
+
+Revision ID: a14e3987379f
+Revises: c7e20e276fb2
+Create Date: 2026-02-10 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a14e3987379f'
+down_revision: Union[str, Sequence[str], None] = 'c7e20e276fb2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('inventory_batches', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('pre_prepared_material_stock', sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('pre_prepared_material_stock', 'version')
+    op.drop_column('inventory_batches', 'version')
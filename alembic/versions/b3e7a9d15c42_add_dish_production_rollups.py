@@ -0,0 +1,72 @@
+"""add dish production rollups
+
+Revision ID: b3e7a9d15c42
+Revises: 8a1f3c6d2e94
+Create Date: 2026-02-23 16:48:55.201734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7a9d15c42'
+down_revision: Union[str, Sequence[str], None] = '8a1f3c6d2e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dish_production_rollups',
+        sa.Column('tenant_id', sa.UUID(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('dish_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('user_id', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('preparations_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('quantity_prepared', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('total_cost', sa.Numeric(precision=14, scale=2), server_default='0', nullable=False),
+        sa.Column('cost_per_unit_sum', sa.Numeric(precision=16, scale=4), server_default='0', nullable=False),
+        sa.Column('cost_per_unit_min', sa.Numeric(precision=12, scale=4), nullable=True),
+        sa.Column('cost_per_unit_max', sa.Numeric(precision=12, scale=4), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+        sa.ForeignKeyConstraint(['tenant_id'], ['tenants.tenant_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('tenant_id', 'bucket_start', 'dish_id', 'user_id')
+    )
+    op.create_index(op.f('ix_dish_production_rollups_tenant_id'), 'dish_production_rollups', ['tenant_id'], unique=False)
+    op.create_index(
+        'ix_dish_production_rollups_tenant_dish_bucket', 'dish_production_rollups',
+        ['tenant_id', 'dish_id', 'bucket_start'], unique=False
+    )
+
+    # Backfill every existing preparation into 15-minute UTC buckets
+    op.execute("""
+        INSERT INTO dish_production_rollups (
+            tenant_id, bucket_start, dish_id, user_id, preparations_count, quantity_prepared,
+            total_cost, cost_per_unit_sum, cost_per_unit_min, cost_per_unit_max
+        )
+        SELECT
+            tenant_id,
+            date_trunc('hour', preparation_date)
+                + make_interval(mins => (floor(extract(minute FROM preparation_date) / 15) * 15)::int),
+            COALESCE(dish_id, 0),
+            COALESCE(user_id, 0),
+            count(id),
+            sum(COALESCE(quantity_prepared, 0)),
+            sum(COALESCE(total_cost, 0)),
+            COALESCE(sum(COALESCE(total_cost, 0) / NULLIF(quantity_prepared, 0)), 0),
+            min(COALESCE(total_cost, 0) / NULLIF(quantity_prepared, 0)),
+            max(COALESCE(total_cost, 0) / NULLIF(quantity_prepared, 0))
+        FROM dish_preparation_batch_logs
+        GROUP BY 1, 2, 3, 4
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_dish_production_rollups_tenant_dish_bucket', table_name='dish_production_rollups')
+    op.drop_index(op.f('ix_dish_production_rollups_tenant_id'), table_name='dish_production_rollups')
+    op.drop_table('dish_production_rollups')
@@ -0,0 +1,38 @@
+"""add outbox columns to alert notifications
+
+Revision ID: c4a6e8b2d053
+Revises: 5f0c9d1a7b26
+Create Date: 2026-02-17 09:55:48.102377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a6e8b2d053'
+down_revision: Union[str, Sequence[str], None] = '5f0c9d1a7b26'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('alert_notifications', sa.Column('attempts', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('alert_notifications', sa.Column('next_attempt_at', sa.DateTime(), nullable=True))
+    op.create_index(
+        'ix_alert_notifications_pending',
+        'alert_notifications',
+        ['channel', 'next_attempt_at'],
+        unique=False,
+        postgresql_where=sa.text("status = 'pending'")
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_alert_notifications_pending', table_name='alert_notifications', postgresql_where=sa.text("status = 'pending'"))
+    op.drop_column('alert_notifications', 'next_attempt_at')
+    op.drop_column('alert_notifications', 'attempts')
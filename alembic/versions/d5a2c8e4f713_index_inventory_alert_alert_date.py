@@ -0,0 +1,36 @@
+"""index inventory alert alert_date
+
+Revision ID: d5a2c8e4f713
+Revises: b3e7a9d15c42
+Create Date: 2026-02-24 10:12:37.518206
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a2c8e4f713'
+down_revision: Union[str, Sequence[str], None] = 'b3e7a9d15c42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Time-window filters skip NULLs; older alerts fall back to their creation time
+    op.execute(
+        "UPDATE inventory_alert SET alert_date = COALESCE(created_at, now()) "
+        "WHERE alert_date IS NULL"
+    )
+    op.create_index(
+        'ix_inventory_alert_tenant_alert_date', 'inventory_alert',
+        ['tenant_id', 'alert_date'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_inventory_alert_tenant_alert_date', table_name='inventory_alert')
@@ -0,0 +1,28 @@
+"""add alert_ids to alert notifications
+
+Revision ID: e7b3f1c85a40
+Revises: c4a6e8b2d053
+Create Date: 2026-02-18 14:06:31.660245
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7b3f1c85a40'
+down_revision: Union[str, Sequence[str], None] = 'c4a6e8b2d053'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('alert_notifications', sa.Column('alert_ids', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('alert_notifications', 'alert_ids')
@@ -2,9 +2,11 @@
 app/api/deps.py
 Common dependencies for API routes
 """
-from typing import Generator
+from typing import AsyncGenerator, Generator
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from app.db.session import SessionLocal
+from app.db.routing import async_read_session, read_session
+from app.db.session import AsyncSessionLocal, SessionLocal, get_async_engine
 from fastapi import Depends, HTTPException
 from app.db.tenant import set_tenant ,get_current_tenant
 
@@ -25,6 +27,41 @@ def get_db() -> Generator:
         db.close()
 
 
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Async database session dependency (asyncpg)
+
+    Usage in routes:
+        @app.get("/items")
+        async def get_items(db: AsyncSession = Depends(get_async_db)):
+            result = await db.execute(select(Item))
+            ...
+    """
+    get_async_engine()
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_read_db() -> Generator:
+    """
+    Read-only session dependency: a read replica when one is configured and
+    within REPLICA_MAX_LAG_SECONDS, otherwise the primary. Opt in per
+    endpoint for reports and listings that tolerate slightly stale data;
+    never write through it.
+    """
+    db = read_session()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """get_read_db for async endpoints"""
+    async with await async_read_session() as db:
+        yield db
+
+
 def get_db_with_tenant(
     db: Session = Depends(get_db),
     tenant_id: int = Depends(get_current_tenant)
@@ -6,7 +6,10 @@ from app.schemas.common import ApiResponse
 from app.schemas.superadmin import LoginData, SuperAdminCreate, TokenResponse,LoginRequest
 from app.models import User, UserRole
 from app.api.deps import get_db
-from app.utils.auth_helper import create_access_token, validate_password,hash_password, verify_password
+from app.db.routing import replica_router
+from app.db.session import pool_stats
+from app.core.security import PasswordHasherBusy, get_password_hasher
+from app.utils.auth_helper import create_access_token, validate_password,hash_password, revoke_user_tokens, verify_and_update_password, require_super_admin
 from sqlalchemy.exc import SQLAlchemyError
 import logging
 
@@ -34,6 +37,15 @@ def create_super_admin(payload: SuperAdminCreate, db:Session = Depends(get_db)):
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+    try:
+        hashed_password = hash_password(payload.password)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password service busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+
     if db.query(User).filter(
         (User.email == payload.email) |
         (User.mobile_no == payload.mobile_no)
@@ -46,7 +58,7 @@ def create_super_admin(payload: SuperAdminCreate, db:Session = Depends(get_db)):
     super_admin = User(
         email=payload.email,
         mobile_no=payload.mobile_no,
-        hashed_password=hash_password(payload.password),
+        hashed_password=hashed_password,
         full_name=payload.full_name,
         role=UserRole.SUPER_ADMIN,
         is_active=True,
@@ -142,11 +154,26 @@ def superadmin_login(
                     detail="Inactive account"
                 )
             
-            if not verify_password(password, user.hashed_password):
+            stored_hash = user.hashed_password
+            # Hand the pooled connection back while argon2 runs; the user row
+            # is reloaded on first access below
+            db.rollback()
+
+            try:
+                password_ok, new_hash = verify_and_update_password(password, stored_hash)
+            except PasswordHasherBusy:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Too many login attempts in progress, please retry",
+                    headers={"Retry-After": "1"}
+                )
+
+            if not password_ok:
                 user.failed_login_attempts += 1
 
                 if user.failed_login_attempts >= MAX_FAILED_LOGIN_ATTEMPTS:
                     user.is_active = False
+                    revoke_user_tokens(user)
 
                 db.commit()    
 
@@ -162,6 +189,13 @@ def superadmin_login(
                         else f"Invalid credentials. {remaining} attempts remaining"
                     ),
                 )
+            if new_hash:
+                # Same password under the current argon2 parameters: written
+                # with a bulk update so it does not count as a password
+                # change and revoke the user's other sessions
+                db.query(User).filter(User.id == user.id).update(
+                    {User.hashed_password: new_hash}, synchronize_session=False
+                )
             user.failed_login_attempts = 0
             user.last_login = datetime.utcnow()
             db.commit()
@@ -171,6 +205,7 @@ def superadmin_login(
                     "sub":str(user.id),
                     "role":user.role.value,
                     "tenant_id": str(user.tenant_id) if user.tenant_id else None,
+                    "ver": user.token_version or 0,
                     "type": "access",
                 }
             )
@@ -203,6 +238,18 @@ def superadmin_login(
     #         detail="Login failed due to a server error"
     #     )
 
+@router.get("/password-hasher/stats")
+def password_hasher_stats(_: User = Depends(require_super_admin)):
+    """Queue depth and timings of this process's password hashing pool"""
+    return get_password_hasher().stats()
+
+
+@router.get("/db-pool/stats")
+def db_pool_stats(_: User = Depends(require_super_admin)):
+    """Checkout latency histogram, overflow and timeouts of this process's DB pools"""
+    return {**pool_stats(), "replica": replica_router.stats()}
+
+
 #unlock user
 # @router.post("/users/{user_id}/unlock")
 # def unlock_user(
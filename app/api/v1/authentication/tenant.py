@@ -3,6 +3,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.api.deps import get_db
+from app.core.security import PasswordHasherBusy
 from app.models.tenants import Tenant
 from app.models.users import User, UserRole
 from app.schemas.superadmin import TenantCreateWithUser, TenantSchema,TenantResponse
@@ -63,6 +64,14 @@ def create_tenant_with_admin(db: Session, payload: TenantCreateWithUser):
         # Business / validation errors
         raise
 
+    except PasswordHasherBusy:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Password service busy, please retry",
+            headers={"Retry-After": "1"}
+        )
+
     except IntegrityError:
         db.rollback()
         raise HTTPException(
@@ -1,89 +1,132 @@
 # app/api/v1/endpoints/alerts.py
 from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
+from uuid import UUID
 from datetime import datetime
 from app.api import deps
 from app.models.users import User
 from app.schemas.alert import AlertResponse, AlertUpdate, AlertFilter
 from app.services.alert_service import AlertService
-from app.models.inventory import InventoryAlert, AlertStatus, AlertType
+from app.services.tenant_timezone import get_tenant_zone_async
+from app.models.inventory import Inventory, InventoryAlert, AlertStatus, AlertType
 from app.utils.auth_helper import get_current_user
+from app.utils.time_windows import PERIODS, parse_period
 
 router = APIRouter()
 
+_ALERT_COLUMNS = [attr.key for attr in inspect(InventoryAlert).column_attrs]
+
+
+def _alert_list_statement(tenant_id):
+    """Alerts with their item name, which AlertResponse includes"""
+    return select(InventoryAlert, Inventory.name.label("inventory_item_name")).outerjoin(
+        Inventory, Inventory.id == InventoryAlert.inventory_item_id
+    ).where(
+        InventoryAlert.tenant_id == tenant_id
+    )
+
+
+async def _alert_window(db: AsyncSession, tenant_id, period: Optional[str], branch_id: Optional[UUID]):
+    """Local-day window of a `period` parameter, or None; unknown periods are a 400"""
+    if not period:
+        return None
+    try:
+        return parse_period(period, await get_tenant_zone_async(db, tenant_id, branch_id))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _alert_rows(rows) -> List[dict]:
+    return [
+        {**{key: getattr(alert, key) for key in _ALERT_COLUMNS}, "inventory_item_name": item_name}
+        for alert, item_name in rows
+    ]
+
+
 @router.get("/", response_model=List[AlertResponse])
-def get_alerts(
-    db: Session = Depends(deps.get_db),
+async def get_alerts(
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(get_current_user),
     status: Optional[AlertStatus] = None,
     alert_type: Optional[AlertType] = None,
     priority: Optional[str] = None,
+    period: Optional[str] = Query(None, description=f"Raised within: {', '.join(PERIODS)}"),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the period"),
     skip: int = 0,
     limit: int = 100
 ):
     """Get all alerts with optional filtering"""
-    query = db.query(InventoryAlert).filter(
-        InventoryAlert.tenant_id == current_user.tenant_id
-    )
+    statement = _alert_list_statement(current_user.tenant_id)
+    
+    window = await _alert_window(db, current_user.tenant_id, period, branch_id)
+    if window:
+        statement = statement.where(window.clause(InventoryAlert.alert_date))
     
     if status:
-        query = query.filter(InventoryAlert.status == status)
+        statement = statement.where(InventoryAlert.status == status)
     if alert_type:
-        query = query.filter(InventoryAlert.alert_type == alert_type)
+        statement = statement.where(InventoryAlert.alert_type == alert_type)
     if priority:
-        query = query.filter(InventoryAlert.priority == priority)
+        statement = statement.where(InventoryAlert.priority == priority)
     
-    alerts = query.order_by(
+    result = await db.execute(statement.order_by(
         InventoryAlert.priority.desc(),
         InventoryAlert.alert_date.desc()
-    ).offset(skip).limit(limit).all()
+    ).offset(skip).limit(limit))
     
-    return alerts
+    return _alert_rows(result.all())
 
 @router.get("/active", response_model=List[AlertResponse])
-def get_active_alerts(
-    db: Session = Depends(deps.get_db),
+async def get_active_alerts(
+    db: AsyncSession = Depends(deps.get_async_db),
     current_user: User = Depends(get_current_user)
 ):
     """Get all active alerts"""
-    alerts = db.query(InventoryAlert).filter(
-        InventoryAlert.tenant_id == current_user.tenant_id,
+    result = await db.execute(_alert_list_statement(current_user.tenant_id).where(
         InventoryAlert.status == AlertStatus.ACTIVE
     ).order_by(
         InventoryAlert.priority.desc(),
         InventoryAlert.alert_date.desc()
-    ).all()
+    ))
     
-    return alerts
+    return _alert_rows(result.all())
 
 @router.get("/stats")
-def get_alert_statistics(
-    db: Session = Depends(deps.get_db),
+async def get_alert_statistics(
+    period: Optional[str] = Query(None, description=f"Raised within: {', '.join(PERIODS)}"),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the period"),
+    db: AsyncSession = Depends(deps.get_async_read_db),
     current_user :User = Depends(get_current_user)
 ):
-    """Get alert statistics"""
-    from sqlalchemy import func
-    
-    stats = db.query(
+    """Get alert statistics, optionally for alerts raised within a period"""
+    statement = select(
         InventoryAlert.alert_type,
         InventoryAlert.status,
         func.count(InventoryAlert.id).label('count')
-    ).filter(
+    ).where(
         InventoryAlert.tenant_id == current_user.tenant_id
     ).group_by(
         InventoryAlert.alert_type,
         InventoryAlert.status
-    ).all()
+    )
+
+    window = await _alert_window(db, current_user.tenant_id, period, branch_id)
+    if window:
+        statement = statement.where(window.clause(InventoryAlert.alert_date))
+    result = await db.execute(statement)
     
     return {
+        "period": window.describe() if window else None,
         "statistics": [
             {
                 "alert_type": stat.alert_type.value,
                 "status": stat.status.value,
                 "count": stat.count
             }
-            for stat in stats
+            for stat in result.all()
         ]
     }
 
@@ -2,25 +2,54 @@
 app/api/v1/endpoints/dishes.py
 Dish management endpoints
 """
-from datetime import date, datetime, timedelta
+import json
+from datetime import datetime
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query,status
-from sqlalchemy import and_, extract, func
-from sqlalchemy.orm import Session,joinedload
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session,joinedload, selectinload
 from typing import List, Optional
 
-from app.api.deps import get_db
-from app.models.dish import Dish,DishType, DishIngredient, DishPreparationBatch , PrePreparedMaterial, PreparationBatchStatus,PreparationIngredientHistory,PrePreparedMaterialStock,IngredientForPrePreparedIngredients,DishPreparationBatchLog
+from app.api.deps import get_async_read_db, get_db, get_read_db
+from app.db.routing import async_read_session
+from app.models.dish import Dish,DishType, DishPreparationBatch , PrePreparedMaterial, PreparationBatchStatus,PreparationIngredientHistory,PrePreparedMaterialStock,IngredientForPrePreparedIngredients,DishPreparationBatchLog
 from app.models.inventory import Inventory
 from app.models.users import User
-from app.schemas.dish import AvailableBatchesResponse, BatchDishPreparation, BatchInfo, BatchPreparationResult, BulkDishIngredientAdd,DishCreate, DishIngredientOut,DishIngredientResponse, DishIngredientType, DishOut, DishTypeCreate, DishTypeOut,DishTypeUpdate,DishUpdate,AddDishIngredient,PreparationResult, ProduceSemiFinished,SemiFinishedProductCreate, SingleDishPreparation
-from app.services.dish_service import DishIngredientService, DishPreparationService, SemiFinishedService
+from app.schemas.dish import AvailableBatchesResponse, BatchDishPreparation, BatchInfo, BatchPreparationResult, BulkDishIngredientAdd,DishCreate, DishFeasibilityRequest, DishIngredientResponse, DishIngredientType, DishOut, DishTypeCreate, DishTypeUpdate,DishUpdate,AddDishIngredient,PreparationResult, ProduceSemiFinished,SemiFinishedProductCreate, SingleDishPreparation
+from app.services.dish_catalogue import catalogue_entry, get_catalogue
+from app.services.dish_service import PREPARATION_HISTORY_KEYSET, DishIngredientService, DishPreparationService, SemiFinishedService
+from app.services.production_rollup_service import ProductionRollupService
+from app.services.search_service import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, SearchService
+from app.services.stock_allocation_service import StockConflictError
+from app.services.tenant_timezone import get_tenant_zone, get_tenant_zone_async
 from app.utils.auth_helper import get_current_user
+from app.utils.pagination import decode_cursor
+from app.utils.time_windows import last_n_days, parse_period, to_utc
 from app.utils.response_helper import handle_db_exception
 from uuid import UUID
 
 router = APIRouter()
 
+# Rows per keyset page read by /history/stream
+HISTORY_STREAM_CHUNK_SIZE = 500
+# Dishes per page of GET /dishes (served from the cached catalogue)
+DISH_CATALOGUE_PAGE_SIZE = 500
+DISH_CATALOGUE_MAX_PAGE_SIZE = 1000
+# Retry-After (seconds) sent with 409 when a stock deduction lost its retries to concurrent preparations
+STOCK_CONFLICT_RETRY_AFTER_SECONDS = 1
+
+
+def _stock_conflict(e: StockConflictError) -> HTTPException:
+    """409 for a deduction that kept colliding with concurrent ones; the client may simply retry"""
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=str(e),
+        headers={"Retry-After": str(STOCK_CONFLICT_RETRY_AFTER_SECONDS)}
+    )
+
 @router.post("/add_dish_type",status_code=status.HTTP_201_CREATED)
 def add_dish_type(
     data: DishTypeCreate, 
@@ -189,9 +218,12 @@ def create_dish(
 @router.get("/dishes")
 def list_dishes(
     is_active: bool | None = Query(None),
+    limit: int = Query(DISH_CATALOGUE_PAGE_SIZE, ge=1, le=DISH_CATALOGUE_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user:User = Depends(get_current_user)
 ):
+    """Dish catalogue by name: each dish with its type and ingredients"""
     
     if not current_user.tenant_id:
         raise HTTPException(
@@ -199,14 +231,19 @@ def list_dishes(
                 detail="Tenant access required",
             )
     try:
-        data = db.query(Dish).options(joinedload(Dish.type))
-        if is_active is not None:
-            data = data.filter(Dish.is_active == is_active)
-        response = data.all()
+        catalogue = get_catalogue(db, current_user.tenant_id, is_active)
+        page = catalogue[offset:offset + limit]
 
         return {
             "Success":True,
-            "data":response
+            "data":page,
+            "pagination": {
+                "total": len(catalogue),
+                "limit": limit,
+                "offset": offset,
+                "returned": len(page),
+                "has_more": offset + len(page) < len(catalogue)
+            }
         }
 
     except Exception as e:
@@ -511,6 +548,9 @@ def get_batch_suggestions_for_ingredient(
     ingredient_id: int,
     quantity_required: float,
     unit: str = "gm",
+    include_details: bool = Query(True, description="Include per-batch suggestions"),
+    limit: Optional[int] = Query(None, ge=1, description="Max suggestions to return"),
+    offset: int = Query(0, ge=0, description="Suggestions to skip"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -520,6 +560,7 @@ def get_batch_suggestions_for_ingredient(
     Handles insufficient quantity
     Uses lifecycle from DB
     Provides allocation plan
+    Per-batch suggestions can be paged (limit/offset) or skipped (include_details=false)
     """
     
     # NEW: Function now returns a dict, not a list
@@ -528,11 +569,14 @@ def get_batch_suggestions_for_ingredient(
         tenant_id=current_user.tenant_id,
         ingredient_id=ingredient_id,
         quantity_required=quantity_required,
-        unit=unit
+        unit=unit,
+        include_suggestions=include_details,
+        suggestions_limit=limit,
+        suggestions_offset=offset
     )
     
     # Check if ingredient was found
-    if not result.get("suggestions"):
+    if not result.get("total_batches"):
         return {
             "success": False,
             "message": result["warnings"][0] if result.get("warnings") else "No available batches",
@@ -636,6 +680,8 @@ def produce_semi_finished_batch(
             **result
         }
         
+    except StockConflictError as e:
+        raise _stock_conflict(e)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -807,6 +853,8 @@ def prepare_single_dish(
             }
         }
         
+    except StockConflictError as e:
+        raise _stock_conflict(e)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -985,6 +1033,8 @@ def prepare_batch_of_dishes(
             }
         }
         
+    except StockConflictError as e:
+        raise _stock_conflict(e)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -996,27 +1046,98 @@ def prepare_batch_of_dishes(
             detail=f"Failed to prepare batch: {str(e)}"
         )
 
+@router.post("/feasibility", response_model=dict)
+def check_dish_feasibility(
+    request: DishFeasibilityRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Dry run: can these dishes be cooked with the current stock?
+    Nothing is deducted or written.
+    
+    **Example Request:**
+```json
+    {
+      "items": [
+        {"dish_id": 5, "quantity": 10},
+        {"dish_id": 7, "quantity": 8}
+      ]
+    }
+```
+    
+    **Response (per dish):**
+    - Maximum quantity that can be prepared
+    - Binding (limiting) ingredient
+    - Shortages for the requested quantity
+    """
+    try:
+        result = DishPreparationService.check_feasibility(
+            db=db,
+            tenant_id=current_user.tenant_id,
+            items=request.items
+        )
+        
+        return {
+            "success": True,
+            "message": (
+                "All requested dishes can be prepared"
+                if result["can_prepare_all"]
+                else "Insufficient stock for some of the requested dishes"
+            ),
+            "data": result
+        }
+        
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check feasibility: {str(e)}"
+        )
+
+def _history_range(zone, period: Optional[str], start_date: Optional[datetime], end_date: Optional[datetime]):
+    """
+    UTC [start, end) of a history request: a named period of local days, or
+    start_date/end_date with naive values read as the tenant's local time
+    """
+    if period:
+        if start_date or end_date:
+            raise ValueError("Use either period or start_date/end_date")
+        window = parse_period(period, zone)
+        return window.start, window.end
+    return (
+        to_utc(start_date, zone) if start_date else None,
+        to_utc(end_date, zone) if end_date else None
+    )
+
+
 @router.get("/history", response_model=dict)
-def get_preparation_history(
+async def get_preparation_history(
     dish_id: Optional[int] = Query(None, description="Filter by dish ID"),
     user_id: Optional[int] = Query(None, description="Filter by chef/user ID"),
-    start_date: Optional[datetime] = Query(None, description="Filter from date (ISO format)"),
-    end_date: Optional[datetime] = Query(None, description="Filter to date (ISO format)"),
+    period: Optional[str] = Query(None, description="today, yesterday, this_week, last_week or last_<n>_days"),
+    start_date: Optional[datetime] = Query(None, description="Filter from date, inclusive (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter to date, exclusive (ISO format)"),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the dates (default: the tenant's)"),
     limit: int = Query(100, ge=1, le=500, description="Maximum records to return"),
-    offset: int = Query(0, ge=0, description="Number of records to skip"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="pagination.next_cursor of the previous page"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    Get preparation history with optional filters
+    Get preparation history with optional filters, newest first
     
     **Query Parameters:**
     - `dish_id`: Filter by specific dish
     - `user_id`: Filter by specific chef
-    - `start_date`: From date (e.g., 2026-01-20T00:00:00)
-    - `end_date`: To date (e.g., 2026-01-24T23:59:59)
+    - `period`: Whole local days (today, yesterday, this_week, last_week, last_7_days, ...)
+    - `start_date`: From date, inclusive (e.g., 2026-01-20T00:00:00)
+    - `end_date`: To date, exclusive (e.g., 2026-01-25T00:00:00)
+    - `branch_id`: Branch whose timezone applies to `period` and to dates without an offset
     - `limit`: Max records (default: 100, max: 500)
-    - `offset`: Skip records (for pagination)
+    - `cursor`: Continue after the previous page (`pagination.next_cursor`)
+    
+    Summary figures cover the returned page. For a full export use
+    `/history/stream`.
     
     **Examples:**
 ```
@@ -1024,48 +1145,53 @@ def get_preparation_history(
     GET /dish-preparation/history?dish_id=5&limit=50
     
     # Get today's preparations
-    GET /dish-preparation/history?start_date=2026-01-24T00:00:00&end_date=2026-01-24T23:59:59
+    GET /dish-preparation/history?period=today
+    
+    # Get preparations of 24 January (tenant local time)
+    GET /dish-preparation/history?start_date=2026-01-24T00:00:00&end_date=2026-01-25T00:00:00
     
     # Get preparations by chef Ramesh
     GET /dish-preparation/history?user_id=42
     
-    # Pagination (page 2, 20 per page)
-    GET /dish-preparation/history?limit=20&offset=20
+    # Next page
+    GET /dish-preparation/history?limit=20&cursor=<pagination.next_cursor>
 ```
     """
     try:
-        history = DishPreparationService.get_preparation_history(
+        zone = await get_tenant_zone_async(db, current_user.tenant_id, branch_id)
+        start_date, end_date = _history_range(zone, period, start_date, end_date)
+        page = await DishPreparationService.get_preparation_history_async(
             db=db,
             tenant_id=current_user.tenant_id,
             dish_id=dish_id,
             user_id=user_id,
             start_date=start_date,
             end_date=end_date,
+            cursor=cursor,
             limit=limit
         )
+        history = page.items
         
         # Calculate summary statistics
         total_preparations = len(history)
-        total_dishes = sum(h["quantity_prepared"] for h in history)
+        total_dishes = sum(h["quantity_prepared"] or 0 for h in history)
         total_cost = sum(h["total_cost"] for h in history)
         
-        # Apply offset for pagination
-        paginated_history = history[offset:offset + limit] if offset < len(history) else []
-        
         return {
             "success": True,
             "filters": {
                 "dish_id": dish_id,
                 "user_id": user_id,
+                "period": period,
+                "timezone": zone.key,
                 "start_date": start_date,
                 "end_date": end_date
             },
             "pagination": {
-                "total": total_preparations,
                 "limit": limit,
-                "offset": offset,
-                "returned": len(paginated_history),
-                "has_more": (offset + len(paginated_history)) < total_preparations
+                "returned": total_preparations,
+                "has_more": page.next_cursor is not None,
+                "next_cursor": page.next_cursor
             },
             "summary": {
                 "total_preparations": total_preparations,
@@ -1078,15 +1204,65 @@ def get_preparation_history(
                     total_dishes / total_preparations, 2
                 ) if total_preparations > 0 else 0
             },
-            "data": paginated_history
+            "data": history
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to fetch preparation history: {str(e)}"
         )
 
+@router.get("/history/stream")
+async def stream_preparation_history(
+    dish_id: Optional[int] = Query(None, description="Filter by dish ID"),
+    user_id: Optional[int] = Query(None, description="Filter by chef/user ID"),
+    period: Optional[str] = Query(None, description="today, yesterday, this_week, last_week or last_<n>_days"),
+    start_date: Optional[datetime] = Query(None, description="Filter from date, inclusive (ISO format)"),
+    end_date: Optional[datetime] = Query(None, description="Filter to date, exclusive (ISO format)"),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the dates (default: the tenant's)"),
+    cursor: Optional[str] = Query(None, description="Resume after a previous page's next_cursor"),
+    max_rows: Optional[int] = Query(None, ge=1, description="Stop after this many records"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Preparation history as newline-delimited JSON, one record per line,
+    newest first. Records are read in keyset pages of
+    HISTORY_STREAM_CHUNK_SIZE, so memory use does not grow with the number
+    of rows streamed.
+    """
+    if not current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tenant access required"
+        )
+    tenant_id = current_user.tenant_id
+    try:
+        if cursor:
+            decode_cursor(cursor, PREPARATION_HISTORY_KEYSET)
+        async with await async_read_session() as db:
+            zone = await get_tenant_zone_async(db, tenant_id, branch_id)
+        start_date, end_date = _history_range(zone, period, start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def lines():
+        # Own session: it has to outlive the request handler while the body streams
+        async with await async_read_session() as db:
+            async for entry in DishPreparationService.iter_preparation_history_async(
+                db, tenant_id, dish_id, user_id, start_date, end_date, cursor,
+                chunk_size=HISTORY_STREAM_CHUNK_SIZE, max_rows=max_rows
+            ):
+                yield json.dumps(jsonable_encoder(entry)) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.get("/preparations/{preparation_id}", response_model=dict)
 def get_preparation_details(
     preparation_id: int,
@@ -1195,95 +1371,60 @@ def get_preparation_details(
 
 #api for how many dish prepared in the day
 @router.get("/today-report", response_model=dict)
-def get_today_production_report(
-    db: Session = Depends(get_db),
+async def get_today_production_report(
+    period: str = Query("today", description="today, yesterday, this_week, last_week or last_<n>_days"),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the day (default: the tenant's)"),
+    db: AsyncSession = Depends(get_async_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
     Get comprehensive production report for today
     
+    "Today" is the tenant's local day (its branch timezone), or any other
+    `period` of whole local days.
+    
     **Includes:**
     - Total dishes prepared
     - Cost breakdown by dish
     - Chef performance
-    - Peak hours analysis
+    - Peak hours analysis (local hours)
     - Most popular dishes
     
     **Example:**
 ```
     GET /dish-preparation/today-report
+    GET /dish-preparation/today-report?period=this_week
 ```
     """
     try:
-        today = date.today()
-        
-        # Get all today's preparations
-        preparations = db.query(DishPreparationBatchLog).filter(
-            and_(
-                DishPreparationBatchLog.tenant_id == current_user.tenant_id,
-                func.date(DishPreparationBatchLog.preparation_date) == today
-            )
-        ).all()
+        tenant_id = current_user.tenant_id
+        zone = await get_tenant_zone_async(db, tenant_id, branch_id)
+        window = parse_period(period, zone)
+        day_start, day_end = window.start, window.end
+
+        # Served from the production rollup: cost depends on the buckets in the day, not the preparations
+        totals = (await db.execute(ProductionRollupService.totals_statement(tenant_id, day_start, day_end))).one()
         
         # Summary statistics
-        total_preparations = len(preparations)
-        total_dishes = sum(p.quantity_prepared for p in preparations)
-        total_cost = sum(float(p.total_cost) for p in preparations)
+        total_preparations = int(totals.total_preparations)
+        total_dishes = int(totals.total_quantity)
+        total_cost = float(totals.total_cost)
         
         # By dish breakdown
-        dish_stats = db.query(
-            Dish.id,
-            Dish.name,
-            # Dish.category,
-            func.sum(DishPreparationBatchLog.quantity_prepared).label('total_prepared'),
-            func.sum(DishPreparationBatchLog.total_cost).label('total_cost'),
-            func.count(DishPreparationBatchLog.id).label('preparations_count')
-        ).join(
-            DishPreparationBatchLog, Dish.id == DishPreparationBatchLog.dish_id
-        ).filter(
-            and_(
-                DishPreparationBatchLog.tenant_id == current_user.tenant_id,
-                func.date(DishPreparationBatchLog.preparation_date) == today
-            )
-        ).group_by(Dish.id, Dish.name).order_by(
-            func.sum(DishPreparationBatchLog.quantity_prepared).desc()
-        ).all()
+        dish_stats = (await db.execute(ProductionRollupService.by_dish_statement(tenant_id, day_start, day_end))).all()
         
         # By chef breakdown
-        chef_stats = db.query(
-            User.id,
-            User.full_name,
-            func.count(DishPreparationBatchLog.id).label('preparations_count'),
-            func.sum(DishPreparationBatchLog.quantity_prepared).label('total_dishes'),
-            func.sum(DishPreparationBatchLog.total_cost).label('total_cost')
-        ).join(
-            DishPreparationBatchLog, User.id == DishPreparationBatchLog.user_id
-        ).filter(
-            and_(
-                DishPreparationBatchLog.tenant_id == current_user.tenant_id,
-                func.date(DishPreparationBatchLog.preparation_date) == today
-            )
-        ).group_by(User.id, User.full_name).order_by(
-            func.sum(DishPreparationBatchLog.quantity_prepared).desc()
-        ).all()
+        chef_stats = (await db.execute(ProductionRollupService.by_chef_statement(tenant_id, day_start, day_end))).all()
         
         # Peak hours
-        peak_hours = db.query(
-            extract('hour', DishPreparationBatchLog.preparation_date).label('hour'),
-            func.count(DishPreparationBatchLog.id).label('preparations'),
-            func.sum(DishPreparationBatchLog.quantity_prepared).label('dishes')
-        ).filter(
-            and_(
-                DishPreparationBatchLog.tenant_id == current_user.tenant_id,
-                func.date(DishPreparationBatchLog.preparation_date) == today
-            )
-        ).group_by('hour').order_by(
-            func.sum(DishPreparationBatchLog.quantity_prepared).desc()
-        ).limit(5).all()
+        peak_hours = (await db.execute(
+            ProductionRollupService.peak_hours_statement(tenant_id, day_start, day_end, zone=zone)
+        )).all()
         
         return {
             "success": True,
-            "date": today,
+            "date": window.first_day,
+            "period": window.describe(),
             "summary": {
                 "total_preparations": total_preparations,
                 "total_dishes_prepared": total_dishes,
@@ -1333,6 +1474,11 @@ def get_today_production_report(
             ]
         }
         
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -1447,7 +1593,8 @@ def get_batch_details(
 def get_dish_preparation_statistics(
     dish_id: int,
     days: int = Query(30, ge=1, le=365, description="Number of days to analyze"),
-    db: Session = Depends(get_db),
+    branch_id: Optional[UUID] = Query(None, description="Branch whose timezone defines the days (default: the tenant's)"),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_user)
 ):
     """
@@ -1469,7 +1616,8 @@ def get_dish_preparation_statistics(
 ```
     """
     try:
-        start_date = datetime.now() - timedelta(days=days)
+        # The last `days` local days, today included
+        window = last_n_days(get_tenant_zone(db, current_user.tenant_id, branch_id), days)
         
         # Get dish
         dish = db.query(Dish).filter(
@@ -1485,21 +1633,13 @@ def get_dish_preparation_statistics(
                 detail=f"Dish with ID {dish_id} not found"
             )
         
-        # Get statistics
-        stats = db.query(
-            func.count(DishPreparationBatchLog.id).label('total_preparations'),
-            func.sum(DishPreparationBatchLog.quantity_prepared).label('total_quantity'),
-            func.sum(DishPreparationBatchLog.total_cost).label('total_cost'),
-            func.avg(DishPreparationBatchLog.total_cost / DishPreparationBatchLog.quantity_prepared).label('avg_cost_per_unit'),
-            func.min(DishPreparationBatchLog.total_cost / DishPreparationBatchLog.quantity_prepared).label('min_cost_per_unit'),
-            func.max(DishPreparationBatchLog.total_cost / DishPreparationBatchLog.quantity_prepared).label('max_cost_per_unit')
-        ).filter(
-            and_(
-                DishPreparationBatchLog.tenant_id == current_user.tenant_id,
-                DishPreparationBatchLog.dish_id == dish_id,
-                DishPreparationBatchLog.preparation_date >= start_date
-            )
-        ).first()
+        # Get statistics (from the production rollup, at 15-minute granularity)
+        stats = db.execute(ProductionRollupService.totals_statement(
+            current_user.tenant_id, window.start, window.end, dish_id=dish_id
+        )).one()
+        avg_cost_per_unit = (
+            stats.cost_per_unit_sum / stats.total_preparations if stats.total_preparations else None
+        )
         
         return {
             "success": True,
@@ -1510,14 +1650,15 @@ def get_dish_preparation_statistics(
             },
             "period": {
                 "days": days,
-                "start_date": start_date,
-                "end_date": datetime.now()
+                "start_date": window.start,
+                "end_date": window.end,
+                **window.describe()
             },
             "statistics": {
                 "total_preparations": stats.total_preparations or 0,
                 "total_quantity_prepared": stats.total_quantity or 0,
                 "total_cost": round(float(stats.total_cost), 2) if stats.total_cost else 0,
-                "average_cost_per_unit": round(float(stats.avg_cost_per_unit), 2) if stats.avg_cost_per_unit else 0,
+                "average_cost_per_unit": round(float(avg_cost_per_unit), 2) if avg_cost_per_unit else 0,
                 "min_cost_per_unit": round(float(stats.min_cost_per_unit), 2) if stats.min_cost_per_unit else 0,
                 "max_cost_per_unit": round(float(stats.max_cost_per_unit), 2) if stats.max_cost_per_unit else 0,
                 "average_quantity_per_preparation": round(
@@ -1576,57 +1717,15 @@ def get_dish_preparation_statistics(
 #     return {"message": f"Dish '{request.name}' added successfully with ingredients."}
 
 
-@router.get("/dishes", response_model=List[DishOut])
-def list_dishes(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-                ):
-    
-
-    if not current_user.tenant_id:
-        raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Tenant access required",
-            )
-
-    dishes = db.query(Dish).all()
-    result = []
-
-    for dish in dishes:
-        # Get the dish type name
-        dish_type = db.query(DishType).filter(DishType.id == dish.type_id).first()
-
-        # Get all ingredients for this dish
-        ingredients = db.query(DishIngredient).filter(DishIngredient.dish_id == dish.id).all()
-
-        # Convert DishIngredient DB entries to response models
-        ingredient_list = [
-            DishIngredientOut(
-                ingredient_name=di.ingredient_name,
-                quantity_required=di.quantity_required,
-                unit=di.unit,
-                cost_per_unit=di.cost_per_unit
-            )
-            for di in ingredients if di.ingredient_name is not None
-        ]
-
-        # Append formatted dish to result
-        result.append(DishOut(
-            id=dish.id,
-            name=dish.name,
-            type=dish_type.name if dish_type else "Unknown",
-            ingredients=ingredient_list
-        ))
-
-    return result
-
-
 @router.get("/dishes/by_name", response_model=List[DishOut])
 def search_dishes_by_name(
-    partial_name: str, 
+    partial_name: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
     ):
+    """Dishes ranked by how well their name matches partial_name (prefixes and small typos match)"""
 
     if not current_user.tenant_id:
         raise HTTPException(
@@ -1634,41 +1733,15 @@ def search_dishes_by_name(
                 detail="Tenant access required",
             )
     
-    matched_dishes = db.query(Dish).filter(
-        Dish.name.ilike(f"%{partial_name}%")
-    ).all()
+    statement = SearchService.name_search_statement(
+        Dish, current_user.tenant_id, partial_name, limit, offset
+    ).options(joinedload(Dish.type), selectinload(Dish.dish_ingredient))
+    matched_dishes = db.execute(statement).scalars().all()
 
     if not matched_dishes:
         raise HTTPException(status_code=404, detail="No matching dishes found")
 
-    result = []
-    for dish in matched_dishes:
-        dish_type = db.query(DishType).filter(DishType.id == dish.type_id).first()
-        ingredients = db.query(DishIngredient).filter(DishIngredient.dish_id == dish.id).all()
-
-        ingredient_list = [
-            DishIngredientOut(
-                ingredient_name=di.ingredient_name,
-                quantity_required=di.quantity_required,
-                unit=di.unit,
-                cost_per_unit=di.cost_per_unit
-            )
-            for di in ingredients if di.ingredient_name is not None
-        ]
-
-        result.append(DishOut(
-            id=dish.id,
-            name=dish.name,
-            tenant_id=dish.tenant_id,
-            type_id=dish.type_id,
-            type=DishTypeOut(
-                id=dish.type.id,
-                name=dish.type.name
-            ),
-            ingredients=ingredient_list
-        ))
-
-    return result
+    return [catalogue_entry(dish) for dish in matched_dishes]
 
 
 # @router.delete("/dishes/{dish_name}")
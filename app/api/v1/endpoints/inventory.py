@@ -4,22 +4,26 @@ Inventory management endpoints
 """
 from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException, Query , status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, datetime
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from pydantic import BaseModel
-from app.api.deps import get_db
+from app.api.deps import get_async_db, get_db
 from app.models.expense import Expense
 from app.models.inventory import Inventory, InventoryBatch, InventoryTransaction,ItemCategory, StorageLocation, TransactionType
 from app.models.users import User
 from app.schemas.batch import BatchCreate
-from app.schemas.inventory import InventoryListResponse, InventoryOut, InventoryResponse,InventoryUpdate,InventoryItemCreate, ItemCategoryListResponseAll, ItemCategoryOut,ItemPerishableNonPerishable,ItemCategoryCreate,ItemCategoryUpdate,ItemCategoryResponse
-from app.services.inventory_service import InventoryService
+from app.schemas.inventory import InventoryLookupResponse, InventoryOut, InventoryPageResponse, InventoryResponse,InventoryUpdate,InventoryItemCreate, ItemCategoryListResponseAll, ItemCategoryOut,ItemPerishableNonPerishable,ItemCategoryCreate,ItemCategoryUpdate,ItemCategoryResponse
+from app.services.inventory_service import INVENTORY_KEYSET, InventoryService
+from app.services.search_service import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT
+from app.services.stock_level_service import StockLevelService
 from app.schemas.inventory_storage import StorageLocationCreate,StorageLocationUpdate,StorageLocationResponse
 from app.utils.auth_helper import get_current_user,get_tanant_scope
 from app.schemas.common import ApiResponse
-from app.utils.inventory_batch_helper import calculate_days_until_expiry, determine_lifecycle_stage, generate_batch_number_sequential
+from app.utils.inventory_batch_helper import calculate_days_until_expiry, determine_lifecycle_stage, generate_batch_number_sequential, next_lifecycle_transition
+from app.utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, keyset_paginate
 from app.utils.response_helper import success_response
 from app.tasks import update_batch_lifecycles_status
 
@@ -145,9 +149,19 @@ def add_item(
             detail="Failed to add inventory item",
         )
     
-@router.get("/", response_model=InventoryListResponse)
-def get_all_inventory(
-    db: Session = Depends(get_db),
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Comma separated ?fields= value; None selects every listable field"""
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(",") if name.strip()] or None
+
+
+@router.get("/", response_model=InventoryPageResponse)
+async def get_all_inventory(
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,name,quantity"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user)
     ):
 
@@ -158,16 +172,28 @@ def get_all_inventory(
         )
     
     try:
-       inventory =( db.query(Inventory).filter(Inventory.tenant_id == current_user.tenant_id).all())
+       field_names = _parse_fields(fields)
+       statement = keyset_paginate(
+           InventoryService.list_statement(current_user.tenant_id, field_names), INVENTORY_KEYSET, cursor, limit
+       )
+       page = InventoryService.page((await db.execute(statement)).all(), limit, field_names)
 
        return {
             "success": True,
             "message": "Inventory fetched successfully",
-            "data": inventory,
+            "data": page.items,
+            "next_cursor": page.next_cursor,
+            "limit": page.limit,
        }
     except HTTPException:
         raise
 
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
     except Exception as e:
         print("GET INVENTORY", e)
         raise HTTPException(
@@ -175,13 +201,16 @@ def get_all_inventory(
             detail="Failed to fetch inventory",
         )
 
-@router.get("/search", response_model=InventoryListResponse, status_code=status.HTTP_200_OK)
-def search_inventory(
+@router.get("/search", response_model=InventoryPageResponse, status_code=status.HTTP_200_OK)
+async def search_inventory(
     name: Optional[str] = Query(None),
     type: Optional[str] = Query(None),
     start_date: Optional[str] = Query(None),
     end_date: Optional[str] = Query(None),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,name,quantity"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 
 ):
@@ -199,30 +228,79 @@ def search_inventory(
         )
     
     try:
-
-        service = InventoryService(db)
-        inventory = service.search_items (
+        field_names = _parse_fields(fields)
+        statement = keyset_paginate(InventoryService.search_statement(
             tenant_id=current_user.tenant_id,
             name=name,
             type=type,
             start_date=start_date,
             end_date=end_date,
-        )
+            fields=field_names,
+        ), INVENTORY_KEYSET, cursor, limit)
+        page = InventoryService.page((await db.execute(statement)).all(), limit, field_names)
         return {
             "success": True,
             "message": "Inventory search completed",
-            "data": inventory,
+            "data": page.items,
+            "next_cursor": page.next_cursor,
+            "limit": page.limit,
         }
     
     except HTTPException:
         raise
 
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Failed to search inventory",
         )
 
+@router.get("/lookup", response_model=InventoryLookupResponse, status_code=status.HTTP_200_OK)
+async def lookup_inventory(
+    q: str = Query(..., min_length=1, max_length=100, description="Name, or the start of one; small typos are tolerated"),
+    limit: int = Query(DEFAULT_SEARCH_LIMIT, ge=1, le=MAX_SEARCH_LIMIT),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,name,quantity"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Ranked name lookup for search boxes: exact names, then prefixes, then closest matches"""
+    if not current_user.tenant_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Tenant access required",
+        )
+
+    try:
+        field_names = _parse_fields(fields)
+        statement = InventoryService.lookup_statement(current_user.tenant_id, q, limit, offset, field_names)
+        rows = (await db.execute(statement)).all()
+        return {
+            "success": True,
+            "message": "Inventory lookup completed",
+            "data": InventoryService.as_dicts(rows, field_names),
+            "limit": limit,
+            "offset": offset,
+        }
+
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to look up inventory",
+        )
+
 @router.put("/{item_id}", response_model=InventoryResponse, status_code=status.HTTP_200_OK)
 def update_inventory_item(
     item_id: int,
@@ -942,11 +1020,22 @@ def create_batch(
                 price_per_piece=batch_data.price_per_piece,
                 unit_cost=batch_data.unit_cost,
                 lifecycle_stage=lifecycle,
+                next_lifecycle_transition=next_lifecycle_transition(
+                    batch_data.expiry_date,
+                    item.fresh_threshold_days or 3
+                ),
                 is_active=True
             )
 
         db.add(batch)
         db.flush()  # assigns batch.id
+
+        stock_deltas = {}
+        StockLevelService.add_lot(
+            stock_deltas, item_id, lifecycle,
+            Decimal(str(batch_data.quantity_received)), Decimal(str(batch_data.unit_cost))
+        )
+        StockLevelService.apply_deltas(db, current_user.tenant_id, stock_deltas)
         
         current_qty = Decimal(str(item.current_quantity)) if item.current_quantity else Decimal(0)
         if item.expiry_date and item.expiry_date < date.today():
@@ -6,7 +6,7 @@ celery_app = Celery(
     "vibes_backend",
     broker=os.getenv("CELERY_BROKER_URL","redis://localhost:6379/0"),
     backend=os.getenv("CELERY_RESULT_BACKEND","redis://localhost:6379/0"),
-    include=["app.tasks","app.alert_tasks",]
+    include=["app.tasks","app.alert_tasks","app.notification_tasks","app.celery_tasks.fanout",]
 )
 
 celery_app.conf.update(
@@ -15,7 +15,9 @@ celery_app.conf.update(
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-    broker_connection_retry_on_startup=True
+    broker_connection_retry_on_startup=True,
+    # Outbox delivery runs on its own queue so the alert sweep never waits on SMTP
+    task_routes={"app.notification_tasks.*": {"queue": "notifications"}}
 )
 
 celery_app.conf.beat_schedule  = {
@@ -23,6 +25,18 @@ celery_app.conf.beat_schedule  = {
         "task": "app.tasks.update_all_batch_lifecycles",
         # "schedule":crontab(hour=0,minute=0),
         "schedule":60.0
+    },
+    "dispatch-pending-notifications": {
+        "task": "app.notification_tasks.dispatch_pending_notifications",
+        "schedule": 30.0
+    },
+    "reconcile-stock-levels": {
+        "task": "app.tasks.reconcile_stock_levels",
+        "schedule": 3600.0
+    },
+    "rebuild-production-rollups": {
+        "task": "app.tasks.rebuild_production_rollups",
+        "schedule": crontab(hour=0, minute=30)
     },
        # NEW: Check inventory alerts every hour
     "check-inventory-alerts-hourly": {
@@ -31,12 +45,11 @@ celery_app.conf.beat_schedule  = {
          "schedule":60.0
     },
     
-    # NEW: Daily expiry digest at 8 AM
-    "daily-expiry-digest": {
-        "task": "app.alert_tasks.send_daily_expiry_digest",
-        # "schedule": crontab(hour=8, minute=0),  # Daily at 8:00 AM UTC
-         "schedule":60.0
-    },
+    # # NEW: Daily expiry digest at 8 AM (not implemented yet; re-enable with the task)
+    # "daily-expiry-digest": {
+    #     "task": "app.alert_tasks.send_daily_expiry_digest",
+    #     "schedule": crontab(hour=8, minute=0),  # Daily at 8:00 AM UTC
+    # },
     
     # # NEW: Cleanup resolved alerts daily at midnight
     # "cleanup-resolved-alerts": {
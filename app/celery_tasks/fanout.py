@@ -0,0 +1,152 @@
+"""
+app/celery_tasks/fanout.py
+Tenant-sharded execution for Celery beat jobs
+"""
+import logging
+import uuid
+from typing import Callable, Dict, List, Optional
+from uuid import UUID
+
+import redis
+from celery import chord
+from celery.exceptions import SoftTimeLimitExceeded
+from sqlalchemy.orm import Session
+
+from app.celery_app import celery_app
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.tenants import Tenant
+
+logger = logging.getLogger(__name__)
+
+# job name -> fn(db, tenant_id) returning an optional stats dict
+TENANT_JOBS: Dict[str, Callable[[Session, UUID], Optional[dict]]] = {}
+
+# Delete the dedup key only if we still own it
+_RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+_redis_client = None
+
+
+def tenant_job(name: str):
+    """Register a per-tenant unit of work for fan_out(name)"""
+    def decorator(fn):
+        TENANT_JOBS[name] = fn
+        return fn
+    return decorator
+
+
+def _dedup_client() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(celery_app.conf.broker_url)
+    return _redis_client
+
+
+def _dedup_key(job: str, tenant_id: str) -> str:
+    return f"tenant-job:{job}:{tenant_id}"
+
+
+def claim_tenant(job: str, tenant_id: str) -> Optional[str]:
+    """Take the per-tenant dedup key; None if another worker holds it"""
+    token = uuid.uuid4().hex
+    acquired = _dedup_client().set(
+        _dedup_key(job, tenant_id), token,
+        nx=True, ex=settings.TENANT_JOB_TIME_LIMIT
+    )
+    return token if acquired else None
+
+
+def release_tenant(job: str, tenant_id: str, token: str) -> None:
+    _dedup_client().eval(_RELEASE_SCRIPT, 1, _dedup_key(job, tenant_id), token)
+
+
+def tenant_id_chunks(chunk_size: Optional[int] = None) -> List[List[str]]:
+    """All tenant ids (as strings, for JSON task args) split into chunks"""
+    chunk_size = max(chunk_size or settings.TENANT_JOB_CHUNK_SIZE, 1)
+    db = SessionLocal()
+    try:
+        tenant_ids = [
+            str(row.tenant_id)
+            for row in db.query(Tenant.tenant_id).order_by(Tenant.tenant_id).all()
+        ]
+    finally:
+        db.close()
+
+    return [tenant_ids[i:i + chunk_size] for i in range(0, len(tenant_ids), chunk_size)]
+
+
+def fan_out(job: str) -> dict:
+    """Enqueue one chunk subtask per group of tenants, aggregated by a chord callback"""
+    if job not in TENANT_JOBS:
+        raise ValueError(f"Unknown tenant job: {job}")
+
+    chunks = tenant_id_chunks()
+    if not chunks:
+        return {"job": job, "tenants": 0, "chunks": 0}
+
+    header = [run_tenant_chunk.s(job, chunk) for chunk in chunks]
+    result = chord(header)(aggregate_tenant_results.s(job))
+
+    tenants = sum(len(chunk) for chunk in chunks)
+    logger.info(f"{job}: dispatched {tenants} tenants in {len(chunks)} chunks")
+    return {"job": job, "tenants": tenants, "chunks": len(chunks), "aggregate_id": result.id}
+
+
+@celery_app.task(
+    name="app.celery_tasks.fanout.run_tenant_chunk",
+    soft_time_limit=settings.TENANT_JOB_SOFT_TIME_LIMIT,
+    time_limit=settings.TENANT_JOB_TIME_LIMIT
+)
+def run_tenant_chunk(job: str, tenant_ids: List[str]) -> dict:
+    """Run a registered job for each tenant of the chunk, one session per tenant"""
+    fn = TENANT_JOBS[job]
+    summary = {"processed": 0, "skipped": 0, "failed": 0, "timed_out": 0, "stats": {}}
+
+    for position, tenant_id in enumerate(tenant_ids):
+        token = claim_tenant(job, tenant_id)
+        if token is None:
+            # Same job still running for this tenant (slow previous run)
+            summary["skipped"] += 1
+            continue
+
+        db = SessionLocal()
+        try:
+            stats = fn(db, UUID(tenant_id))
+            summary["processed"] += 1
+            for key, value in (stats or {}).items():
+                summary["stats"][key] = summary["stats"].get(key, 0) + value
+        except SoftTimeLimitExceeded:
+            db.rollback()
+            summary["timed_out"] = len(tenant_ids) - position
+            logger.warning(f"{job}: soft time limit hit at tenant {tenant_id}, {summary['timed_out']} tenant(s) left")
+            break
+        except Exception as e:
+            db.rollback()
+            summary["failed"] += 1
+            logger.error(f"{job} failed for tenant {tenant_id}: {str(e)}")
+        finally:
+            db.close()
+            release_tenant(job, tenant_id, token)
+
+    return summary
+
+
+@celery_app.task(name="app.celery_tasks.fanout.aggregate_tenant_results")
+def aggregate_tenant_results(results: List[dict], job: str) -> dict:
+    """Chord callback: combine chunk summaries into one completion record"""
+    totals = {"processed": 0, "skipped": 0, "failed": 0, "timed_out": 0}
+    stats = {}
+    for result in results:
+        for key in totals:
+            totals[key] += result.get(key, 0)
+        for key, value in result.get("stats", {}).items():
+            stats[key] = stats.get(key, 0) + value
+
+    logger.info(f"{job} completed: {totals} {stats}")
+    return {"job": job, "chunks": len(results), **totals, "stats": stats}
@@ -1,6 +1,7 @@
+import sys
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import Field, field_validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Settings(BaseSettings):
@@ -22,6 +23,94 @@ class Settings(BaseSettings):
 
     DATABASE_POOL_SIZE: int = 5
     DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: int = 30
+    DATABASE_POOL_RECYCLE: int = 1800
+
+    # Pool sizes per process role, overriding the DATABASE_POOL_* defaults.
+    # PROCESS_ROLE is "api", "worker" or "beat"; detected from the command line when unset
+    PROCESS_ROLE: Optional[str] = None
+    DATABASE_POOL_PROFILES: Dict[str, Dict[str, int]] = Field(default_factory=lambda: {
+        "worker": {"pool_size": 2, "max_overflow": 2},
+        "beat": {"pool_size": 1, "max_overflow": 0},
+    })
+
+    # Read replica for endpoints that opt in (get_read_db / get_async_read_db);
+    # reads fall back to the primary while replay lag exceeds REPLICA_MAX_LAG_SECONDS
+    REPLICA_DATABASE_URL: Optional[str] = None
+    REPLICA_ASYNC_DATABASE_URL: Optional[str] = None
+    REPLICA_MAX_LAG_SECONDS: float = 10.0
+    REPLICA_LAG_CHECK_INTERVAL_SECONDS: float = 5.0
+    REPLICA_CONNECT_TIMEOUT_SECONDS: int = 2
+
+    # "session", or "transaction" when connecting through PgBouncer in
+    # transaction pooling mode (no server-side prepared statements, no
+    # session-level SET)
+    DATABASE_POOL_MODE: str = "session"
+
+    # Async (asyncpg) engine used by the read endpoints; URL defaults to DATABASE_URL
+    ASYNC_DATABASE_URL: Optional[str] = None
+    ASYNC_DATABASE_POOL_SIZE: int = 20
+    ASYNC_DATABASE_MAX_OVERFLOW: int = 10
+
+    # Stock deductions
+    STOCK_LOCK_TIMEOUT_MS: int = 5000
+    STOCK_DEDUCTION_MAX_RETRIES: int = 3
+    STOCK_DEDUCTION_RETRY_BACKOFF_MS: int = 50
+
+    # Batch lifecycle job: "incremental" (due transitions only) or "sql" (full reclassification)
+    LIFECYCLE_ENGINE: str = "incremental"
+    LIFECYCLE_TENANT_CHUNK_SIZE: int = 50
+
+    # Tenant fan-out for beat jobs (alerts, digests, reconciliation)
+    TENANT_JOB_CHUNK_SIZE: int = 10
+    TENANT_JOB_SOFT_TIME_LIMIT: int = 240
+    TENANT_JOB_TIME_LIMIT: int = 300
+
+    # Production rollup repair: the nightly job recomputes this many days of buckets from the logs
+    PRODUCTION_ROLLUP_REBUILD_DAYS: int = 2
+
+    # Notification outbox
+    NOTIFICATION_BATCH_SIZE: int = 100
+    NOTIFICATION_MAX_ATTEMPTS: int = 5
+    NOTIFICATION_RETRY_BACKOFF_SECONDS: int = 60
+    NOTIFICATION_RATE_LIMITS_PER_MINUTE: Dict[str, int] = Field(default_factory=lambda: {"email": 60})
+    NOTIFICATION_DIGEST_WINDOW_SECONDS: int = 300  # 0 sends each sweep's alerts as one digest right away
+
+    # Alert routing (recipients/channels per tenant), cached per process
+    ALERT_DEFAULT_RECIPIENT_ROLES: List[str] = Field(default_factory=list)  # empty: all active users
+    ALERT_ROUTING_CACHE_TTL_SECONDS: float = 60.0
+    ALERT_ROUTING_CACHE_MAX_TENANTS: int = 1024
+
+    # Dish catalogue (dishes, types, ingredients) served by GET /dish/dishes, cached per process
+    DISH_CATALOGUE_CACHE_TTL_SECONDS: float = 300.0
+    DISH_CATALOGUE_CACHE_MAX_TENANTS: int = 1024
+
+    # Local days for reports ("today", "this_week", ...) follow the tenant's branch
+    # timezone (cached per process), or this IANA zone when no branch has one
+    DEFAULT_TIMEZONE: str = "UTC"
+    TENANT_TIMEZONE_CACHE_TTL_SECONDS: float = 300.0
+    TENANT_TIMEZONE_CACHE_MAX_TENANTS: int = 4096
+
+    # Authentication: "stateless" resolves the principal from token claims plus a
+    # per-process cache of user state; "db" loads the user row on every request
+    AUTH_MODE: str = "stateless"
+    AUTH_USER_CACHE_TTL_SECONDS: float = 30.0
+    AUTH_USER_CACHE_MAX_USERS: int = 10000
+
+    # Password hashing: argon2 cost (time_cost iterations, memory_cost KiB) and
+    # the per-process worker pool it runs in; 0 workers hashes inline
+    ARGON2_TIME_COST: int = 3
+    ARGON2_MEMORY_COST: int = 65536
+    ARGON2_PARALLELISM: int = 2
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 16
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 10.0
+
+    # SMTP session pool (per worker process)
+    SMTP_POOL_SIZE: int = 2
+    SMTP_POOL_MAX_MESSAGES_PER_SESSION: int = 100
+    SMTP_POOL_HEALTHCHECK_IDLE_SECONDS: float = 30.0
+    SMTP_TIMEOUT_SECONDS: float = 30.0
 
     #env
     SECRET_KEY: str = "for_example"
@@ -59,6 +148,30 @@ class Settings(BaseSettings):
     def is_sqlite(self) -> bool:
         return self.DATABASE_URL.startswith("sqlite")
 
+    @property
+    def process_role(self) -> str:
+        if self.PROCESS_ROLE:
+            return self.PROCESS_ROLE
+        # `celery ... worker|beat` and `python -m celery ...` both put celery in argv[0]
+        if sys.argv and "celery" in sys.argv[0]:
+            return "beat" if "beat" in sys.argv else "worker"
+        return "api"
+
+    def pool_profile(self, role: Optional[str] = None) -> Dict[str, int]:
+        """Pool arguments for a process role (defaults to this process)"""
+        profile = {
+            "pool_size": self.DATABASE_POOL_SIZE,
+            "max_overflow": self.DATABASE_MAX_OVERFLOW,
+            "pool_timeout": self.DATABASE_POOL_TIMEOUT,
+            "pool_recycle": self.DATABASE_POOL_RECYCLE,
+        }
+        profile.update(self.DATABASE_POOL_PROFILES.get(role or self.process_role, {}))
+        return profile
+
+    @property
+    def uses_transaction_pooling(self) -> bool:
+        return self.DATABASE_POOL_MODE == "transaction"
+
     # Config
     model_config = SettingsConfigDict(
         env_file="env/.env.local",
@@ -0,0 +1,215 @@
+"""
+app/core/security.py
+Password hashing off the request threadpool
+
+argon2 is deliberately CPU- and memory-heavy. Hashes and verifications run
+in a small dedicated process pool so a burst of logins cannot tie up the
+threads serving every other sync endpoint. Admission is bounded: once
+PASSWORD_HASH_MAX_PENDING jobs are queued or running, further callers get
+PasswordHasherBusy straight away instead of queueing indefinitely.
+"""
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PasswordHasherBusy(RuntimeError):
+    """The password hashing pool is saturated or too slow; the request can be retried"""
+
+
+def build_password_context(time_cost: int, memory_cost: int, parallelism: int) -> CryptContext:
+    """
+    argon2 context with explicit cost parameters. Hashes made with other
+    parameters still verify and are reported as needing an update.
+    """
+    return CryptContext(
+        schemes=["argon2"],
+        deprecated="auto",
+        argon2__time_cost=time_cost,
+        argon2__memory_cost=memory_cost,
+        argon2__parallelism=parallelism,
+    )
+
+
+def _settings_context() -> CryptContext:
+    return build_password_context(
+        settings.ARGON2_TIME_COST,
+        settings.ARGON2_MEMORY_COST,
+        settings.ARGON2_PARALLELISM
+    )
+
+
+# Worker process side
+
+_worker_context: Optional[CryptContext] = None
+
+
+def _init_worker(time_cost: int, memory_cost: int, parallelism: int) -> None:
+    global _worker_context
+    _worker_context = build_password_context(time_cost, memory_cost, parallelism)
+
+
+def _hash(password: str) -> str:
+    return _worker_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return _worker_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Bounded process pool for argon2 work, one per API process.
+
+    workers=0 runs everything inline on the calling thread (scripts, local
+    development). Counters and timings are exposed through stats().
+    """
+
+    def __init__(
+        self,
+        context: CryptContext,
+        workers: int = 2,
+        max_pending: int = 32,
+        timeout: float = 10.0
+    ):
+        self.context = context
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._counters = {
+            "completed": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "pending_max": 0,
+            "run_seconds_total": 0.0,
+            "run_seconds_max": 0.0
+        }
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                argon2 = self.context.handler("argon2")
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # spawn: forking a threaded server process is unsafe
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(argon2.default_rounds, argon2.memory_cost, argon2.parallelism)
+                )
+            return self._executor
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._count("rejected")
+            logger.warning(f"Password hashing pool saturated ({self.max_pending} pending); rejecting request")
+            raise PasswordHasherBusy("Too many concurrent password operations")
+
+        with self._lock:
+            self._pending += 1
+            self._counters["pending_max"] = max(self._counters["pending_max"], self._pending)
+
+        submitted = time.perf_counter()
+        try:
+            if self.workers <= 0:
+                return fn(*args)
+
+            future = self._get_executor().submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                future.cancel()
+                self._count("timeouts")
+                raise PasswordHasherBusy("Password operation timed out")
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); start a fresh pool next call
+                logger.error("Password hashing pool broke; restarting it")
+                self.shutdown()
+                raise PasswordHasherBusy("Password hashing pool restarted")
+        finally:
+            elapsed = time.perf_counter() - submitted
+            with self._lock:
+                self._pending -= 1
+                self._counters["completed"] += 1
+                self._counters["run_seconds_total"] += elapsed
+                self._counters["run_seconds_max"] = max(self._counters["run_seconds_max"], elapsed)
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        if self.workers <= 0:
+            return self._run(self.context.hash, password)
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(matches, new_hash); new_hash is set when the stored hash used outdated parameters"""
+        if self.workers <= 0:
+            return self._run(self.context.verify_and_update, password, hashed)
+        return self._run(_verify_and_update, password, hashed)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    # Metrics
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            counters["pending"] = self._pending
+        counters["queued"] = max(0, counters["pending"] - max(self.workers, 1))
+        counters["workers"] = self.workers
+        counters["max_pending"] = self.max_pending
+        counters["run_seconds_avg"] = (
+            counters["run_seconds_total"] / counters["completed"] if counters["completed"] else 0.0
+        )
+        return counters
+
+
+_hasher: Optional[PasswordHasher] = None
+_hasher_pid: Optional[int] = None
+_hasher_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hasher built from the ARGON2_* / PASSWORD_HASH_* settings; rebuilt after fork"""
+    global _hasher, _hasher_pid
+    with _hasher_lock:
+        if _hasher is None or _hasher_pid != os.getpid():
+            _hasher = PasswordHasher(
+                context=_settings_context(),
+                workers=settings.PASSWORD_HASH_WORKERS,
+                max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+                timeout=settings.PASSWORD_HASH_TIMEOUT_SECONDS
+            )
+            _hasher_pid = os.getpid()
+        return _hasher
+
+
+def shutdown_password_hasher() -> None:
+    global _hasher
+    with _hasher_lock:
+        if _hasher is not None and _hasher_pid == os.getpid():
+            _hasher.shutdown()
+        _hasher = None
@@ -0,0 +1,123 @@
+"""
+app/db/pool_metrics.py
+Connection pool instrumentation: checkout latency, overflow and timeouts
+"""
+import bisect
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# Upper bounds of the checkout latency histogram buckets, in milliseconds
+CHECKOUT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class PoolMetrics:
+    """Counters for one engine's pool in this process"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._buckets = [0] * (len(CHECKOUT_BUCKETS_MS) + 1)
+        self._counters = {
+            "checkouts": 0,
+            "overflow_connects": 0,
+            "timeouts": 0,
+            "connects": 0,
+            "invalidations": 0,
+            "checkout_ms_total": 0.0,
+            "checkout_ms_max": 0.0
+        }
+
+    def observe_checkout(self, seconds: float) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            self._buckets[bisect.bisect_left(CHECKOUT_BUCKETS_MS, ms)] += 1
+            self._counters["checkouts"] += 1
+            self._counters["checkout_ms_total"] += ms
+            self._counters["checkout_ms_max"] = max(self._counters["checkout_ms_max"], ms)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self, pool: Optional[QueuePool] = None) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+            buckets = list(self._buckets)
+
+        # Cumulative, Prometheus style: checkouts that waited <= each bound
+        histogram, running = {}, 0
+        for bound, count in zip((*CHECKOUT_BUCKETS_MS, "inf"), buckets):
+            running += count
+            histogram[f"le_{bound}"] = running
+
+        counters["name"] = self.name
+        counters["checkout_ms_avg"] = (
+            counters["checkout_ms_total"] / counters["checkouts"] if counters["checkouts"] else 0.0
+        )
+        counters["checkout_ms_histogram"] = histogram
+        if pool is not None:
+            counters.update({
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0)
+            })
+        return counters
+
+
+class _InstrumentedPoolMixin:
+    """
+    Times every checkout, including the wait for a free slot and the
+    pre-ping, and records overflow connections and checkout timeouts.
+    """
+
+    metrics: PoolMetrics
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            self.metrics.count("timeouts")
+            raise
+        self.metrics.observe_checkout(time.perf_counter() - started)
+        return connection
+
+    def _inc_overflow(self):
+        opened = super()._inc_overflow()
+        if opened and self._overflow > 0:
+            self.metrics.count("overflow_connects")
+        return opened
+
+    def _create_connection(self):
+        self.metrics.count("connects")
+        return super()._create_connection()
+
+    def _invalidate(self, connection, exception=None, _checkin=True):
+        self.metrics.count("invalidations")
+        return super()._invalidate(connection, exception, _checkin)
+
+    def recreate(self):
+        # engine.dispose() swaps in a recreated pool; keep the same counters
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def instrument(engine, name: str) -> PoolMetrics:
+    """Attach a PoolMetrics to an engine built with one of the pools above"""
+    pool = engine.pool
+    pool.metrics = PoolMetrics(name)
+    return pool.metrics
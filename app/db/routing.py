@@ -0,0 +1,224 @@
+"""
+app/db/routing.py
+Read-replica routing for read-only endpoints
+
+Endpoints opt in by depending on get_read_db / get_async_read_db (app.api.deps)
+instead of get_db / get_async_db. Their sessions go to REPLICA_DATABASE_URL
+while the replica is reachable and its replay lag is within
+REPLICA_MAX_LAG_SECONDS, and to the primary otherwise. Lag is sampled at most
+once per REPLICA_LAG_CHECK_INTERVAL_SECONDS per process.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument
+from app.db.session import AsyncSessionLocal, SessionLocal, async_connect_args, get_async_engine, to_async_url
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind. A replica that has replayed everything it
+# received is current even if the primary has been idle for a while.
+REPLICA_LAG_SQL = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+
+
+class ReplicaRouter:
+    """Replica engines plus a cached verdict on whether reads may use them"""
+
+    def __init__(
+        self,
+        url: Optional[str],
+        async_url: Optional[str] = None,
+        max_lag_seconds: float = 10.0,
+        check_interval_seconds: float = 5.0,
+        connect_timeout_seconds: int = 2
+    ):
+        self.url = url
+        self.async_url = async_url or (to_async_url(url) if url else None)
+        self.max_lag_seconds = max_lag_seconds
+        self.check_interval_seconds = check_interval_seconds
+        self.connect_timeout_seconds = connect_timeout_seconds
+
+        self._engine: Optional[Engine] = None
+        self._async_engine: Optional[AsyncEngine] = None
+        self._session_factory: Optional[sessionmaker] = None
+        self._async_session_factory: Optional[async_sessionmaker] = None
+        self._engine_lock = threading.Lock()
+
+        # Last lag sample: None until checked, or when the check failed
+        self._lag: Optional[float] = None
+        self._checked_at = 0.0
+        self._check_lock = threading.Lock()
+        self._async_check_lock: Optional[asyncio.Lock] = None
+        self._counter_lock = threading.Lock()
+        self._counters = {"replica_reads": 0, "primary_fallbacks": 0, "lag_checks": 0, "check_failures": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    # Engines
+
+    def _connect_args(self, url: str, asynchronous: bool) -> dict:
+        args = async_connect_args() if asynchronous else {}
+        if make_url(url).get_backend_name() == "postgresql":
+            args["timeout" if asynchronous else "connect_timeout"] = self.connect_timeout_seconds
+        return args
+
+    def session_factory(self) -> sessionmaker:
+        with self._engine_lock:
+            if self._session_factory is None:
+                self._engine = create_engine(
+                    self.url,
+                    poolclass=InstrumentedQueuePool,
+                    pool_pre_ping=True,
+                    connect_args=self._connect_args(self.url, asynchronous=False),
+                    **settings.pool_profile()
+                )
+                instrument(self._engine, f"{settings.process_role}:replica")
+                self._session_factory = sessionmaker(autocommit=False, autoflush=False, bind=self._engine)
+            return self._session_factory
+
+    def async_session_factory(self) -> async_sessionmaker:
+        with self._engine_lock:
+            if self._async_session_factory is None:
+                self._async_engine = create_async_engine(
+                    self.async_url,
+                    poolclass=InstrumentedAsyncQueuePool,
+                    pool_size=settings.ASYNC_DATABASE_POOL_SIZE,
+                    max_overflow=settings.ASYNC_DATABASE_MAX_OVERFLOW,
+                    pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+                    pool_recycle=settings.DATABASE_POOL_RECYCLE,
+                    pool_pre_ping=True,
+                    connect_args=self._connect_args(self.async_url, asynchronous=True)
+                )
+                instrument(self._async_engine.sync_engine, f"{settings.process_role}:replica-async")
+                self._async_session_factory = async_sessionmaker(
+                    bind=self._async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+                )
+            return self._async_session_factory
+
+    async def dispose(self) -> None:
+        with self._engine_lock:
+            engine, self._engine, self._session_factory = self._engine, None, None
+            async_engine, self._async_engine, self._async_session_factory = self._async_engine, None, None
+        if engine is not None:
+            engine.dispose()
+        if async_engine is not None:
+            await async_engine.dispose()
+
+    # Lag
+
+    def _due(self) -> bool:
+        return time.monotonic() - self._checked_at >= self.check_interval_seconds
+
+    def _record(self, lag: Optional[float], error: Optional[Exception] = None) -> None:
+        previous = self._lag
+        self._lag = float(lag) if lag is not None else None
+        self._checked_at = time.monotonic()
+        self._count("lag_checks")
+        if error is not None:
+            self._count("check_failures")
+            if previous is not None:
+                logger.warning(f"Replica lag check failed, reading from primary: {error}")
+        elif self._lag is not None and self._lag > self.max_lag_seconds:
+            logger.warning(f"Replica lag {self._lag:.1f}s exceeds {self.max_lag_seconds}s, reading from primary")
+
+    def _usable(self) -> bool:
+        return self._lag is not None and self._lag <= self.max_lag_seconds
+
+    def use_replica(self) -> bool:
+        """Whether a sync read should go to the replica (may sample lag)"""
+        if not self.enabled:
+            return False
+        # One thread samples; the others use the previous verdict meanwhile
+        if self._due() and self._check_lock.acquire(blocking=False):
+            try:
+                if self._due():
+                    try:
+                        with self.session_factory()() as session:
+                            self._record(session.execute(REPLICA_LAG_SQL).scalar())
+                    except Exception as e:
+                        self._record(None, e)
+            finally:
+                self._check_lock.release()
+        return self._route(self._usable())
+
+    async def use_replica_async(self) -> bool:
+        """use_replica for the async engines"""
+        if not self.enabled:
+            return False
+        if self._async_check_lock is None:
+            self._async_check_lock = asyncio.Lock()
+        if self._due() and not self._async_check_lock.locked():
+            async with self._async_check_lock:
+                if self._due():
+                    try:
+                        async with self.async_session_factory()() as session:
+                            self._record((await session.execute(REPLICA_LAG_SQL)).scalar())
+                    except Exception as e:
+                        self._record(None, e)
+        return self._route(self._usable())
+
+    # Metrics
+
+    def _route(self, replica: bool) -> bool:
+        self._count("replica_reads" if replica else "primary_fallbacks")
+        return replica
+
+    def _count(self, name: str) -> None:
+        with self._counter_lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._counter_lock:
+            counters = dict(self._counters)
+        counters.update({
+            "enabled": self.enabled,
+            "lag_seconds": self._lag,
+            "max_lag_seconds": self.max_lag_seconds,
+            "using_replica": self.enabled and self._usable(),
+        })
+        for name, engine in (("pool", self._engine), ("async_pool", self._async_engine)):
+            if engine is not None:
+                pool = engine.pool if isinstance(engine, Engine) else engine.sync_engine.pool
+                counters[name] = pool.metrics.stats(pool)
+        return counters
+
+
+replica_router = ReplicaRouter(
+    url=settings.REPLICA_DATABASE_URL,
+    async_url=settings.REPLICA_ASYNC_DATABASE_URL,
+    max_lag_seconds=settings.REPLICA_MAX_LAG_SECONDS,
+    check_interval_seconds=settings.REPLICA_LAG_CHECK_INTERVAL_SECONDS,
+    connect_timeout_seconds=settings.REPLICA_CONNECT_TIMEOUT_SECONDS
+)
+
+
+def read_session() -> Session:
+    """Session for a read-only unit of work: the replica when usable, else the primary"""
+    if replica_router.use_replica():
+        return replica_router.session_factory()()
+    return SessionLocal()
+
+
+async def async_read_session() -> AsyncSession:
+    """read_session for AsyncSession"""
+    if await replica_router.use_replica_async():
+        return replica_router.async_session_factory()()
+    get_async_engine()
+    return AsyncSessionLocal()
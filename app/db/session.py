@@ -1,13 +1,23 @@
+import threading
+import uuid
+from typing import Optional
+
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.db.pool_metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, PoolMetrics, instrument
 
+# Pool size comes from this process's role profile (api / worker / beat), so
+# API workers, Celery workers and beat can share one Postgres connection budget
 engine = create_engine(
     settings.DATABASE_URL,
-    pool_size=settings.DATABASE_POOL_SIZE,
-    max_overflow=settings.DATABASE_MAX_OVERFLOW,
-    pool_pre_ping=True
+    poolclass=InstrumentedQueuePool,
+    pool_pre_ping=True,
+    **settings.pool_profile()
 )
+pool_metrics: PoolMetrics = instrument(engine, f"{settings.process_role}:sync")
 
 SessionLocal = sessionmaker(
     autocommit=False,
@@ -22,3 +32,81 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# Async engine (asyncpg) for read-heavy endpoints. It has its own pool, sized
+# by ASYNC_DATABASE_POOL_SIZE, and is only built on first use so processes
+# that never touch it (Celery workers, scripts) do not need asyncpg.
+
+_async_engine: Optional[AsyncEngine] = None
+_async_engine_lock = threading.Lock()
+
+# expire_on_commit=False: attributes must stay readable after commit, since
+# an expired attribute cannot be lazily reloaded outside an await
+AsyncSessionLocal = async_sessionmaker(
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
+
+def to_async_url(database_url: str) -> str:
+    """A sync database URL with a postgresql driver swapped for asyncpg"""
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+
+def async_database_url() -> str:
+    """ASYNC_DATABASE_URL, or DATABASE_URL with its driver swapped for asyncpg"""
+    return settings.ASYNC_DATABASE_URL or to_async_url(settings.DATABASE_URL)
+
+
+def async_connect_args() -> dict:
+    if not settings.uses_transaction_pooling:
+        return {}
+    # PgBouncer hands each transaction to any server connection, so asyncpg
+    # must not rely on named prepared statements
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    with _async_engine_lock:
+        if _async_engine is None:
+            _async_engine = create_async_engine(
+                async_database_url(),
+                poolclass=InstrumentedAsyncQueuePool,
+                pool_size=settings.ASYNC_DATABASE_POOL_SIZE,
+                max_overflow=settings.ASYNC_DATABASE_MAX_OVERFLOW,
+                pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+                pool_recycle=settings.DATABASE_POOL_RECYCLE,
+                pool_pre_ping=True,
+                connect_args=async_connect_args()
+            )
+            instrument(_async_engine.sync_engine, f"{settings.process_role}:async")
+            AsyncSessionLocal.configure(bind=_async_engine)
+        return _async_engine
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    with _async_engine_lock:
+        async_engine, _async_engine = _async_engine, None
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
+def pool_stats() -> dict:
+    """Checkout latency, overflow and timeout counters for this process's pools"""
+    stats = {"role": settings.process_role, "mode": settings.DATABASE_POOL_MODE,
+             "sync": pool_metrics.stats(engine.pool)}
+    if _async_engine is not None:
+        async_pool = _async_engine.sync_engine.pool
+        stats["async"] = async_pool.metrics.stats(async_pool)
+    return stats
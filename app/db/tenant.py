@@ -9,26 +9,42 @@
 
 """
 PostgreSQL Row-Level Security helper functions
+
+The tenant is set with set_config(..., is_local => true), the function form of
+SET LOCAL: it lasts until the end of the current transaction only, so it is
+safe behind PgBouncer transaction pooling, and unlike SET it takes a bind
+parameter (asyncpg sends parameters server-side).
 """
+from typing import Optional
+from uuid import UUID
+
 from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-def set_tenant(session: Session, tenant_id: int):
+SET_TENANT_SQL = text("SELECT set_config('app.current_tenant', :tenant_id, true)")
+
+
+def set_tenant(session: Session, tenant_id: UUID):
     """
-    Set current tenant in PostgreSQL session variable
+    Set current tenant for the session's current transaction
     """
-    session.execute(
-        text("SET LOCAL app.current_tenant = :tenant_id"),
-        {"tenant_id": str(tenant_id)}
-    )
+    session.execute(SET_TENANT_SQL, {"tenant_id": str(tenant_id)})
+
+
+async def set_tenant_async(session: AsyncSession, tenant_id: UUID):
+    """set_tenant for an AsyncSession"""
+    await session.execute(SET_TENANT_SQL, {"tenant_id": str(tenant_id)})
+
 
-def get_current_tenant(session: Session) -> int:
+def get_current_tenant(session: Session) -> Optional[UUID]:
     """Get current tenant from session variable"""
     result = session.execute(
         text("SELECT current_setting('app.current_tenant', true)")
     )
-    return int(result.scalar() or 0)
+    value = result.scalar()
+    return UUID(value) if value else None
 
 def clear_tenant(session: Session):
-    """Clear tenant context"""
-    session.execute(text("RESET app.current_tenant"))
\ No newline at end of file
+    """Clear tenant context (transaction-local, like set_tenant)"""
+    session.execute(text("SELECT set_config('app.current_tenant', '', true)"))
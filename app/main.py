@@ -1,9 +1,11 @@
 from fastapi import FastAPI
 from app.api.v1.routers import api_router
-from app.db.session import engine
+from app.db.routing import replica_router
+from app.db.session import dispose_async_engine, engine
 from app.db.base import Base
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings 
+from app.core.security import shutdown_password_hasher
 
 app = FastAPI(title="Vibes Inventory API")
 
@@ -20,6 +22,12 @@ def on_startup():
     # Base.metadata.create_all(bind=engine)    #only for inital develoment testing only
     pass
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    shutdown_password_hasher()
+    await dispose_async_engine()
+    await replica_router.dispose()
+
 app.include_router(api_router, prefix="/api/v1")
 
 
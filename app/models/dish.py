@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, Numeric, String, Float, ForeignKey,Enum, Text
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, Numeric, PrimaryKeyConstraint, String, Float, ForeignKey,Enum, Text
 from sqlalchemy.orm import relationship
 from app.db.base import Base
 from app.db.mixins import TenantMixin
@@ -66,6 +66,14 @@ class Dish(TenantMixin,Base):  # dishname
     sales = relationship( "DishSale",back_populates="dish",cascade="all, delete-orphan" )
     wastage = relationship("Wastage",back_populates="dish",cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # name lookups (app.services.search_service)
+        Index(
+            "ix_dishes_tenant_name_trgm", "tenant_id", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ),
+    )
+
 class DishIngredient(TenantMixin,Base): # it will track ingredients use in dish
     __tablename__ = "dish_ingredients"
     
@@ -129,7 +137,7 @@ class DishPreparationBatchLog(TenantMixin, Base):  #dishpreparationlogs table
     batch_id = Column(Integer, ForeignKey("dish_preparation_batches.id", ondelete="CASCADE"), nullable=True, index=True)
     quantity_prepared = Column(Integer, nullable=True)
     track_status =  Column(Enum(PreparationBatchStatus), default=PreparationBatchStatus.IN_PROGRESS)
-    preparation_date = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    preparation_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     completed_at = Column(DateTime(timezone=True), nullable=True)
     failure_reason = Column(Text, nullable=True)
     notes = Column(String, nullable=True)
@@ -141,6 +149,12 @@ class DishPreparationBatchLog(TenantMixin, Base):  #dishpreparationlogs table
     user = relationship("User")
     preparation_batch = relationship("DishPreparationBatch", back_populates="preparation_logs")
     ingredient_consumptions_history = relationship("PreparationIngredientHistory", back_populates="preparation_log")
+
+    __table_args__ = (
+        # keyset pagination of preparation history (DishPreparationService.preparation_history_statement)
+        Index("ix_dish_prep_logs_tenant_date_id", "tenant_id", "preparation_date", "id"),
+    )
+
 class PreparationIngredientHistory(TenantMixin, Base):
     """Track ingredient consumption per preparation"""
     __tablename__ = "preparation_ingredient_history"
@@ -216,7 +230,39 @@ class PrePreparedMaterialStock(TenantMixin, Base):
     preparation_log_id = Column(Integer, nullable=True)
     total_cost = Column(Numeric(12, 2), default=0)
     is_active = Column(Boolean, default=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # optimistic concurrency: every ORM update checks and bumps `version`
+    __mapper_args__ = {"version_id_col": version}
     
     product = relationship("PrePreparedMaterial", back_populates="stock_batches")
-    user = relationship("User")    
\ No newline at end of file
+    user = relationship("User")
+
+
+class DishProductionRollup(TenantMixin, Base):
+    """
+    Preparation counters per (tenant, 15-minute UTC bucket, dish, chef),
+    upserted in the same transaction as each preparation and rebuilt from
+    dish_preparation_batch_logs by the rebuild_production_rollups job.
+    dish_id / user_id are plain ids (0 when the log had none) so the key
+    stays non-null; names are joined in at read time.
+    """
+    __tablename__ = "dish_production_rollups"
+
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    dish_id = Column(Integer, nullable=False, default=0, server_default="0")
+    user_id = Column(Integer, nullable=False, default=0, server_default="0")
+    preparations_count = Column(Integer, nullable=False, default=0, server_default="0")
+    quantity_prepared = Column(Integer, nullable=False, default=0, server_default="0")
+    total_cost = Column(Numeric(14, 2), nullable=False, default=0, server_default="0")
+    # per-preparation cost per unit: sum (for the average), min and max
+    cost_per_unit_sum = Column(Numeric(16, 4), nullable=False, default=0, server_default="0")
+    cost_per_unit_min = Column(Numeric(12, 4), nullable=True)
+    cost_per_unit_max = Column(Numeric(12, 4), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        PrimaryKeyConstraint("tenant_id", "bucket_start", "dish_id", "user_id"),
+        Index("ix_dish_production_rollups_tenant_dish_bucket", "tenant_id", "dish_id", "bucket_start"),
+    )
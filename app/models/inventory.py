@@ -1,6 +1,6 @@
-from sqlalchemy import  Column, Integer, String, DateTime, Boolean, Numeric,ForeignKey, Text, Date, CheckConstraint, Index, Enum,Float
+from sqlalchemy import  Column, Integer, String, DateTime, Boolean, Numeric,ForeignKey, Text, Date, CheckConstraint, Index, Enum,Float, JSON
 from datetime import datetime
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 from enum import Enum as PyEnum
 from app.db.base import Base
 from sqlalchemy.orm import relationship
@@ -95,7 +95,7 @@ class Inventory(TenantMixin,Base):
     near_expiry_threshold_days = Column(Integer, default=1)
     current_quantity = Column(Numeric(12, 3), default=0)
     is_active = Column(Boolean,default=True)
-    date_added = Column(DateTime, default=datetime.utcnow, nullable=True)
+    date_added = Column(DateTime, default=datetime.utcnow, server_default=func.now(), nullable=False)
     updated_at = Column(DateTime, server_default=func.now(),onupdate=func.now(),default=datetime.utcnow)
 
     storage_location = relationship("StorageLocation")
@@ -105,6 +105,20 @@ class Inventory(TenantMixin,Base):
     alerts = relationship("InventoryAlert", back_populates="inventory")
     user = relationship("User")
 
+    __table_args__ = (
+        # keyset pagination of listings: WHERE tenant_id = ? AND (date_added, id) < (?, ?) ORDER BY date_added DESC, id DESC
+        Index("ix_inventory_tenant_date_added_id", "tenant_id", "date_added", "id"),
+        # name/type lookups (app.services.search_service); btree_gin provides the tenant_id opclass
+        Index(
+            "ix_inventory_tenant_name_trgm", "tenant_id", "name",
+            postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}
+        ),
+        Index(
+            "ix_inventory_tenant_type_trgm", "tenant_id", "type",
+            postgresql_using="gin", postgresql_ops={"type": "gin_trgm_ops"}
+        ),
+    )
+
     # __table_args__ = (
     #     Index("idx_inventory_tenant_branch_sku", "tenant_id", "branch_id", "sku", unique=True),
     #     Index("idx_inventory_tenant", "tenant_id"),
@@ -144,8 +158,13 @@ class InventoryBatch(TenantMixin,Base):
     unit_cost = Column(Numeric(10, 2))
     is_active = Column(Boolean, default=True)
     lifecycle_stage = Column(Enum(PerishableLifecycle))
+    next_lifecycle_transition = Column(Date, nullable=True, index=True)    # None once expired
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # optimistic concurrency: every ORM update checks and bumps `version`
+    __mapper_args__ = {"version_id_col": version}
     
     item = relationship("Inventory", back_populates="batches")
     transaction = relationship("InventoryTransaction", back_populates="batch")
@@ -158,6 +177,24 @@ class InventoryBatch(TenantMixin,Base):
     #     CheckConstraint("quantity_remaining <= quantity_received", name="check_batch_qty_logic"),
     # )
     
+class InventoryStockLevel(TenantMixin, Base):
+    """Maintained per-ingredient aggregate over active batches, updated on every batch write"""
+    __tablename__ = "inventory_stock_levels"
+
+    inventory_item_id = Column(Integer, ForeignKey("inventory.id", ondelete="CASCADE"), primary_key=True)
+    available_quantity = Column(Numeric(14, 3), nullable=False, default=0, server_default="0")    # non-expired
+    near_expiry_quantity = Column(Numeric(14, 3), nullable=False, default=0, server_default="0")
+    stock_value = Column(Numeric(16, 4), nullable=False, default=0, server_default="0")           # sum(qty * unit_cost), non-expired
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    item = relationship("Inventory")
+
+    @property
+    def weighted_unit_cost(self):
+        if not self.available_quantity:
+            return 0
+        return self.stock_value / self.available_quantity
+
 class PreparedMaterial(TenantMixin,Base):
     __tablename__ = "pre_preparedmaterial"
 
@@ -244,6 +281,18 @@ class InventoryAlert(TenantMixin,Base):
     batch = relationship("InventoryBatch")
     acknowledger = relationship("User")
 
+    __table_args__ = (
+        # at most one open alert per (type, item, batch); alert sweeps insert with ON CONFLICT DO NOTHING
+        Index(
+            "uq_inventory_alert_open",
+            "tenant_id", "alert_type", "inventory_item_id", func.coalesce(batch_id, 0),
+            unique=True,
+            postgresql_where=text("status IN ('ACTIVE', 'SNOOZED')")
+        ),
+        # alert lists and stats filtered to a time window (app.utils.time_windows)
+        Index("ix_inventory_alert_tenant_alert_date", "tenant_id", "alert_date"),
+    )
+
 class AlertConfiguration(TenantMixin, Base):
     __tablename__ = "alert_configurations"
     
@@ -264,13 +313,25 @@ class AlertNotification(TenantMixin, Base):
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     alert_id = Column(UUID, ForeignKey("inventory_alert.id", ondelete="CASCADE"))
+    alert_ids = Column(JSON, nullable=True)  # every alert a digest covers (alert_id is the first)
     channel = Column(String(20))  # email, sms, in_app
     recipient_user_id = Column(Integer, ForeignKey("users.id"))
     recipient_contact = Column(String)  # email address or phone number
     status = Column(String(20))  # sent, failed, pending
     sent_at = Column(DateTime)
     error_message = Column(Text)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    next_attempt_at = Column(DateTime, nullable=True)  # retry backoff for pending rows
     created_at = Column(DateTime, server_default=func.now())
     
     alert = relationship("InventoryAlert")
-    recipient = relationship("User")       
\ No newline at end of file
+    recipient = relationship("User")
+
+    __table_args__ = (
+        # outbox drain: due pending rows per channel
+        Index(
+            "ix_alert_notifications_pending",
+            "channel", "next_attempt_at",
+            postgresql_where=text("status = 'pending'")
+        ),
+    )       
\ No newline at end of file
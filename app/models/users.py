@@ -27,6 +27,7 @@ class User(TenantMixin,Base):
     is_active = Column(Boolean, default=True)
     is_2fa_enabled = Column(Boolean, default=False)
     failed_login_attempts = Column(Integer, default=0)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # bumped to revoke issued tokens
     last_login = Column(DateTime(timezone=True))
     tenant_id = Column(
         UUID(as_uuid=True),
@@ -0,0 +1,29 @@
+# app/notification_tasks.py
+import logging
+
+from app.celery_app import celery_app
+from app.db.session import SessionLocal
+from app.services.notification_service import NotificationService
+
+logger = logging.getLogger(__name__)
+
+
+@celery_app.task(
+    name="app.notification_tasks.dispatch_pending_notifications",
+    soft_time_limit=120,
+    time_limit=150
+)
+def dispatch_pending_notifications(channel: str = "email"):
+    """Drain one batch of the notification outbox for a channel"""
+    db = SessionLocal()
+    try:
+        stats = NotificationService(db).dispatch_pending(channel)
+        if stats["claimed"]:
+            logger.info(f"Notification dispatch ({channel}): {stats}")
+        return stats
+    except Exception as e:
+        logger.error(f"Error dispatching {channel} notifications: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
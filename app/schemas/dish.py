@@ -221,6 +221,26 @@ class BatchDishPreparation(BaseModel):
     preparations: List[SingleDishPreparation]
     batch_notes: Optional[str] = None
 
+class DishFeasibilityItem(BaseModel):
+    """Dish and quantity to check against current stock"""
+    dish_id: int
+    quantity: int = Field(gt=0, description="Number of dishes wanted")
+
+class DishFeasibilityRequest(BaseModel):
+    """Dry-run check of which dishes can be prepared right now"""
+    items: List[DishFeasibilityItem]
+
+class DishFeasibilityResult(BaseModel):
+    """How many of a dish the current stock can cover"""
+    dish_id: int
+    dish_name: Optional[str] = None
+    requested_quantity: int
+    max_quantity: int
+    can_prepare: bool
+    binding_ingredient: Optional[str] = None
+    shortages: List[dict] = []
+    message: Optional[str] = None
+
 class PreparationResult(BaseModel):
     """Result of dish preparation"""
     preparation_log_id: int
@@ -1,7 +1,7 @@
 # app/schemas/inventory.py
 from pydantic import BaseModel, ConfigDict , Field
 from datetime import date, datetime
-from typing import List, Optional, Literal
+from typing import Any, Dict, List, Optional, Literal
 from enum import Enum
 from uuid import UUID
 
@@ -120,6 +120,22 @@ class InventoryListResponse(BaseModel):
     message: str
     data: List[InventoryOut]     
 
+class InventoryPageResponse(BaseModel):
+    """A keyset page of inventory rows holding the requested fields; next_cursor is null on the last page"""
+    success: bool
+    message: str
+    data: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    limit: int
+
+class InventoryLookupResponse(BaseModel):
+    """Ranked name lookup results, best match first"""
+    success: bool
+    message: str
+    data: List[Dict[str, Any]]
+    limit: int
+    offset: int
+
 
 
 # class InventorySearch(BaseModel):
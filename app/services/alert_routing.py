@@ -0,0 +1,134 @@
+"""
+app/services/alert_routing.py
+Per-tenant alert routing: who receives which alert, on which channels
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.inventory import AlertConfiguration, AlertType
+from app.models.users import User
+from app.utils.cache import TTLCache, invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNELS = frozenset({"in_app", "email", "sms"})
+
+
+@dataclass(frozen=True)
+class Recipient:
+    """Detached snapshot of the user fields notification fan-out needs"""
+    id: int
+    email: Optional[str]
+    mobile_no: Optional[str]
+    role: Optional[str]
+
+
+def _parse_list(raw) -> List:
+    """AlertConfiguration stores lists as JSON text; accept comma-separated too"""
+    if not raw:
+        return []
+    if isinstance(raw, (list, tuple)):
+        return list(raw)
+    try:
+        value = json.loads(raw)
+        return value if isinstance(value, list) else [value]
+    except (TypeError, ValueError):
+        return [part.strip() for part in str(raw).split(",") if part.strip()]
+
+
+class AlertRoutingTable:
+    """
+    Routing for one tenant, built from active users and active
+    AlertConfiguration rows.
+
+    The most specific active configuration wins: (alert_type, category),
+    then (alert_type, any category), then (any type, category). With no
+    matching configuration an alert goes to every active user whose role is
+    in ALERT_DEFAULT_RECIPIENT_ROLES (all active users when that is empty) on
+    all channels.
+    """
+
+    def __init__(self, users: List[Recipient], configurations: List[AlertConfiguration]):
+        self.users = {user.id: user for user in users}
+        allowed_roles = set(settings.ALERT_DEFAULT_RECIPIENT_ROLES)
+        self.default_recipients = tuple(
+            user for user in users if not allowed_roles or user.role in allowed_roles
+        )
+
+        self.rules: Dict[Tuple[Optional[AlertType], Optional[int]], Tuple[Tuple[Recipient, ...], FrozenSet[str]]] = {}
+        for config in configurations:
+            user_ids = {int(user_id) for user_id in _parse_list(config.recipient_user_ids) if str(user_id).isdigit()}
+            recipients = (
+                tuple(self.users[user_id] for user_id in sorted(user_ids) if user_id in self.users)
+                if user_ids else self.default_recipients
+            )
+            channels = frozenset(_parse_list(config.notification_channels)) or DEFAULT_CHANNELS
+            self.rules[(config.alert_type, config.item_category_id)] = (recipients, channels)
+
+        self.has_category_rules = any(category_id is not None for _, category_id in self.rules)
+        self._resolved: Dict[Tuple[Optional[AlertType], Optional[int]], Tuple[Tuple[Recipient, ...], FrozenSet[str]]] = {}
+
+    def resolve(
+        self,
+        alert_type: Optional[AlertType],
+        item_category_id: Optional[int] = None
+    ) -> Tuple[Tuple[Recipient, ...], FrozenSet[str]]:
+        """Recipients and channels for an alert"""
+        key = (alert_type, item_category_id)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            resolved = (
+                self.rules.get(key)
+                or self.rules.get((alert_type, None))
+                or (self.rules.get((None, item_category_id)) if item_category_id is not None else None)
+                or (self.default_recipients, DEFAULT_CHANNELS)
+            )
+            self._resolved[key] = resolved
+        return resolved
+
+
+_routing_cache = TTLCache(
+    maxsize=settings.ALERT_ROUTING_CACHE_MAX_TENANTS,
+    ttl=settings.ALERT_ROUTING_CACHE_TTL_SECONDS
+)
+
+
+def _load_routing_table(db: Session, tenant_id: UUID) -> AlertRoutingTable:
+    users = [
+        Recipient(id=row.id, email=row.email, mobile_no=row.mobile_no,
+                  role=row.role.value if row.role is not None else None)
+        for row in db.query(User.id, User.email, User.mobile_no, User.role).filter(
+            User.tenant_id == tenant_id,
+            User.is_active == True
+        ).order_by(User.id).all()
+    ]
+    configurations = db.query(AlertConfiguration).filter(
+        AlertConfiguration.tenant_id == tenant_id,
+        AlertConfiguration.is_active == True
+    ).all()
+
+    logger.info(f"Loaded alert routing for tenant {tenant_id}: {len(users)} users, {len(configurations)} rules")
+    return AlertRoutingTable(users, configurations)
+
+
+def get_routing_table(db: Session, tenant_id: UUID) -> AlertRoutingTable:
+    """Cached routing table for the tenant"""
+    return _routing_cache.get_or_set(tenant_id, lambda: _load_routing_table(db, tenant_id))
+
+
+def invalidate_routing(tenant_id: Optional[UUID] = None) -> None:
+    if tenant_id is None:
+        _routing_cache.clear()
+    else:
+        _routing_cache.invalidate(tenant_id)
+
+
+# Users or alert configurations flushed in a transaction drop the tenant's
+# routing table once it commits
+invalidate_on_commit((User, AlertConfiguration), "routing_tenants", invalidate_routing)
@@ -1,16 +1,20 @@
 # app/services/alert_service.py
-from typing import List, Optional
-from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 from uuid import UUID
-from sqlalchemy import select
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
+from app.models.dish import Dish, DishIngredient
 from app.models.inventory import (
     Inventory, InventoryBatch, InventoryAlert, AlertType, 
     AlertStatus, ItemCategory
 )
 from app.services.notification_service import NotificationService
 
+OPEN_ALERT_STATUSES = (AlertStatus.ACTIVE, AlertStatus.SNOOZED)
+
 class AlertService:
     def __init__(self, db: Session, tenant_id: UUID, branch_id: Optional[int] = None):
         self.db = db
@@ -18,252 +22,273 @@ class AlertService:
         # self.branch_id = branch_id
         
     
-    def check_and_create_alerts(self):
-        """Main method to check all alert conditions"""
-        self.check_low_stock_alerts()
-        self.check_out_of_stock_alerts()
-        self.check_expiry_alerts()
+    def check_and_create_alerts(self) -> List[UUID]:
+        """
+        Main method to check all alert conditions.
+
+        Reconciles the tenant's alerts: the desired alert set is computed with
+        set-based queries, diffed against open (ACTIVE/SNOOZED) alerts in one
+        query, missing alerts are inserted with one multi-row INSERT and their
+        notifications queued in the outbox in the same transaction.
+        """
+        today = datetime.now().date()
+
+        desired = []
+        desired.extend(self.check_low_stock_alerts())
+        desired.extend(self.check_out_of_stock_alerts())
+        desired.extend(self.check_expiry_alerts(today))
+        desired.extend(self.check_batch_empty_alerts())
+        self.mark_expired_batch_alerts(today)
+
+        new_alert_ids = self._insert_missing_alerts(desired)
+        if new_alert_ids:
+            self._send_notifications(new_alert_ids)
         self.cleanup_resolved_alerts()
-        self.check_batch_empty_alerts() 
+        return new_alert_ids
 
-    def check_batch_empty_alerts(self):
-        """Check for batches that are completely depleted"""
-    
-    # Get all active batches with no remaining quantity
-        empty_batches = self.db.query(InventoryBatch).join(Inventory).filter(
+    def check_batch_empty_alerts(self) -> List[dict]:
+        """Desired alerts for batches that are completely depleted"""
+        empty_batches = self.db.query(
+            InventoryBatch.id,
+            InventoryBatch.inventory_item_id,
+            InventoryBatch.batch_number,
+            InventoryBatch.quantity_received,
+            Inventory.name
+        ).join(Inventory, InventoryBatch.inventory_item_id == Inventory.id).filter(
             InventoryBatch.tenant_id == self.tenant_id,
             InventoryBatch.is_active == True,
             InventoryBatch.quantity_remaining <= 0
         ).all()
-        
-        for batch in empty_batches:
-            # Check if alert already exists
-            existing_alert = self.db.query(InventoryAlert).filter(
-                InventoryAlert.batch_id == batch.id,
-                InventoryAlert.alert_type == AlertType.BATCH_EMPTY,
-                InventoryAlert.status == AlertStatus.ACTIVE
-            ).first()
-            
-            if not existing_alert:
-                self._create_alert(
-                    inventory_item=batch.item,
-                    batch_id=batch.id,
-                    alert_type=AlertType.BATCH_EMPTY,
-                    message=f"Batch {batch.batch_number} of {batch.item.name} is depleted",
-                    current_quantity=Decimal(0),
-                    threshold_value=batch.quantity_received,
-                    suggested_action=f"Mark batch as inactive or reorder",
-                    priority="medium"
-                )    
-        
 
-    def check_low_stock_alerts(self):
-        """Check for items below reorder point"""
-        query = self.db.query(Inventory).filter(
+        return [
+            {
+                "inventory_item_id": batch.inventory_item_id,
+                "batch_id": batch.id,
+                "alert_type": AlertType.BATCH_TYPE,
+                "message": f"Batch {batch.batch_number} of {batch.name} is depleted",
+                "current_quantity": Decimal(0),
+                "threshold_value": batch.quantity_received,
+                "suggested_action": "Mark batch as inactive or reorder",
+                "priority": "medium"
+            }
+            for batch in empty_batches
+        ]
+
+    def check_low_stock_alerts(self) -> List[dict]:
+        """Desired alerts for items below reorder point"""
+        low_stock_items = self.db.query(
+            Inventory.id,
+            Inventory.name,
+            Inventory.unit,
+            Inventory.current_quantity,
+            Inventory.reorder_point,
+            Inventory.reorder_quantity
+        ).filter(
             Inventory.tenant_id == self.tenant_id,
             Inventory.is_active == True,
             Inventory.current_quantity < Inventory.reorder_point,
             Inventory.current_quantity > 0  # Not out of stock
-        )
-        
-        # if self.branch_id:
-        #     query = query.filter(Inventory.branch_id == self.branch_id)
-        
-        low_stock_items = query.all()
-        
-        for item in low_stock_items:
-            # Check if alert already exists and is active
-            existing_alert = self.db.query(InventoryAlert).filter(
-                InventoryAlert.inventory_item_id == item.id,
-                InventoryAlert.alert_type == AlertType.LOW_STOCK,
-                InventoryAlert.status == AlertStatus.ACTIVE
-            ).first()
-            
-            if not existing_alert:
-                self._create_alert(
-                    inventory_item=item,
-                    alert_type=AlertType.LOW_STOCK,
-                    message=f"Low stock alert: {item.name} is at {item.current_quantity} {item.unit}",
-                    current_quantity=item.current_quantity,
-                    threshold_value=item.reorder_point,
-                    suggested_action=f"Consider ordering {item.reorder_quantity} {item.unit}",
-                    priority="medium"
-                )
-    
-    def check_out_of_stock_alerts(self):
-        """Check for items that are completely out of stock"""
-        query = self.db.query(Inventory).filter(
+        ).all()
+
+        return [
+            {
+                "inventory_item_id": item.id,
+                "batch_id": None,
+                "alert_type": AlertType.LOW_STOCK,
+                "message": f"Low stock alert: {item.name} is at {item.current_quantity} {item.unit}",
+                "current_quantity": item.current_quantity,
+                "threshold_value": item.reorder_point,
+                "suggested_action": f"Consider ordering {item.reorder_quantity} {item.unit}",
+                "priority": "medium"
+            }
+            for item in low_stock_items
+        ]
+
+    def check_out_of_stock_alerts(self) -> List[dict]:
+        """Desired alerts for items that are completely out of stock"""
+        out_of_stock_items = self.db.query(
+            Inventory.id,
+            Inventory.name,
+            Inventory.unit,
+            Inventory.reorder_point,
+            Inventory.reorder_quantity
+        ).filter(
             Inventory.tenant_id == self.tenant_id,
             Inventory.is_active == True,
             Inventory.current_quantity <= 0
-        )
-        
-        # if self.branch_id:
-        #     query = query.filter(Inventory.branch_id == self.branch_id)
-        
-        out_of_stock_items = query.all()
-        
-        for item in out_of_stock_items:
-            existing_alert = self.db.query(InventoryAlert).filter(
-                InventoryAlert.inventory_item_id == item.id,
-                InventoryAlert.alert_type == AlertType.OUT_OF_STOCK,
-                InventoryAlert.status == AlertStatus.ACTIVE
-            ).first()
-            
-            if not existing_alert:
-                # Find affected dishes
-                affected_dishes = self._get_affected_dishes(item.id)
-                
-                self._create_alert(
-                    inventory_item=item,
-                    alert_type=AlertType.OUT_OF_STOCK,
-                    message=f"CRITICAL: {item.name} is out of stock",
-                    current_quantity=Decimal(0),
-                    threshold_value=item.reorder_point,
-                    suggested_action=f"Immediate reorder required: {item.reorder_quantity} {item.unit}",
-                    affected_dishes=affected_dishes,
-                    priority="critical"
-                )
-    
-    def check_expiry_alerts(self):
-        """Check for batches approaching expiry"""
-        # Get all active batches with expiry dates
-        batches = self.db.query(InventoryBatch).join(Inventory).filter(
+        ).all()
+
+        # affected_dishes is filled in for the alerts that actually get created
+        return [
+            {
+                "inventory_item_id": item.id,
+                "batch_id": None,
+                "alert_type": AlertType.OUT_OF_STOCK,
+                "message": f"CRITICAL: {item.name} is out of stock",
+                "current_quantity": Decimal(0),
+                "threshold_value": item.reorder_point,
+                "suggested_action": f"Immediate reorder required: {item.reorder_quantity} {item.unit}",
+                "priority": "critical"
+            }
+            for item in out_of_stock_items
+        ]
+
+    def check_expiry_alerts(self, today: Optional[date] = None) -> List[dict]:
+        """Desired alerts for batches within their item's expiry alert threshold"""
+        today = today or datetime.now().date()
+        threshold = func.coalesce(Inventory.expiry_alert_threshold_days, 3)
+
+        batches = self.db.query(
+            InventoryBatch.id,
+            InventoryBatch.inventory_item_id,
+            InventoryBatch.batch_number,
+            InventoryBatch.expiry_date,
+            InventoryBatch.quantity_remaining,
+            Inventory.name,
+            threshold.label("threshold")
+        ).join(Inventory, InventoryBatch.inventory_item_id == Inventory.id).filter(
             InventoryBatch.tenant_id == self.tenant_id,
             InventoryBatch.is_active == True,
             InventoryBatch.quantity_remaining > 0,
-            InventoryBatch.expiry_date.isnot(None)
+            InventoryBatch.expiry_date >= today,
+            InventoryBatch.expiry_date - threshold <= today
         ).all()
-        
-        today = datetime.now().date()
-        
+
+        desired = []
         for batch in batches:
             days_to_expiry = (batch.expiry_date - today).days
-            
-            # Get threshold from item or use default
-            threshold = batch.item.expiry_alert_threshold_days or 3
-            
-            if days_to_expiry <= threshold and days_to_expiry >= 0:
-                # Check if alert already exists for this batch
-                existing_alert = self.db.query(InventoryAlert).filter(
-                    InventoryAlert.batch_id == batch.id,
-                    InventoryAlert.alert_type == AlertType.EXPIRY_WARNING,
-                    InventoryAlert.status.in_([AlertStatus.ACTIVE, AlertStatus.SNOOZED])
-                ).first()
-                
-                if not existing_alert:
-                    # Get dishes that can use this ingredient
-                    suggested_dishes = self._get_suggested_dishes_for_expiring_item(
-                        batch.inventory_item_id
-                    )
-                    
-                    priority = "critical" if days_to_expiry <= 1 else "high"
-                    
-                    self._create_alert(
-                        inventory_item=batch.item,
-                        batch_id=batch.id,
-                        alert_type=AlertType.EXPIRY_WARNING,
-                        message=f"{batch.item.name} (Batch: {batch.batch_number}) expires in {days_to_expiry} days",
-                        current_quantity=batch.quantity_remaining,
-                        threshold_value=Decimal(threshold),
-                        suggested_action=f"Use in: {suggested_dishes}" if suggested_dishes else "Mark as waste if cannot use",
-                        priority=priority
-                    )
-            
-            # Handle already expired items
-            elif days_to_expiry < 0:
-                existing_alert = self.db.query(InventoryAlert).filter(
-                    InventoryAlert.batch_id == batch.id,
-                    InventoryAlert.alert_type == AlertType.EXPIRY_WARNING,
-                    InventoryAlert.status == AlertStatus.ACTIVE
-                ).first()
-                
-                if existing_alert:
-                    # Update message to indicate expired
-                    existing_alert.message = f"EXPIRED: {batch.item.name} (Batch: {batch.batch_number}) expired {abs(days_to_expiry)} days ago"
-                    existing_alert.priority = "critical"
-                    existing_alert.suggested_action = "Mark as waste immediately"
-    
-    def _create_alert(
-        self,
-        inventory_item: Inventory,
-        alert_type: AlertType,
-        message: str,
-        current_quantity: Decimal,
-        threshold_value: Decimal,
-        suggested_action: str,
-        batch_id: Optional[int] = None,
-        affected_dishes: Optional[str] = None,
-        priority: str = "medium"
-    ):
-        """Create a new alert"""
-        alert = InventoryAlert(
-            tenant_id=self.tenant_id,
-            # branch_id=self.branch_id,
-            inventory_item_id=inventory_item.id,
-            batch_id=batch_id,
-            alert_type=alert_type,
-            status=AlertStatus.ACTIVE,
-            priority=priority,
-            message=message,
-            current_quantity=current_quantity,
-            threshold_value=threshold_value,
-            suggested_action=suggested_action,
-            affected_dishes=affected_dishes,
-            alert_date=datetime.now()
-        )
-        
-        self.db.add(alert)
-        self.db.commit()
-        self.db.refresh(alert)
-        
-        # Trigger notification delivery
-        self._send_notifications(alert)
-        
-        return alert
-    
-    def _get_affected_dishes(self, inventory_item_id: int) -> Optional[str]:
-        """Get list of dishes that cannot be prepared due to missing ingredient"""
-        # This assumes you have a Dish and DishIngredient model
-        # Adjust based on your actual schema
-        try:
-            from app.models import Dish, DishIngredient
-            
-            dishes = self.db.query(Dish).join(DishIngredient).filter(
-                DishIngredient.inventory_item_id == inventory_item_id,
-                Dish.is_active == True
+            # suggested_action is filled in for the alerts that actually get created
+            desired.append({
+                "inventory_item_id": batch.inventory_item_id,
+                "batch_id": batch.id,
+                "alert_type": AlertType.EXPIRY_WARNING,
+                "message": f"{batch.name} (Batch: {batch.batch_number}) expires in {days_to_expiry} days",
+                "current_quantity": batch.quantity_remaining,
+                "threshold_value": Decimal(batch.threshold),
+                "priority": "critical" if days_to_expiry <= 1 else "high"
+            })
+        return desired
+
+    def mark_expired_batch_alerts(self, today: Optional[date] = None) -> int:
+        """Rewrite active expiry warnings of batches that have now expired"""
+        today = today or datetime.now().date()
+
+        expired = self.db.query(
+            InventoryAlert.id,
+            InventoryBatch.batch_number,
+            InventoryBatch.expiry_date,
+            Inventory.name
+        ).join(
+            InventoryBatch, InventoryAlert.batch_id == InventoryBatch.id
+        ).join(
+            Inventory, InventoryBatch.inventory_item_id == Inventory.id
+        ).filter(
+            InventoryAlert.tenant_id == self.tenant_id,
+            InventoryAlert.alert_type == AlertType.EXPIRY_WARNING,
+            InventoryAlert.status == AlertStatus.ACTIVE,
+            InventoryBatch.is_active == True,
+            InventoryBatch.quantity_remaining > 0,
+            InventoryBatch.expiry_date < today
+        ).all()
+
+        if expired:
+            self.db.execute(
+                update(InventoryAlert),
+                [
+                    {
+                        "id": alert.id,
+                        "message": f"EXPIRED: {alert.name} (Batch: {alert.batch_number}) expired {(today - alert.expiry_date).days} days ago",
+                        "priority": "critical",
+                        "suggested_action": "Mark as waste immediately"
+                    }
+                    for alert in expired
+                ]
+            )
+        return len(expired)
+
+    def _insert_missing_alerts(self, desired: List[dict]) -> List[UUID]:
+        """Insert desired alerts that have no open counterpart; returns the new alert ids"""
+        if not desired:
+            return []
+
+        open_keys = {
+            (alert_type, inventory_item_id, batch_id)
+            for alert_type, inventory_item_id, batch_id in self.db.query(
+                InventoryAlert.alert_type,
+                InventoryAlert.inventory_item_id,
+                InventoryAlert.batch_id
+            ).filter(
+                InventoryAlert.tenant_id == self.tenant_id,
+                InventoryAlert.status.in_(OPEN_ALERT_STATUSES)
             ).all()
-            
-            if dishes:
-                return ", ".join([dish.name for dish in dishes])
-        except:
-            pass
-        
-        return None
-    
-    def _get_suggested_dishes_for_expiring_item(self, inventory_item_id: int) -> Optional[str]:
-        """Get dishes that can use the expiring ingredient"""
-        try:
-            from app.models import Dish, DishIngredient
-            
-            dishes = self.db.query(Dish).join(DishIngredient).filter(
-                DishIngredient.inventory_item_id == inventory_item_id,
-                Dish.is_active == True
-            ).limit(5).all()
-            
-            if dishes:
-                return ", ".join([dish.name for dish in dishes[:3]])
-        except:
-            pass
-        
-        return None
-    
-    def _send_notifications(self, alert: InventoryAlert):
-        """Queue notifications for delivery"""
-        # This will be implemented in the notification service
-        #         
+        }
+
+        missing = []
+        seen = set()
+        for alert in desired:
+            key = (alert["alert_type"], alert["inventory_item_id"], alert["batch_id"])
+            if key in open_keys or key in seen:
+                continue
+            seen.add(key)
+            missing.append(alert)
+
+        if not missing:
+            return []
+
+        # Dish lookups only for the alerts being created, one query for all of them
+        dish_item_ids = {
+            alert["inventory_item_id"] for alert in missing
+            if alert["alert_type"] in (AlertType.OUT_OF_STOCK, AlertType.EXPIRY_WARNING)
+        }
+        dishes_by_item = self._get_dish_names_by_item(dish_item_ids)
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for alert in missing:
+            dish_names = dishes_by_item.get(alert["inventory_item_id"], [])
+            if alert["alert_type"] == AlertType.OUT_OF_STOCK:
+                alert["affected_dishes"] = ", ".join(dish_names) if dish_names else None
+            elif alert["alert_type"] == AlertType.EXPIRY_WARNING:
+                alert["suggested_action"] = (
+                    f"Use in: {', '.join(dish_names[:3])}" if dish_names else "Mark as waste if cannot use"
+                )
+
+            rows.append({
+                "tenant_id": self.tenant_id,
+                "status": AlertStatus.ACTIVE,
+                "alert_date": now,
+                "affected_dishes": None,
+                **alert
+            })
+
+        # The partial unique index on open alerts absorbs concurrent sweeps
+        stmt = pg_insert(InventoryAlert).values(rows).on_conflict_do_nothing().returning(InventoryAlert.id)
+        return list(self.db.execute(stmt).scalars())
+
+    def _get_dish_names_by_item(self, inventory_item_ids) -> Dict[int, List[str]]:
+        """Active dish names using each ingredient"""
+        if not inventory_item_ids:
+            return {}
+
+        rows = self.db.query(DishIngredient.ingredient_id, Dish.name).join(
+            Dish, DishIngredient.dish_id == Dish.id
+        ).filter(
+            DishIngredient.ingredient_id.in_(inventory_item_ids),
+            Dish.tenant_id == self.tenant_id,
+            Dish.is_active == True
+        ).order_by(Dish.id).all()
+
+        dishes_by_item = {}
+        for inventory_item_id, dish_name in rows:
+            names = dishes_by_item.setdefault(inventory_item_id, [])
+            if dish_name not in names:
+                names.append(dish_name)
+        return dishes_by_item
+
+    def _send_notifications(self, alert_ids: List[UUID]):
+        """Queue notifications for delivery (outbox rows, committed with the alerts)"""
         notification_service = NotificationService(self.db)
-        notification_service.send_alert_notifications(alert)
+        notification_service.send_bulk_alert_notifications(alert_ids)
     
     def cleanup_resolved_alerts(self):
         now = datetime.utcnow()
@@ -0,0 +1,87 @@
+"""
+app/services/dish_catalogue.py
+Per-tenant dish catalogue (dishes with their type and ingredients), cached per process
+"""
+import logging
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, joinedload, selectinload
+
+from app.core.config import settings
+from app.models.dish import Dish, DishIngredient, DishType
+from app.schemas.dish import DishIngredientOut, DishOut, DishTypeOut
+from app.utils.cache import TTLCache, invalidate_on_commit
+
+logger = logging.getLogger(__name__)
+
+
+def catalogue_entry(dish: Dish) -> dict:
+    """DishOut of a dish whose type and dish_ingredient are loaded, as JSON-ready data"""
+    return DishOut(
+        id=dish.id,
+        name=dish.name,
+        tenant_id=dish.tenant_id,
+        type_id=dish.type_id,
+        standard_portion_size=dish.standard_portion_size,
+        yield_quantity=dish.yield_quantity,
+        preparation_time_minutes=dish.preparation_time_minutes,
+        selling_price=dish.selling_price,
+        is_active=dish.is_active if dish.is_active is not None else True,
+        type=DishTypeOut(id=dish.type.id, name=dish.type.name),
+        ingredients=[
+            DishIngredientOut(
+                ingredient_name=di.ingredient_name,
+                quantity_required=di.quantity_required,
+                unit=di.unit,
+                cost_per_unit=di.cost_per_unit
+            )
+            for di in dish.dish_ingredient if di.ingredient_name is not None
+        ]
+    ).model_dump(mode="json")
+
+
+def catalogue_statement(tenant_id: UUID):
+    """
+    All of a tenant's dishes by name. Types are joined in and ingredients
+    come from one SELECT ... IN, so the catalogue costs two queries.
+    """
+    return (
+        select(Dish)
+        .where(Dish.tenant_id == tenant_id)
+        .options(joinedload(Dish.type), selectinload(Dish.dish_ingredient))
+        .order_by(Dish.name, Dish.id)
+    )
+
+
+_catalogue_cache = TTLCache(
+    maxsize=settings.DISH_CATALOGUE_CACHE_MAX_TENANTS,
+    ttl=settings.DISH_CATALOGUE_CACHE_TTL_SECONDS
+)
+
+
+def _load_catalogue(db: Session, tenant_id: UUID) -> List[dict]:
+    dishes = db.execute(catalogue_statement(tenant_id)).unique().scalars().all()
+    logger.info(f"Loaded dish catalogue for tenant {tenant_id}: {len(dishes)} dishes")
+    return [catalogue_entry(dish) for dish in dishes]
+
+
+def get_catalogue(db: Session, tenant_id: UUID, is_active: Optional[bool] = None) -> List[dict]:
+    """Cached serialised catalogue for the tenant, optionally only (in)active dishes"""
+    catalogue = _catalogue_cache.get_or_set(tenant_id, lambda: _load_catalogue(db, tenant_id))
+    if is_active is None:
+        return catalogue
+    return [entry for entry in catalogue if entry["is_active"] == is_active]
+
+
+def invalidate_catalogue(tenant_id: Optional[UUID] = None) -> None:
+    if tenant_id is None:
+        _catalogue_cache.clear()
+    else:
+        _catalogue_cache.invalidate(tenant_id)
+
+
+# Dishes, dish types or ingredients flushed in a transaction drop the tenant's
+# catalogue once it commits
+invalidate_on_commit((Dish, DishType, DishIngredient), "catalogue_tenants", invalidate_catalogue)
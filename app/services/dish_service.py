@@ -1,16 +1,27 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import Select, and_, or_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime , timedelta, timezone
-from typing import Dict, List,Optional,Tuple
+from typing import AsyncIterator, Dict, List,Optional, Sequence,Tuple
 from decimal import Decimal
+from bisect import bisect_left
+from itertools import accumulate
 from app.models.dish import Dish, DishIngredient, DishPreparationBatch , PrePreparedMaterial, PreparationBatchStatus,PreparationIngredientHistory,PrePreparedMaterialStock,IngredientForPrePreparedIngredients,DishPreparationBatchLog
-from app.models.inventory import Inventory,InventoryBatch, InventoryTransaction, PerishableLifecycle, TransactionType
+from app.models.inventory import Inventory,InventoryBatch, InventoryTransaction, TransactionType
 from app.models.users import User
-from app.schemas.dish import BatchInfo, BatchPreparationResult,DishCreate,DishIngredientResponse, DishIngredientType,DishTypeUpdate,DishUpdate,AddDishIngredient,PreparationResult,SemiFinishedProductCreate, SingleDishPreparation
+from app.schemas.dish import BatchInfo, BatchPreparationResult,DishCreate,DishFeasibilityItem,DishFeasibilityResult,DishIngredientResponse, DishIngredientType,DishTypeUpdate,DishUpdate,AddDishIngredient,PreparationResult,SemiFinishedProductCreate, SingleDishPreparation
 from uuid import UUID
 import uuid
 from enum import Enum
 from app.utils.common_unit_converter import convert_quantity_unit
+from app.services.production_rollup_service import ProductionRollupService
+from app.services.stock_allocation_service import StockAllocationService
+from app.services.stock_level_service import StockLevelService
+from app.utils.pagination import Page, keyset_paginate
+
+# Keyset for preparation history, newest first; matches ix_dish_prep_logs_tenant_date_id
+PREPARATION_HISTORY_KEYSET = (DishPreparationBatchLog.preparation_date, DishPreparationBatchLog.id)
+
 
 class SemiFinishedService:
 
@@ -194,7 +205,25 @@ class SemiFinishedService:
         Produce a batch of semi-finished product
         Deducts raw ingredients from inventory
         Creates stock batch for later use
+        Concurrent updates to the same stock are retried with bounded backoff
         """
+        return StockAllocationService.run_with_retry(
+            db,
+            lambda: SemiFinishedService._produce_semi_finished_batch(
+                db, tenant_id, product_id, quantity_to_produce, user_id, notes
+            )
+        )
+
+    @staticmethod
+    def _produce_semi_finished_batch(
+        db: Session,
+        tenant_id: int,
+        product_id: UUID,
+        quantity_to_produce: float,
+        user_id: int,
+        notes: Optional[str] = None
+    ) -> dict:
+        """Single attempt of produce_semi_finished_batch"""
         
         # Get product
         product = db.query(PrePreparedMaterial).filter(
@@ -214,21 +243,23 @@ class SemiFinishedService:
         
         # Calculate multiplier (how many times to scale recipe)
         multiplier = Decimal(str(quantity_to_produce)) / product.yield_quantity
+
+        # Lock batches first, then inventory rows (same order as prepare_dish)
+        ingredient_ids = [ing.ingredient_id for ing in ingredients]
+        StockAllocationService.set_lock_timeout(db)
+        batch_pool = StockAllocationService.load_batch_pool(db, tenant_id, ingredient_ids, lock=True)
+        inventories = StockAllocationService.load_inventory_items(db, tenant_id, ingredient_ids, lock=True)
         
         total_cost = Decimal(0)
         consumptions = []
+        inventory_deductions = {}
         
         # Deduct raw ingredients
         for ing in ingredients:
             qty_needed = ing.quantity_required * multiplier
 
             # Get inventory first (needed for unit and standalone fallback)
-            inventory = db.query(Inventory).filter(
-                and_(
-                    Inventory.tenant_id == tenant_id,
-                    Inventory.id == ing.ingredient_id
-                )
-            ).first()
+            inventory = inventories.get(ing.ingredient_id)
 
             if not inventory:
                 raise ValueError(f"Inventory not found for {ing.ingredient_name}")
@@ -240,25 +271,13 @@ class SemiFinishedService:
                 to_unit=inventory.unit
             )
 
-            # Check if batches exist
-            batches = db.query(InventoryBatch).filter(
-                and_(
-                    InventoryBatch.tenant_id == tenant_id,
-                    InventoryBatch.inventory_item_id == ing.ingredient_id,
-                    InventoryBatch.is_active == True,
-                    InventoryBatch.quantity_remaining > 0
-                )
-            ).order_by(
-                InventoryBatch.expiry_date.asc().nullslast(),
-                InventoryBatch.created_at.asc()
-            ).all()
+            already_deducted = inventory_deductions.get(inventory.id, Decimal(0))
+            lots = batch_pool.get(ing.ingredient_id)
 
-            if batches: # use batches as fifo/fefo
+            if lots is not None: # use batches as fifo/fefo (an empty list: only expired batches left)
 
                 # Check total available across ALL batches
-                total_available = sum(
-                    Decimal(str(b.quantity_remaining)) for b in batches
-                )
+                total_available = StockAllocationService.available(lots)
 
                 if total_available < qty_in_inventory_unit:
                     raise ValueError(
@@ -268,30 +287,17 @@ class SemiFinishedService:
                     )
                 
                 # Allocate across multiple batches (FIFO/FEFO)
-                qty_remaining = qty_in_inventory_unit
                 ingredient_cost = Decimal(0)
 
-                for batch in batches:
-                    if qty_remaining <= 0:
-                        break
-
-                    batch_qty_remaining = Decimal(str(batch.quantity_remaining))
-                    batch_unit_cost = Decimal(str(batch.unit_cost)) if batch.unit_cost else Decimal(0)
-
-                    # Take as much as needed or available in this batch
-                    qty_from_batch = min(batch_qty_remaining, qty_remaining)
-
-                    # DEDUCT from batch
-                    batch.quantity_remaining = float(batch_qty_remaining - qty_from_batch)
-
+                for lot, qty_from_batch in StockAllocationService.allocate(lots, qty_in_inventory_unit):
                     # Calculate cost for this batch
-                    cost = qty_from_batch * batch_unit_cost
+                    cost = qty_from_batch * lot["unit_cost"]
                     ingredient_cost += cost
 
                     # Log each batch used in consumptions
                     consumptions.append({
                         "ingredient_name": ing.ingredient_name,
-                        "batch_number": batch.batch_number,
+                        "batch_number": lot["batch_number"],
                         "quantity_consumed": float(qty_from_batch),
                         "unit": inventory.unit,
                         "quantity_consumed_recipe_unit": float(
@@ -305,16 +311,11 @@ class SemiFinishedService:
                         "cost": float(cost)
                     })
 
-                    qty_remaining -= qty_from_batch
-
-                # DEDUCT from inventory total (once per ingredient, outside batch loop)
-                current_qty = Decimal(str(inventory.current_quantity)) if inventory.current_quantity else Decimal(0)
-                inventory.current_quantity = float(current_qty - qty_in_inventory_unit)
-
                 total_cost += ingredient_cost
 
             else: # use inventory items directly
                 current_qty = Decimal(str(inventory.current_quantity)) if inventory.current_quantity else Decimal(0)
+                current_qty -= already_deducted
 
                 if current_qty < qty_in_inventory_unit:
                     raise ValueError(
@@ -332,9 +333,6 @@ class SemiFinishedService:
                             f"(expired on {inventory.expiry_date})"
                         )
 
-                # Deduct from inventory directly
-                inventory.current_quantity = float(current_qty - qty_in_inventory_unit)
-
                 # Cost from inventory unit_cost
                 unit_cost = Decimal(str(inventory.unit_cost)) if inventory.unit_cost else Decimal(0)
                 cost = qty_in_inventory_unit * unit_cost
@@ -356,6 +354,14 @@ class SemiFinishedService:
                     "recipe_unit": ing.unit,
                     "cost": float(cost)
                 })
+
+            # DEDUCT from inventory total (once per ingredient, after allocation)
+            inventory_deductions[inventory.id] = already_deducted + qty_in_inventory_unit
+
+        # Write all deductions: one UPDATE per table
+        StockAllocationService.apply_batch_deductions(db, batch_pool)
+        StockAllocationService.apply_inventory_deductions(db, tenant_id, inventory_deductions)
+        StockLevelService.apply_deltas(db, tenant_id, StockLevelService.deltas_from_pool(batch_pool))
         
         # Generate batch number for semi-finished product
         batch_number = f"SF_{product.name[:3].upper()}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -456,10 +462,19 @@ class DishIngredientService:
         tenant_id: int,
         ingredient_id: int,
         quantity_required: float,
-        unit: str
+        unit: str,
+        include_suggestions: bool = True,
+        suggestions_limit: Optional[int] = None,
+        suggestions_offset: int = 0
     ) -> Dict[str, any]:
         """
         Get FIFO/FEFO batch suggestions for ingredient
+
+        Batches are processed column-wise: quantities, cumulative availability,
+        the allocation cutoff, expiry days and costs are computed as lists in
+        one pass, and per-batch detail is only built for allocated batches
+        (allocation_plan) and, when include_suggestions is set, for the
+        requested page of suggestions.
         """
         
         # Get inventory item
@@ -483,8 +498,15 @@ class DishIngredientService:
                 "expired_count": 0
             }
         
-        # Get all available batches sorted by FEFO/FIFO
-        batches = db.query(InventoryBatch).filter(
+        # Get all available batches sorted by FEFO/FIFO (columns only)
+        rows = db.query(
+            InventoryBatch.id,
+            InventoryBatch.batch_number,
+            InventoryBatch.expiry_date,
+            InventoryBatch.quantity_remaining,
+            InventoryBatch.unit_cost,
+            InventoryBatch.lifecycle_stage
+        ).filter(
             and_(
                 InventoryBatch.tenant_id == tenant_id,
                 InventoryBatch.inventory_item_id == ingredient_id,
@@ -496,7 +518,7 @@ class DishIngredientService:
             InventoryBatch.created_at.asc()
         ).all()
         
-        if not batches:
+        if not rows:
             return {
                 "suggestions": [],
                 "total_available": 0,
@@ -509,159 +531,121 @@ class DishIngredientService:
                 "expired_count": 0
             }
         
-        suggestions = []
-        total_available = Decimal(0)
-        warnings = []
-        allocation_plan = []
-        
         today = datetime.now().date()
         inventory_unit = inventory.unit
 
-
         quantity_needed_inventory = convert_quantity_unit(
             value=Decimal(str(quantity_required)),
             from_unit=unit,
             to_unit=inventory_unit
         )
+        # Unit conversion is linear: convert once, multiply per batch
+        to_recipe_unit = convert_quantity_unit(
+            value=Decimal(1),
+            from_unit=inventory_unit,
+            to_unit=unit
+        )
 
-        quantity_allocated = Decimal(0)
-        
-        near_expiry_count = 0
-        expired_count = 0
-        
-        for idx, batch in enumerate(batches, start=1):
-            # CRITICAL FIX: Handle Enum properly
-            lifecycle_raw = batch.lifecycle_stage
-            
-            if lifecycle_raw is None:
-                lifecycle_stage = ""
-            elif isinstance(lifecycle_raw, Enum):
-                # Extract Enum value: PerishableLifecycle.NEAR_EXPIRY -> "NEAR_EXPIRY"
-                lifecycle_stage = lifecycle_raw.value.lower()
-            elif isinstance(lifecycle_raw, str):
-                lifecycle_stage = lifecycle_raw.strip().lower()
-            else:
-                lifecycle_stage = str(lifecycle_raw).strip().lower()
-            
-            # Calculate days until expiry
-            days_until_expiry = None
-            if batch.expiry_date:
-                days_until_expiry = (batch.expiry_date - today).days
-            
-            # Determine flags based on NORMALIZED lifecycle_stage
-            is_near_expiry = (lifecycle_stage == "near_expiry")
-            is_expired = (lifecycle_stage == "expired")
-            is_fresh = (lifecycle_stage == "fresh")
-            
-            # Update counts
-            if is_near_expiry:
-                near_expiry_count += 1
-            if is_expired:
-                expired_count += 1
-            
-            # Generate suggestion reason
-            if is_expired:
-                suggestion_reason = f"EXPIRED {abs(days_until_expiry) if days_until_expiry else 'unknown'} days ago - DO NOT USE"
-            elif is_near_expiry:
-                suggestion_reason = f"URGENT: Expires in {days_until_expiry} day{'s' if days_until_expiry != 1 else ''} - USE FIRST (FEFO)"
-            elif is_fresh:
-                if days_until_expiry:
-                    suggestion_reason = f"Fresh batch - expires in {days_until_expiry} days"
-                else:
-                    suggestion_reason = "Fresh batch - no expiry date"
-            else:
-                # Fallback for unknown lifecycle or no expiry tracking
-                if idx == 1:
-                    suggestion_reason = "Oldest batch (FIFO) - no expiry tracking"
-                else:
-                    suggestion_reason = "Available batch - no expiry tracking"
-            
-            # Calculate allocation
-            quantity_from_this_batch = Decimal(0)
-            can_use_this_batch = not is_expired
-            
-            if can_use_this_batch and quantity_allocated < quantity_needed_inventory:
-                remaining_needed = quantity_needed_inventory - quantity_allocated
-                available_in_batch = Decimal(str(batch.quantity_remaining))
-                quantity_from_this_batch = min(remaining_needed, available_in_batch)
-                quantity_allocated += quantity_from_this_batch
-                
-                # Convert Enum to string for JSON serialization
-                lifecycle_stage_str = lifecycle_raw.value if isinstance(lifecycle_raw, Enum) else lifecycle_raw
-                
-                allocation_plan.append({
-                    "batch_id": batch.id,
-                    "batch_number": batch.batch_number,
-                    "quantity_to_use": float(quantity_from_this_batch),
-                    "unit": inventory_unit,
-                    "quantity_to_use_recipe_unit": float(           # also show in recipe unit
-                        convert_quantity_unit(
-                            value=quantity_from_this_batch,
-                            from_unit=inventory_unit,
-                            to_unit=unit
-                        )
-                    ),
-                    "recipe_unit": unit,
-                    "cost": float(quantity_from_this_batch * (batch.unit_cost or Decimal(0))),
-                    "lifecycle_stage": lifecycle_stage_str,
-                    "priority": idx,
-                    "suggestion_reason": suggestion_reason
-                })
-                
-                # Add warning for near-expiry batches being used
-                if is_near_expiry:
-                    warnings.append(
-                        f"Using near-expiry batch {batch.batch_number} - expires in {days_until_expiry} day{'s' if days_until_expiry != 1 else ''}"
-                    )
-            
-            # Track total available (excluding expired)
-            if not is_expired:
-                total_available +=  Decimal(str(batch.quantity_remaining))
-            
-            # Add expired warning
-            if is_expired:
-                warnings.append(
-                    f"Batch {batch.batch_number} is EXPIRED - excluded from allocation"
+        # Columns
+        batch_ids, batch_numbers, expiry_dates, quantities, unit_costs, stages_raw = zip(*rows)
+        batch_count = len(batch_ids)
+
+        stages = [
+            "" if s is None
+            else s.value.lower() if isinstance(s, Enum)
+            else str(s).strip().lower()
+            for s in stages_raw
+        ]
+        stage_values = [s.value if isinstance(s, Enum) else s for s in stages_raw]
+        days_until = [(e - today).days if e else None for e in expiry_dates]
+        usable_quantities = [
+            Decimal(q) if stage != "expired" else Decimal(0)
+            for q, stage in zip(quantities, stages)
+        ]
+        cumulative = list(accumulate(usable_quantities))
+        total_available = cumulative[-1]
+
+        # First batch at which demand is covered; nothing beyond it is allocated
+        cutoff = min(bisect_left(cumulative, quantity_needed_inventory), batch_count - 1)
+
+        allocated = [Decimal(0)] * batch_count
+        previous = Decimal(0)
+        for i in range(cutoff + 1):
+            if usable_quantities[i] > 0:
+                allocated[i] = min(usable_quantities[i], quantity_needed_inventory - previous)
+            previous = cumulative[i]
+        quantity_allocated = min(total_available, quantity_needed_inventory)
+
+        near_expiry_count = stages.count("near_expiry")
+        expired_count = stages.count("expired")
+
+        def plural_days(days):
+            return f"{days} day{'s' if days != 1 else ''}"
+
+        def suggestion_reason(i: int) -> str:
+            stage, days = stages[i], days_until[i]
+            if stage == "expired":
+                return f"EXPIRED {abs(days) if days else 'unknown'} days ago - DO NOT USE"
+            if stage == "near_expiry":
+                return f"URGENT: Expires in {plural_days(days)} - USE FIRST (FEFO)"
+            if stage == "fresh":
+                return f"Fresh batch - expires in {days} days" if days else "Fresh batch - no expiry date"
+            # Fallback for unknown lifecycle or no expiry tracking
+            return "Oldest batch (FIFO) - no expiry tracking" if i == 0 else "Available batch - no expiry tracking"
+
+        warnings = []
+        allocation_plan = []
+
+        for i in range(cutoff + 1):
+            if allocated[i] <= 0:
+                continue
+            allocation_plan.append({
+                "batch_id": batch_ids[i],
+                "batch_number": batch_numbers[i],
+                "quantity_to_use": float(allocated[i]),
+                "unit": inventory_unit,
+                "quantity_to_use_recipe_unit": float(allocated[i] * to_recipe_unit),   # also show in recipe unit
+                "recipe_unit": unit,
+                "cost": float(allocated[i] * (unit_costs[i] or Decimal(0))),
+                "lifecycle_stage": stage_values[i],
+                "priority": i + 1,
+                "suggestion_reason": suggestion_reason(i)
+            })
+            # Add warning for near-expiry batches being used
+            if stages[i] == "near_expiry":
+                warnings.append(f"Using near-expiry batch {batch_numbers[i]} - expires in {plural_days(days_until[i])}")
+
+        for i, stage in enumerate(stages):
+            if stage == "expired":
+                warnings.append(f"Batch {batch_numbers[i]} is EXPIRED - excluded from allocation")
+
+        # Per-batch detail only on request, optionally paged
+        suggestions = []
+        if include_suggestions:
+            end = batch_count if suggestions_limit is None else suggestions_offset + suggestions_limit
+            suggestions = [
+                BatchInfo(
+                    batch_id=batch_ids[i],
+                    batch_number=batch_numbers[i],
+                    expiry_date=expiry_dates[i],
+                    quantity_remaining=quantities[i],
+                    days_until_expiry=days_until[i],
+                    lifecycle_stage=stage_values[i],  # String value, not Enum
+                    unit_cost=unit_costs[i] or Decimal(0),
+                    is_near_expiry=stages[i] == "near_expiry",
+                    priority_rank=i + 1,
+                    suggestion_reason=suggestion_reason(i),
+                    allocated_quantity=float(allocated[i]) if allocated[i] > 0 else None
                 )
-            
-            # Convert Enum to string for JSON response
-            lifecycle_stage_str = lifecycle_raw.value if isinstance(lifecycle_raw, Enum) else lifecycle_raw
-            
-            # Build suggestion
-            suggestions.append(BatchInfo(
-                batch_id=batch.id,
-                batch_number=batch.batch_number,
-                expiry_date=batch.expiry_date,
-                quantity_remaining=batch.quantity_remaining,
-                days_until_expiry=days_until_expiry,
-                lifecycle_stage=lifecycle_stage_str,  # String value, not Enum
-                unit_cost=batch.unit_cost or Decimal(0),
-                is_near_expiry=is_near_expiry,
-                priority_rank=idx,
-                suggestion_reason=suggestion_reason,
-                allocated_quantity=float(quantity_from_this_batch) if quantity_from_this_batch > 0 else None
-            ))
+                for i in range(suggestions_offset, min(end, batch_count))
+            ]
         
         # Check if we can fulfill
         can_fulfill = quantity_allocated >= quantity_needed_inventory
         shortage_inventory = quantity_needed_inventory - quantity_allocated if not can_fulfill else Decimal(0)
 
-        shortage_recipe = float(
-            convert_quantity_unit(
-                value=shortage_inventory,
-                from_unit=inventory_unit,
-                to_unit=unit
-            )
-        ) if not can_fulfill else 0
-
-        total_available_recipe = float(
-            convert_quantity_unit(
-                value=total_available,
-                from_unit=inventory_unit,
-                to_unit=unit
-            )
-        )
-
+        shortage_recipe = float(shortage_inventory * to_recipe_unit) if not can_fulfill else 0
+        total_available_recipe = float(total_available * to_recipe_unit)
 
         # Add shortage warning
         if not can_fulfill:
@@ -672,13 +656,12 @@ class DishIngredientService:
             )
         
         # Add priority message for near-expiry batches
-        # near_expiry_in_allocation = len([a for a in allocation_plan if is_near_expiry])
-        
-        if near_expiry_count > 0:
-            allocated_near_expiry = sum(1 for s in suggestions if s.is_near_expiry and s.allocated_quantity)
-            if allocated_near_expiry > 0:
-                priority_msg = f"PRIORITY: {allocated_near_expiry} near-expiry batch{'es' if allocated_near_expiry > 1 else ''} should be used first (FEFO)"
-                warnings.insert(0 if can_fulfill else 1, priority_msg)
+        allocated_near_expiry = sum(
+            1 for i in range(cutoff + 1) if stages[i] == "near_expiry" and allocated[i] > 0
+        )
+        if allocated_near_expiry > 0:
+            priority_msg = f"PRIORITY: {allocated_near_expiry} near-expiry batch{'es' if allocated_near_expiry > 1 else ''} should be used first (FEFO)"
+            warnings.insert(0 if can_fulfill else 1, priority_msg)
         
         return {
             "ingredient_id": ingredient_id,
@@ -688,13 +671,8 @@ class DishIngredientService:
             "total_available": float(total_available),
             "can_fulfill": can_fulfill,
             "shortage": shortage_recipe,
-            "quantity_allocated": float(
-                convert_quantity_unit(
-                    value=quantity_allocated,
-                    from_unit=inventory_unit,
-                    to_unit=unit
-                )
-            ),   
+            "quantity_allocated": float(quantity_allocated * to_recipe_unit),
+            "total_batches": batch_count,
             "suggestions": suggestions,
             "allocation_plan": allocation_plan,
             "warnings": warnings,
@@ -1043,6 +1021,106 @@ class DishIngredientService:
 
 class DishPreparationService:
 
+    @staticmethod
+    def _plan_dish(
+        dish_ingredients: List[DishIngredient],
+        quantity: int,
+        batch_pool: Dict[int, List[dict]],
+        stock_pool: Dict[str, List[dict]]
+    ) -> dict:
+        """
+        Split one dish's demand across the in-memory lot pools (FEFO).
+        Availability is checked for the whole dish before any lot is touched,
+        so a failed dish leaves the pools exactly as it found them.
+        """
+
+        # Total demand per source, so repeated ingredients are checked together
+        demand = {}
+        for dish_ing in dish_ingredients:
+            if dish_ing.is_semi_finished:
+                key = ("SEMI_FINISHED", str(dish_ing.preprepred_material_id))
+            else:
+                key = ("RAW", dish_ing.ingredient_id)
+            qty_needed = Decimal(str(dish_ing.quantity_required)) * quantity
+            if key in demand:
+                demand[key] = (demand[key][0] + qty_needed, demand[key][1])
+            else:
+                demand[key] = (qty_needed, dish_ing)
+
+        for (ingredient_type, source_id), (qty_needed, dish_ing) in demand.items():
+            if ingredient_type == "SEMI_FINISHED":
+                total_available = StockAllocationService.available(stock_pool.get(source_id, []))
+                if total_available <= 0:
+                    raise ValueError(
+                        f"No stock available for {dish_ing.ingredient_name}. "
+                        f"Please produce a batch first."
+                    )
+            else:
+                total_available = StockAllocationService.available(batch_pool.get(source_id, []))
+                if total_available <= 0:
+                    raise ValueError(f"No batches available for {dish_ing.ingredient_name}")
+
+            if total_available < qty_needed:
+                raise ValueError(
+                    f"Insufficient {dish_ing.ingredient_name}. "
+                    f"Available: {float(total_available)} {dish_ing.unit}, "
+                    f"Required: {float(qty_needed)} {dish_ing.unit}"
+                )
+
+        total_cost = Decimal(0)
+        lines = []
+        consumptions = []
+        inventory_deductions = {}
+
+        for dish_ing in dish_ingredients:
+            qty_needed = Decimal(str(dish_ing.quantity_required)) * quantity
+
+            if dish_ing.is_semi_finished:
+                lots = stock_pool[str(dish_ing.preprepred_material_id)]
+            else:
+                lots = batch_pool[dish_ing.ingredient_id]
+                inventory_deductions[dish_ing.ingredient_id] = (
+                    inventory_deductions.get(dish_ing.ingredient_id, Decimal(0)) + qty_needed
+                )
+
+            for lot, qty_taken in StockAllocationService.allocate(lots, qty_needed):
+                cost = qty_taken * lot["unit_cost"]
+                total_cost += cost
+
+                lines.append({
+                    "ingredient_id": None if dish_ing.is_semi_finished else dish_ing.ingredient_id,
+                    "batch_id": None if dish_ing.is_semi_finished else lot["id"],
+                    "preprepred_material_id": dish_ing.preprepred_material_id if dish_ing.is_semi_finished else None,
+                    "ingredient_name": dish_ing.ingredient_name,
+                    "batch_number": lot["batch_number"],
+                    "quantity_consumed": float(qty_taken),
+                    "unit": dish_ing.unit,
+                    "cost_per_unit": float(lot["unit_cost"]),
+                    "total_cost": float(cost)
+                })
+
+                consumption = {
+                    "ingredient_name": dish_ing.ingredient_name,
+                    "ingredient_type": "SEMI_FINISHED" if dish_ing.is_semi_finished else "RAW",
+                    "batch_number": lot["batch_number"],
+                    "quantity_consumed": float(qty_taken),
+                    "unit": dish_ing.unit,
+                    "cost": float(cost),
+                    "cost_per_unit": float(lot["unit_cost"])
+                }
+                if dish_ing.is_semi_finished:
+                    consumption["remaining_in_stock"] = float(lot["remaining"])
+                else:
+                    consumption["remaining_in_batch"] = float(lot["remaining"])
+                consumptions.append(consumption)
+
+        return {
+            "total_cost": total_cost,
+            "lines": lines,
+            "consumptions": consumptions,
+            "inventory_deductions": inventory_deductions
+        }
+
     @staticmethod
     def prepare_dish(
         db: Session,
@@ -1056,7 +1134,30 @@ class DishPreparationService:
         """
         Prepare dish and automatically deduct inventory
         Supports both RAW ingredients and SEMI_FINISHED products
+
+        All candidate batches are loaded (and row-locked) in one query per stock
+        table, the FEFO split is computed in memory and deductions are written
+        with one UPDATE per table. Concurrent updates to the same stock are
+        retried with bounded backoff.
         """
+        return StockAllocationService.run_with_retry(
+            db,
+            lambda: DishPreparationService._prepare_dish(
+                db, tenant_id, dish_id, quantity, user_id, notes, batch_id
+            )
+        )
+
+    @staticmethod
+    def _prepare_dish(
+        db: Session,
+        tenant_id: int,
+        dish_id: int,
+        quantity: int,
+        user_id: int,
+        notes: Optional[str] = None,
+        batch_id: Optional[int] = None
+    ) -> PreparationResult:
+        """Single attempt of prepare_dish"""
         
         # Get dish
         dish = db.query(Dish).filter(
@@ -1074,232 +1175,30 @@ class DishPreparationService:
             )
         ).all()
         
-        #DEBUG: Log ingredient count
-        print(f"Found {len(dish_ingredients)} ingredients for dish {dish_id}")
-        
         if not dish_ingredients:
             raise ValueError("No ingredients configured for this dish")
-        
-        # Create preparation log
-        prep_log = DishPreparationBatchLog(
-            tenant_id=tenant_id,
-            dish_id=dish_id,
-            user_id=user_id,
-            batch_id=batch_id,
-            quantity_prepared=quantity,
-            notes=notes,
-            track_status=PreparationBatchStatus.IN_PROGRESS,
-            inventory_deducted=False
+
+        # Lock every candidate lot up front (batches first, then semi-finished stock)
+        StockAllocationService.set_lock_timeout(db)
+        batch_pool = StockAllocationService.load_batch_pool(
+            db, tenant_id,
+            [i.ingredient_id for i in dish_ingredients if not i.is_semi_finished],
+            lock=True
+        )
+        stock_pool = StockAllocationService.load_stock_pool(
+            db, tenant_id,
+            [i.preprepred_material_id for i in dish_ingredients if i.is_semi_finished],
+            lock=True
         )
-        db.add(prep_log)
-        db.flush()
-        
-        total_cost = Decimal(0)
-        consumptions = []
-        
-        # Process ALL ingredients first, then add to db
-        for idx, dish_ing in enumerate(dish_ingredients):
-            print(f"Processing ingredient {idx + 1}/{len(dish_ingredients)}: {dish_ing.ingredient_name}")
-            print(f"   - Is semi-finished: {dish_ing.is_semi_finished}")
-            print(f"   - Quantity required: {dish_ing.quantity_required}")
-            
-            qty_needed = Decimal(str(dish_ing.quantity_required)) * quantity
-            print(f"   - Total quantity needed: {qty_needed}")
-            
-            # Check if semi-finished or raw ingredient
-            if dish_ing.is_semi_finished:
-               # lofic to add pre prepared material to dish
-                print(f"   - Looking for semi-finished stock (product_id: {dish_ing.preprepred_material_id})")
-                
-                stocks = db.query(PrePreparedMaterialStock).filter(
-                    and_(
-                        PrePreparedMaterialStock.tenant_id == tenant_id,
-                        PrePreparedMaterialStock.product_id == dish_ing.preprepred_material_id,
-                        PrePreparedMaterialStock.is_active == True,
-                        PrePreparedMaterialStock.quantity_remaining > 0
-                    )
-                ).order_by(
-                    PrePreparedMaterialStock.expiry_date.asc().nullslast(),
-                    PrePreparedMaterialStock.production_date.asc()
-                ).all()
-                
-                print(f"   - Found {len(stocks)} semi-finished stocks")
-                
-                if not stocks:
-                    raise ValueError(
-                        f"No stock available for {dish_ing.ingredient_name}. "
-                        f"Please produce a batch first."
-                    )
-                
-                # Calculate total available
-                total_available = sum(Decimal(str(s.quantity_remaining)) for s in stocks)
-                print(f"   - Total available: {total_available}")
-                
-                if total_available < qty_needed:
-                    raise ValueError(
-                        f"Insufficient {dish_ing.ingredient_name}. "
-                        f"Available: {float(total_available)} {dish_ing.unit}, "
-                        f"Required: {float(qty_needed)} {dish_ing.unit}"
-                    )
-                
-                # Allocate from stocks (FIFO/FEFO)
-                qty_remaining = qty_needed
-                
-                for stock in stocks:
-                    if qty_remaining <= 0:
-                        break
 
-                    stock_qty = Decimal(str(stock.quantity_remaining))
+        # Plan in memory; raises before anything is written
+        plan = DishPreparationService._plan_dish(dish_ingredients, quantity, batch_pool, stock_pool)
+        total_cost = plan["total_cost"]
 
-                    # How much to take from this stock
-                    qty_from_stock = min(stock_qty, qty_remaining)
-                    print(f"   - Taking {qty_from_stock} from stock {stock.batch_number}")
-                    
-                    # DEDUCT FROM SEMI-FINISHED STOCK
-                    stock.quantity_remaining = float(stock_qty - qty_from_stock)
-                    
-                    # Calculate cost
-                    if stock.quantity_produced and stock.quantity_produced > 0 and stock.total_cost:
-                        cost_per_unit = Decimal(str(stock.total_cost)) / Decimal(str(stock.quantity_produced))
-                    else:
-                        cost_per_unit = Decimal(0)
-                        print(f"WARNING: Stock {stock.batch_number} has zero cost!")
-                        
-                    cost = qty_from_stock * cost_per_unit
-                    total_cost += cost
-                    
-                    print(f"   - Cost per unit: {cost_per_unit}, Total cost: {cost}")
-                    
-                    # Create consumption record
-                    consumption = PreparationIngredientHistory(
-                        tenant_id=tenant_id,
-                        preparation_log_id=prep_log.id,
-                        ingredient_id=None,
-                        batch_id=None,
-                        preprepred_material_id=stock.product_id,
-                        ingredient_name=dish_ing.ingredient_name,
-                        batch_number=stock.batch_number,
-                        quantity_consumed=float(qty_from_stock),
-                        unit=dish_ing.unit,
-                        cost_per_unit=float(cost_per_unit),
-                        total_cost=float(cost)
-                    )
-                    db.add(consumption)
-                    
-                    consumptions.append({
-                        "ingredient_name": dish_ing.ingredient_name,
-                        "ingredient_type": "SEMI_FINISHED",
-                        "batch_number": stock.batch_number,
-                        "quantity_consumed": float(qty_from_stock),
-                        "unit": dish_ing.unit,
-                        "cost": float(cost),
-                        "cost_per_unit": float(cost_per_unit),
-                        "remaining_in_stock": float(stock.quantity_remaining)
-                    })
-                    
-                    qty_remaining -= qty_from_stock
-                
-            else:
-               # logic to add raw ingredients
-                print(f"   - Looking for raw ingredient batches (ingredient_id: {dish_ing.ingredient_id})")
-                
-                # Get available batches (FIFO/FEFO sorted)
-                batches = db.query(InventoryBatch).filter(
-                    and_(
-                        InventoryBatch.tenant_id == tenant_id,
-                        InventoryBatch.inventory_item_id == dish_ing.ingredient_id,
-                        InventoryBatch.is_active == True,
-                        InventoryBatch.quantity_remaining > 0
-                    )
-                ).order_by(
-                    InventoryBatch.expiry_date.asc().nullslast(),
-                    InventoryBatch.created_at.asc()
-                ).all()
-                
-                print(f"   - Found {len(batches)} raw ingredient batches")
-                
-                if not batches:
-                    raise ValueError(f"No batches available for {dish_ing.ingredient_name}")
-                
-                # Calculate total available
-                total_available = sum(Decimal(str(b.quantity_remaining)) for b in batches)
-                print(f"   - Total available: {total_available}")
-                
-                if total_available < qty_needed:
-                    raise ValueError(
-                        f"Insufficient {dish_ing.ingredient_name}. "
-                        f"Available: {float(total_available)} {dish_ing.unit}, "
-                        f"Required: {float(qty_needed)} {dish_ing.unit}"
-                    )
-                
-                # Allocate from batches (FIFO/FEFO)
-                qty_remaining = qty_needed
-                
-                for batch in batches:
-                    if qty_remaining <= 0:
-                        break
-                    
-                    # Convert to Decimal for precise calculation
-                    batch_qty_remaining = Decimal(str(batch.quantity_remaining))
-                    batch_unit_cost = Decimal(str(batch.unit_cost)) if batch.unit_cost else Decimal(0)
-                    
-                    # How much to take from this batch
-                    qty_from_batch = min(batch_qty_remaining, qty_remaining)
-                    print(f"   - Taking {qty_from_batch} from batch {batch.batch_number}")
-                    
-                    # DEDUCT FROM BATCH
-                    batch.quantity_remaining = float(batch_qty_remaining - qty_from_batch)
-                    
-                    # Calculate cost
-                    cost = qty_from_batch * batch_unit_cost
-                    total_cost += cost
-                    
-                    if batch_unit_cost == 0:
-                        print(f"WARNING: Batch {batch.batch_number} has zero unit cost!")
-                    
-                    print(f"   - Unit cost: {batch_unit_cost}, Total cost: {cost}")
-                    
-                    # Create consumption record
-                    consumption = PreparationIngredientHistory(
-                        tenant_id=tenant_id,
-                        preparation_log_id=prep_log.id,
-                        ingredient_id=dish_ing.ingredient_id,
-                        batch_id=batch.id,
-                        ingredient_name=dish_ing.ingredient_name,
-                        batch_number=batch.batch_number,
-                        quantity_consumed=float(qty_from_batch),
-                        unit=dish_ing.unit,
-                        cost_per_unit=float(batch_unit_cost),
-                        total_cost=float(cost)
-                    )
-                    db.add(consumption)
-                    
-                    consumptions.append({
-                        "ingredient_name": dish_ing.ingredient_name,
-                        "ingredient_type": "RAW",
-                        "batch_number": batch.batch_number,
-                        "quantity_consumed": float(qty_from_batch),
-                        "unit": dish_ing.unit,
-                        "cost": float(cost),
-                        "cost_per_unit": float(batch_unit_cost),
-                        "remaining_in_batch": float(batch.quantity_remaining)
-                    })
-                    
-                    qty_remaining -= qty_from_batch
-                
-                # DEDUCT FROM INVENTORY TOTAL
-                inventory = db.query(Inventory).filter(Inventory.id == dish_ing.ingredient_id).first()
-                if inventory:
-                    current_qty = Decimal(str(inventory.current_quantity)) if inventory.current_quantity else Decimal(0)
-                    inventory.current_quantity = float(current_qty - qty_needed)
-        
-        print(f"Total cost calculated: {total_cost}")
-        print(f"Total consumptions: {len(consumptions)}")
-        
-        # Update preparation log AFTER processing all ingredients
-        prep_log.total_cost = float(total_cost)
-        prep_log.inventory_deducted = True
-        prep_log.track_status = PreparationBatchStatus.IN_PROGRESS
+        planned = [{"dish": dish, "quantity": quantity, "notes": notes, "plan": plan}]
+        prep_log = DishPreparationService._persist_preparations(
+            db, tenant_id, user_id, batch_id, planned, batch_pool, stock_pool
+        )[0]
 
         # Update batch if applicable
         if batch_id:
@@ -1310,19 +1209,78 @@ class DishPreparationService:
                 prep_batch.total_dishes_completed += quantity
                 existing_cost = Decimal(str(prep_batch.total_cost)) if prep_batch.total_cost else Decimal(0)
                 prep_batch.total_cost = float(existing_cost + total_cost)
+
+        result = DishPreparationService._preparation_result(prep_log, planned[0])
         
         # Commit ONCE at the end
         db.commit()
-        db.refresh(prep_log)
         
-        # Return the actual consumptions list
+        return result
+
+    @staticmethod
+    def _persist_preparations(
+        db: Session,
+        tenant_id: int,
+        user_id: int,
+        batch_id: Optional[int],
+        planned: List[dict],
+        batch_pool: Dict[int, List[dict]],
+        stock_pool: Dict[str, List[dict]]
+    ) -> List[DishPreparationBatchLog]:
+        """
+        Write preparation logs, ingredient history, stock deductions and
+        production rollup counters for already planned dishes: one INSERT per
+        table and one UPDATE per stock table, however many dishes were planned.
+        """
+        # Set here rather than by the server default so the rollup buckets match the logs
+        prepared_at = datetime.now(timezone.utc)
+        prep_logs = [
+            DishPreparationBatchLog(
+                tenant_id=tenant_id,
+                dish_id=entry["dish"].id,
+                user_id=user_id,
+                batch_id=batch_id,
+                quantity_prepared=entry["quantity"],
+                notes=entry["notes"],
+                track_status=PreparationBatchStatus.IN_PROGRESS,
+                preparation_date=prepared_at,
+                total_cost=float(entry["plan"]["total_cost"]),
+                inventory_deducted=True
+            )
+            for entry in planned
+        ]
+        db.add_all(prep_logs)
+        db.flush()
+
+        db.add_all([
+            PreparationIngredientHistory(tenant_id=tenant_id, preparation_log_id=prep_log.id, **line)
+            for prep_log, entry in zip(prep_logs, planned)
+            for line in entry["plan"]["lines"]
+        ])
+
+        inventory_deductions = {}
+        for entry in planned:
+            for ingredient_id, qty in entry["plan"]["inventory_deductions"].items():
+                inventory_deductions[ingredient_id] = inventory_deductions.get(ingredient_id, Decimal(0)) + qty
+
+        # One UPDATE per table
+        StockAllocationService.apply_batch_deductions(db, batch_pool)
+        StockAllocationService.apply_stock_deductions(db, stock_pool)
+        StockAllocationService.apply_inventory_deductions(db, tenant_id, inventory_deductions)
+        StockLevelService.apply_deltas(db, tenant_id, StockLevelService.deltas_from_pool(batch_pool))
+        ProductionRollupService.record(db, tenant_id, prep_logs)
+
+        return prep_logs
+
+    @staticmethod
+    def _preparation_result(prep_log: DishPreparationBatchLog, entry: dict) -> PreparationResult:
         return PreparationResult(
             preparation_log_id=prep_log.id,
-            dish_id=dish_id,
-            dish_name=dish.name,
-            quantity_prepared=quantity,
-            ingredients_consumed=consumptions,
-            total_cost=float(total_cost),
+            dish_id=entry["dish"].id,
+            dish_name=entry["dish"].name,
+            quantity_prepared=entry["quantity"],
+            ingredients_consumed=entry["plan"]["consumptions"],
+            total_cost=float(entry["plan"]["total_cost"]),
             inventory_deducted=True,
             preparation_date=prep_log.preparation_date
         )
@@ -1337,7 +1295,27 @@ class DishPreparationService:
     ) -> BatchPreparationResult:
         """
         Prepare multiple dishes simultaneously in one batch
+
+        Every dish is planned against one shared, locked pool of lots, then all
+        logs, history rows and deductions are written in bulk, so the number of
+        queries does not grow with the number of dishes.
         """
+        return StockAllocationService.run_with_retry(
+            db,
+            lambda: DishPreparationService._prepare_multiple_dishes_batch(
+                db, tenant_id, preparations, user_id, batch_notes
+            )
+        )
+
+    @staticmethod
+    def _prepare_multiple_dishes_batch(
+        db: Session,
+        tenant_id: int,
+        preparations: List[SingleDishPreparation],
+        user_id: int,
+        batch_notes: Optional[str] = None
+    ) -> BatchPreparationResult:
+        """Single attempt of prepare_multiple_dishes_batch"""
         
         # Generate batch number
         batch_number = f"BATCH_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:4].upper()}"
@@ -1357,29 +1335,75 @@ class DishPreparationService:
         )
         db.add(prep_batch)
         db.flush()
+
+        # Load all dishes and their recipes at once
+        dish_ids = {p.dish_id for p in preparations}
+        dishes = {
+            d.id: d for d in db.query(Dish).filter(
+                and_(Dish.tenant_id == tenant_id, Dish.id.in_(dish_ids))
+            ).all()
+        }
+
+        ingredients_by_dish = {}
+        for dish_ing in db.query(DishIngredient).filter(
+            and_(
+                DishIngredient.tenant_id == tenant_id,
+                DishIngredient.dish_id.in_(dish_ids)
+            )
+        ).order_by(DishIngredient.id).all():
+            ingredients_by_dish.setdefault(dish_ing.dish_id, []).append(dish_ing)
+
+        all_ingredients = [i for ings in ingredients_by_dish.values() for i in ings]
+
+        # One locked pool shared by every dish in the batch
+        StockAllocationService.set_lock_timeout(db)
+        batch_pool = StockAllocationService.load_batch_pool(
+            db, tenant_id,
+            [i.ingredient_id for i in all_ingredients if not i.is_semi_finished],
+            lock=True
+        )
+        stock_pool = StockAllocationService.load_stock_pool(
+            db, tenant_id,
+            [i.preprepred_material_id for i in all_ingredients if i.is_semi_finished],
+            lock=True
+        )
         
-        results = []
+        planned = []
         warnings = []
-        successful = 0
-        failed = 0
         
         for prep in preparations:
             try:
-                result = DishPreparationService.prepare_dish(
-                    db=db,
-                    tenant_id=tenant_id,
-                    dish_id=prep.dish_id,
-                    quantity=prep.quantity,
-                    user_id=user_id,
-                    notes=prep.notes,
-                    batch_id=prep_batch.id
+                dish = dishes.get(prep.dish_id)
+                if not dish:
+                    raise ValueError("Dish not found")
+
+                dish_ingredients = ingredients_by_dish.get(prep.dish_id)
+                if not dish_ingredients:
+                    raise ValueError("No ingredients configured for this dish")
+
+                plan = DishPreparationService._plan_dish(
+                    dish_ingredients, prep.quantity, batch_pool, stock_pool
                 )
-                results.append(result)
-                successful += 1
-                
+                planned.append({"dish": dish, "quantity": prep.quantity, "notes": prep.notes, "plan": plan})
+
             except ValueError as e:
                 warnings.append(f"Dish {prep.dish_id}: {str(e)}")
-                failed += 1
+
+        successful = len(planned)
+        failed = len(preparations) - successful
+
+        results = []
+        if planned:
+            prep_logs = DishPreparationService._persist_preparations(
+                db, tenant_id, user_id, prep_batch.id, planned, batch_pool, stock_pool
+            )
+            results = [
+                DishPreparationService._preparation_result(prep_log, entry)
+                for prep_log, entry in zip(prep_logs, planned)
+            ]
+
+        prep_batch.total_dishes_completed = sum(entry["quantity"] for entry in planned)
+        prep_batch.total_cost = float(sum((entry["plan"]["total_cost"] for entry in planned), Decimal(0)))
         
         # Update batch status
         if successful == len(preparations):
@@ -1414,69 +1438,258 @@ class DishPreparationService:
         )
     
     @staticmethod
-    def get_preparation_history(
+    def check_feasibility(
         db: Session,
+        tenant_id: int,
+        items: List[DishFeasibilityItem]
+    ) -> dict:
+        """
+        Dry run: how many of each dish the current stock can cover, and which
+        ingredient limits it. Uses one snapshot of stock totals for all dishes;
+        nothing is written.
+        """
+        dish_ids = {item.dish_id for item in items}
+
+        dishes = {
+            d.id: d for d in db.query(Dish).filter(
+                and_(Dish.tenant_id == tenant_id, Dish.id.in_(dish_ids))
+            ).all()
+        }
+
+        ingredients_by_dish = {}
+        for dish_ing in db.query(DishIngredient).filter(
+            and_(
+                DishIngredient.tenant_id == tenant_id,
+                DishIngredient.dish_id.in_(dish_ids)
+            )
+        ).all():
+            ingredients_by_dish.setdefault(dish_ing.dish_id, []).append(dish_ing)
+
+        all_ingredients = [i for ings in ingredients_by_dish.values() for i in ings]
+        ingredient_totals, product_totals = StockAllocationService.load_stock_totals(
+            db, tenant_id,
+            ingredient_ids=[i.ingredient_id for i in all_ingredients if not i.is_semi_finished],
+            product_ids=[i.preprepred_material_id for i in all_ingredients if i.is_semi_finished]
+        )
+
+        def available_for(key):
+            ingredient_type, source_id = key
+            totals = product_totals if ingredient_type == "SEMI_FINISHED" else ingredient_totals
+            return totals.get(source_id, Decimal(0))
+
+        results = []
+        combined_demand = {}
+
+        for item in items:
+            dish = dishes.get(item.dish_id)
+            dish_ingredients = ingredients_by_dish.get(item.dish_id)
+
+            if not dish or not dish_ingredients:
+                results.append(DishFeasibilityResult(
+                    dish_id=item.dish_id,
+                    dish_name=dish.name if dish else None,
+                    requested_quantity=item.quantity,
+                    max_quantity=0,
+                    can_prepare=False,
+                    message="Dish not found" if not dish else "No ingredients configured for this dish"
+                ))
+                continue
+
+            # Demand for one portion, per stock source
+            per_portion = {}
+            for dish_ing in dish_ingredients:
+                if dish_ing.is_semi_finished:
+                    key = ("SEMI_FINISHED", str(dish_ing.preprepred_material_id))
+                else:
+                    key = ("RAW", dish_ing.ingredient_id)
+                qty, _ = per_portion.get(key, (Decimal(0), dish_ing))
+                per_portion[key] = (qty + Decimal(str(dish_ing.quantity_required or 0)), dish_ing)
+
+            max_quantity = None
+            binding_ingredient = None
+            shortages = []
+
+            for key, (qty_per_portion, dish_ing) in per_portion.items():
+                if qty_per_portion <= 0:
+                    continue
+
+                available = available_for(key)
+                portions = int(available // qty_per_portion)
+                if max_quantity is None or portions < max_quantity:
+                    max_quantity = portions
+                    binding_ingredient = dish_ing.ingredient_name
+
+                required = qty_per_portion * item.quantity
+                combined_demand[key] = combined_demand.get(key, Decimal(0)) + required
+                if available < required:
+                    shortages.append({
+                        "ingredient_name": dish_ing.ingredient_name,
+                        "ingredient_type": key[0],
+                        "required": float(required),
+                        "available": float(available),
+                        "shortage": float(required - available),
+                        "unit": dish_ing.unit
+                    })
+
+            max_quantity = max_quantity or 0
+            results.append(DishFeasibilityResult(
+                dish_id=item.dish_id,
+                dish_name=dish.name,
+                requested_quantity=item.quantity,
+                max_quantity=max_quantity,
+                can_prepare=max_quantity >= item.quantity,
+                binding_ingredient=binding_ingredient,
+                shortages=shortages
+            ))
+
+        # All requested dishes together draw on the same stock
+        can_prepare_all = all(r.can_prepare for r in results) and all(
+            available_for(key) >= required for key, required in combined_demand.items()
+        )
+
+        return {
+            "items": results,
+            "can_prepare_all": can_prepare_all
+        }
+
+    @staticmethod
+    def preparation_history_statement(
         tenant_id: int,
         dish_id: Optional[int] = None,
         user_id: Optional[int] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
         limit: int = 100
-    ) -> List[dict]:
-        """Get preparation history with filters"""
-        
-        query = db.query(DishPreparationBatchLog).filter(
+    ) -> Select:
+        """
+        One keyset page of preparation logs matching the filters, newest
+        first. Dish, chef and batch are joined into the same query and the
+        ingredient consumptions of the whole page come from one more
+        SELECT ... IN, so a page costs two queries whatever its size (and
+        the async endpoint never lazy-loads). The statement fetches limit + 1
+        rows; build the page with preparation_history_page.
+
+        start_date/end_date bound preparation_date as [start_date, end_date),
+        a range the (tenant_id, preparation_date, id) index serves; pass
+        aware datetimes (see app.utils.time_windows).
+        """
+        statement = select(DishPreparationBatchLog).where(
             DishPreparationBatchLog.tenant_id == tenant_id
         )
         
         if dish_id:
-            query = query.filter(DishPreparationBatchLog.dish_id == dish_id)
+            statement = statement.where(DishPreparationBatchLog.dish_id == dish_id)
         if user_id:
-            query = query.filter(DishPreparationBatchLog.user_id == user_id)
+            statement = statement.where(DishPreparationBatchLog.user_id == user_id)
         if start_date:
-            query = query.filter(DishPreparationBatchLog.preparation_date >= start_date)
+            statement = statement.where(DishPreparationBatchLog.preparation_date >= start_date)
         if end_date:
-            query = query.filter(DishPreparationBatchLog.preparation_date <= end_date)
-        
-        logs = query.order_by(DishPreparationBatchLog.preparation_date.desc()).limit(limit).all()
-        
-        results = []
-        for log in logs:
-            dish = db.query(Dish).filter(Dish.id == log.dish_id).first()
-            user = db.query(User).filter(User.id == log.user_id).first()
-            
-            consumptions = db.query(PreparationIngredientHistory).filter(
-                PreparationIngredientHistory.preparation_log_id == log.id
-            ).all()
-            
-            batch_number = None
-            if log.batch_id:
-                batch = db.query(DishPreparationBatch).filter(
-                    DishPreparationBatch.id == log.batch_id
-                ).first()
-                if batch:
-                    batch_number = batch.batch_number
-            
-            results.append({
-                "id": log.id,
-                "dish_name": dish.name if dish else "Unknown",
-                "quantity_prepared": log.quantity_prepared,
-                "user_name": user.full_name if user else "Unknown",
-                "preparation_date": log.preparation_date,
-                "batch_number": batch_number,
-                "notes": log.notes,
-                "total_cost": float(log.total_cost),
-                "inventory_deducted": log.inventory_deducted,
-                "ingredients_consumed": [
-                    {
-                        "ingredient_name": c.ingredient_name,
-                        "batch_number": c.batch_number,
-                        "quantity_consumed": float(c.quantity_consumed),
-                        "unit": c.unit,
-                        "cost": float(c.total_cost)
-                    }
-                    for c in consumptions
-                ]
-            })
+            statement = statement.where(DishPreparationBatchLog.preparation_date < end_date)
         
-        return results
\ No newline at end of file
+        statement = statement.options(
+            joinedload(DishPreparationBatchLog.dish).load_only(Dish.name),
+            joinedload(DishPreparationBatchLog.user).load_only(User.full_name),
+            joinedload(DishPreparationBatchLog.preparation_batch).load_only(DishPreparationBatch.batch_number),
+            selectinload(DishPreparationBatchLog.ingredient_consumptions_history)
+        )
+        return keyset_paginate(statement, PREPARATION_HISTORY_KEYSET, cursor, limit)
+
+    @staticmethod
+    def preparation_history_entry(log: DishPreparationBatchLog) -> dict:
+        return {
+            "id": log.id,
+            "dish_name": log.dish.name if log.dish else "Unknown",
+            "quantity_prepared": log.quantity_prepared,
+            "user_name": log.user.full_name if log.user else "Unknown",
+            "preparation_date": log.preparation_date,
+            "batch_number": log.preparation_batch.batch_number if log.preparation_batch else None,
+            "notes": log.notes,
+            "total_cost": float(log.total_cost),
+            "inventory_deducted": log.inventory_deducted,
+            "ingredients_consumed": [
+                {
+                    "ingredient_name": c.ingredient_name,
+                    "batch_number": c.batch_number,
+                    "quantity_consumed": float(c.quantity_consumed),
+                    "unit": c.unit,
+                    "cost": float(c.total_cost)
+                }
+                for c in log.ingredient_consumptions_history
+            ]
+        }
+
+    @staticmethod
+    def preparation_history_page(logs: Sequence[DishPreparationBatchLog], limit: int) -> Page:
+        """Page of preparation_history_entry dicts from the rows of preparation_history_statement"""
+        page = Page.from_rows(logs, limit, [column.key for column in PREPARATION_HISTORY_KEYSET])
+        page.items = [DishPreparationService.preparation_history_entry(log) for log in page.items]
+        return page
+
+    @staticmethod
+    def get_preparation_history(
+        db: Session,
+        tenant_id: int,
+        dish_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Page:
+        """One page of preparation history, newest first"""
+        statement = DishPreparationService.preparation_history_statement(
+            tenant_id, dish_id, user_id, start_date, end_date, cursor, limit
+        )
+        logs = db.execute(statement).unique().scalars().all()
+        return DishPreparationService.preparation_history_page(logs, limit)
+
+    @staticmethod
+    async def get_preparation_history_async(
+        db: AsyncSession,
+        tenant_id: int,
+        dish_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = 100
+    ) -> Page:
+        """get_preparation_history on an AsyncSession"""
+        statement = DishPreparationService.preparation_history_statement(
+            tenant_id, dish_id, user_id, start_date, end_date, cursor, limit
+        )
+        result = await db.execute(statement)
+        return DishPreparationService.preparation_history_page(result.unique().scalars().all(), limit)
+
+    @staticmethod
+    async def iter_preparation_history_async(
+        db: AsyncSession,
+        tenant_id: int,
+        dish_id: Optional[int] = None,
+        user_id: Optional[int] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        chunk_size: int = 500,
+        max_rows: Optional[int] = None
+    ) -> AsyncIterator[dict]:
+        """
+        Every matching history entry, newest first, read one keyset page of
+        chunk_size at a time. Loaded logs are dropped from the session after
+        each page, so memory stays bounded by chunk_size.
+        """
+        remaining = max_rows
+        while remaining is None or remaining > 0:
+            limit = chunk_size if remaining is None else min(chunk_size, remaining)
+            page = await DishPreparationService.get_preparation_history_async(
+                db, tenant_id, dish_id, user_id, start_date, end_date, cursor, limit
+            )
+            db.expunge_all()
+            for entry in page.items:
+                yield entry
+            if remaining is not None:
+                remaining -= len(page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
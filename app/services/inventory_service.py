@@ -2,17 +2,27 @@
 app/services/inventory_service.py
 Business logic for inventory management
 """
+from sqlalchemy import Select, select
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from datetime import datetime
+from typing import List, Optional, Sequence
+from datetime import datetime, date
 
-from app.models.inventory import Inventory
+from app.models.inventory import Inventory, InventoryBatch
 from app.models.expense import Expense
-from app.schemas.inventory import  InventoryUpdate
+from app.schemas.inventory import  InventoryOut, InventoryUpdate
+from app.services.search_service import DEFAULT_SEARCH_LIMIT, SearchService
 from app.utils.date_helpers import parse_date
+from app.utils.pagination import DEFAULT_PAGE_SIZE, Page, keyset_paginate
 from app.core.logging import logger
 from uuid import UUID
 
+# Fields a listing may project: the InventoryOut fields backed by a column
+INVENTORY_LIST_FIELDS = tuple(
+    name for name in InventoryOut.model_fields if name in Inventory.__table__.columns
+)
+# Keyset for listings, newest first; matches ix_inventory_tenant_date_added_id
+INVENTORY_KEYSET = (Inventory.date_added, Inventory.id)
+
 
 class InventoryService:
     """Service class for inventory operations"""
@@ -20,9 +30,16 @@ class InventoryService:
     def __init__(self, db: Session):
         self.db = db
     
-    def get_all_items(self,tenant_id:UUID) -> List[Inventory]:
-        """Get all inventory items"""
-        return self.db.query(Inventory).filter(Inventory.tenant_id == tenant_id).all()
+    def get_all_items(
+        self,
+        tenant_id: UUID,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[Sequence[str]] = None
+    ) -> Page:
+        """One page of inventory items, newest first"""
+        statement = self.list_statement(tenant_id, fields)
+        return self.page(self.db.execute(keyset_paginate(statement, INVENTORY_KEYSET, cursor, limit)).all(), limit, fields)
     
     def get_item_by_id(self, item_id: int) -> Optional[Inventory]:
         """Get inventory item by ID"""
@@ -35,28 +52,105 @@ class InventoryService:
         name: Optional[str] = None,
         type: Optional[str] = None,
         start_date: Optional[str] = None,
-        end_date: Optional[str] = None
-    ) -> List[Inventory]:
-        """Search inventory with filters"""
-        query = self.db.query(Inventory).filter(
+        end_date: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        fields: Optional[Sequence[str]] = None
+    ) -> Page:
+        """One page of search results, newest first"""
+        statement = self.search_statement(tenant_id, name, type, start_date, end_date, fields)
+        return self.page(self.db.execute(keyset_paginate(statement, INVENTORY_KEYSET, cursor, limit)).all(), limit, fields)
+    
+    @staticmethod
+    def projection(fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Columns to select for the requested fields (all listable fields when
+        none are given). The keyset columns are always selected so the next
+        cursor can be built; ValueError on an unknown field.
+        """
+        fields = list(fields or INVENTORY_LIST_FIELDS)
+        unknown = [name for name in fields if name not in INVENTORY_LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        
+        columns = [getattr(Inventory, name) for name in dict.fromkeys(fields)]
+        for column in INVENTORY_KEYSET:
+            if column.key not in fields:
+                columns.append(column)
+        return columns
+    
+    @staticmethod
+    def page(rows: Sequence, limit: int, fields: Optional[Sequence[str]] = None) -> Page:
+        """Page of as_dicts rows"""
+        page = Page.from_rows(rows, limit, [column.key for column in INVENTORY_KEYSET])
+        page.items = InventoryService.as_dicts(page.items, fields)
+        return page
+    
+    @staticmethod
+    def as_dicts(rows: Sequence, fields: Optional[Sequence[str]] = None) -> List[dict]:
+        """Projected rows as plain dicts holding only the requested fields"""
+        fields = list(fields or INVENTORY_LIST_FIELDS)
+        return [{name: getattr(row, name) for name in fields} for row in rows]
+    
+    @staticmethod
+    def list_statement(tenant_id: UUID, fields: Optional[Sequence[str]] = None) -> Select:
+        """SELECT for get_all_items; order and limit are applied by keyset_paginate"""
+        return select(*InventoryService.projection(fields)).where(Inventory.tenant_id == tenant_id)
+    
+    @staticmethod
+    def search_statement(
+        tenant_id: UUID,
+        name: Optional[str] = None,
+        type: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None
+    ) -> Select:
+        """SELECT for search_items; shared by the sync and async endpoints"""
+        statement = select(*InventoryService.projection(fields)).where(
             Inventory.tenant_id == tenant_id,
             Inventory.is_active == True,
         )
         
         if name:
-            query = query.filter(Inventory.name.ilike(f"%{name}%"))
+            statement = statement.where(SearchService.match(Inventory.name, name))
         elif type:  # Only apply type filter if name is not provided
-            query = query.filter(Inventory.type.ilike(f"%{type}%"))
+            statement = statement.where(SearchService.match(Inventory.type, type))
         
         if start_date:
             start = parse_date(start_date)
-            query = query.filter(Inventory.date_added >= start)
+            statement = statement.where(Inventory.date_added >= start)
         
         if end_date:
             end = parse_date(end_date)
-            query = query.filter(Inventory.date_added <= end)
+            statement = statement.where(Inventory.date_added <= end)
         
-        return query.order_by(Inventory.date_added.desc()).all()
+        return statement.order_by(*(column.desc() for column in INVENTORY_KEYSET))
+    
+    @staticmethod
+    def lookup_statement(
+        tenant_id: UUID,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        fields: Optional[Sequence[str]] = None
+    ) -> Select:
+        """Ranked name lookup (best match first) over active items, for search boxes"""
+        return SearchService.name_search_statement(
+            Inventory, tenant_id, query, limit, offset, columns=InventoryService.projection(fields)
+        ).where(Inventory.is_active == True)
+    
+    def lookup_items(
+        self,
+        tenant_id: UUID,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        fields: Optional[Sequence[str]] = None
+    ) -> List[dict]:
+        """Ranked name lookup; see lookup_statement"""
+        rows = self.db.execute(self.lookup_statement(tenant_id, query, limit, offset, fields)).all()
+        return self.as_dicts(rows, fields)
     
     def update_item(self, item_id: int, tenant_id:UUID, item_update: InventoryUpdate):
         """Update inventory item"""
@@ -79,6 +173,16 @@ class InventoryService:
         if 'quantity' in update_data or 'price_per_unit' in update_data:
             item.total_cost = item.quantity * item.price_per_unit
         
+        # Threshold change invalidates scheduled transitions: reclassify on the next run
+        if 'fresh_threshold_days' in update_data:
+            self.db.query(InventoryBatch).filter(
+                InventoryBatch.inventory_item_id == item.id,
+                InventoryBatch.expiry_date.isnot(None)
+            ).update(
+                {InventoryBatch.next_lifecycle_transition: date.today()},
+                synchronize_session=False
+            )
+        
         self.db.commit()
         self.db.refresh(item)
         
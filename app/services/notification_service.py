@@ -1,12 +1,18 @@
 # app/services/notification_service.py
-from datetime import datetime
-from typing import List
+from datetime import datetime, timedelta
+from html import escape
+from string import Template
+from typing import Dict, List
+from uuid import UUID
+from sqlalchemy import func, insert, or_
 from sqlalchemy.orm import Session
-from app.models.inventory import InventoryAlert, AlertNotification
+from app.core.config import settings
+from app.models.inventory import Inventory, InventoryAlert, AlertNotification
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from app.models.users import User
+from app.services.alert_routing import Recipient, get_routing_table
+from app.services.smtp_transport import get_smtp_pool
 import os
 import logging
 
@@ -21,228 +27,360 @@ EMAIL_HOST_PASSWORD = os.getenv('SMTP_PASSWORD')
 EMAIL_FROM = os.getenv('SMTP_FROM_EMAIL')
 # EMAIL_ENABLED = os.getenv('EMAIL_ENABLED', 'True') == 'True'
 
+# Outbox statuses
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+PRIORITY_RANK = {"critical": 3, "high": 2, "medium": 1, "low": 0}
+
+# Digest email templates, compiled once at import
+DIGEST_EMAIL_TEMPLATE = Template("""
+<html>
+<head>
+    <style>
+        body { font-family: Arial, sans-serif; line-height: 1.6; color: #333; }
+        .header { background-color: #f8f9fa; padding: 20px; border-bottom: 3px solid #007bff; }
+        .content { padding: 20px; }
+        .alert-box {
+            background-color: #fff3cd;
+            border-left: 4px solid #ffc107;
+            padding: 15px;
+            margin: 20px 0;
+        }
+        .critical { background-color: #f8d7da; border-left-color: #dc3545; }
+        .high { background-color: #fff3cd; border-left-color: #ffc107; }
+        .medium { background-color: #d1ecf1; border-left-color: #17a2b8; }
+        .detail { margin: 10px 0; }
+        .label { font-weight: bold; color: #666; }
+        .button {
+            display: inline-block;
+            padding: 10px 20px;
+            background-color: #007bff;
+            color: white;
+            text-decoration: none;
+            border-radius: 5px;
+            margin: 20px 0;
+        }
+    </style>
+</head>
+<body>
+    <div class="header">
+        <h2>🔔 Inventory Alert Notification</h2>
+        <p>$summary</p>
+    </div>
+    <div class="content">
+        $alerts
+        <hr style="margin: 30px 0; border: none; border-top: 1px solid #ddd;">
+        <p style="color: #666; font-size: 12px;">
+            This is an automated notification from your Inventory Management System.<br>
+            Alerts generated between $first_generated and $last_generated
+        </p>
+    </div>
+</body>
+</html>
+""")
+
+DIGEST_ALERT_TEMPLATE = Template("""
+        <div class="alert-box $priority">
+            <h3>$message</h3>
+            <div class="detail"><span class="label">Alert Type:</span> $alert_type</div>
+            <div class="detail"><span class="label">Priority:</span> <strong>$priority_label</strong></div>
+            <div class="detail"><span class="label">Current Quantity:</span> $current_quantity</div>
+            <div class="detail"><span class="label">Threshold Value:</span> $threshold_value</div>
+            $affected_dishes
+            <div class="detail"><strong>📌 Suggested Action:</strong> $suggested_action</div>
+            <a href="https://yourapp.com/alerts/$alert_id" class="button">View Alert Details</a>
+        </div>
+""")
+
+AFFECTED_DISHES_TEMPLATE = Template(
+    '<div class="detail"><span class="label">Affected Dishes:</span> $affected_dishes</div>'
+)
+
 
 class NotificationService:
+    """
+    Alert notifications go through an outbox: the alert sweep inserts
+    AlertNotification rows as pending (in_app rows are delivered by being
+    written), and the notifications queue drains them in batches with
+    dispatch_pending().
+    """
+
     def __init__(self, db: Session):
         self.db = db
     
     def send_alert_notifications(self, alert: InventoryAlert):
-        """Send notifications through all configured channels"""
-        recipients = self._get_alert_recipients(alert)
-        
-        logger.info(f"Sending notifications for alert {alert.id} to {len(recipients)} recipients")
-        
-        for recipient in recipients:
-            # In-app notification (always sent)
-            self._create_in_app_notification(alert, recipient)
-            
-            # Email notification
-            if recipient.email and self._should_send_email(alert, recipient):
-                self._send_email_notification(alert, recipient)
-            
-            # SMS notification (optional)
-            if recipient.mobile_no and self._should_send_sms(alert, recipient):
-                self._send_sms_notification(alert, recipient)
-    
-    def _get_alert_recipients(self, alert: InventoryAlert) -> List[User]:
-        """Determine who should receive this alert"""
-        # Get users with inventory management permissions
-        # Adjust based on your user/role system
-        recipients = self.db.query(User).filter(
-            User.tenant_id == alert.tenant_id,
-            User.is_active == True,
-            # Add role-based filtering here
-            # Example: User.role.in_(['admin', 'manager', 'inventory_manager'])
-        ).all()
-        
-        logger.info(f"Found {len(recipients)} recipients for tenant {alert.tenant_id}")
-        return recipients
-    
-    def _create_in_app_notification(self, alert: InventoryAlert, user: User):
-        """Create in-app notification record"""
-        try:
-            notification = AlertNotification(
-                tenant_id=alert.tenant_id,
-                alert_id=alert.id,
-                channel="in_app",
-                recipient_user_id=user.id,
-                status="sent",
-                sent_at=datetime.now()
-            )
-            self.db.add(notification)
-            self.db.commit()
-            logger.debug(f"In-app notification created for user {user.id}")
-        except Exception as e:
-            logger.error(f"Failed to create in-app notification: {str(e)}")
-            self.db.rollback()
-    
-    def _send_email_notification(self, alert: InventoryAlert, user: User):
-        """Send email notification"""
-        
-        # Check if email is enabled
-        # if not EMAIL_ENABLED:
-        #     logger.warning("Email notifications are disabled in environment variables")
-        #     return
-        
-        # Validate email configuration
-        if not EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD:
-            logger.error("Email credentials not configured. Check EMAIL_HOST_USER and EMAIL_HOST_PASSWORD in .env")
+        """Queue notifications through all configured channels; caller commits"""
+        self._enqueue([alert])
+
+    def send_bulk_alert_notifications(self, alert_ids: List[UUID]):
+        """Queue notifications for many alerts, resolving recipients once per tenant; caller commits"""
+        if not alert_ids:
             return
-        
-        try:
-            logger.info(f"Attempting to send email to {user.email} for alert {alert.id}")
-            
-            # Build email message
-            msg = MIMEMultipart()
-            msg['From'] = EMAIL_FROM or EMAIL_HOST_USER
-            msg['To'] = user.email
-            msg['Subject'] = f"[{alert.priority.upper()}] {alert.alert_type.value.replace('_', ' ').title()}"
-            
-            # Create HTML body
-            body = f"""
-            <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; line-height: 1.6; color: #333; }}
-                    .header {{ background-color: #f8f9fa; padding: 20px; border-bottom: 3px solid #007bff; }}
-                    .content {{ padding: 20px; }}
-                    .alert-box {{ 
-                        background-color: #fff3cd; 
-                        border-left: 4px solid #ffc107; 
-                        padding: 15px; 
-                        margin: 20px 0; 
-                    }}
-                    .critical {{ background-color: #f8d7da; border-left-color: #dc3545; }}
-                    .high {{ background-color: #fff3cd; border-left-color: #ffc107; }}
-                    .medium {{ background-color: #d1ecf1; border-left-color: #17a2b8; }}
-                    .detail {{ margin: 10px 0; }}
-                    .label {{ font-weight: bold; color: #666; }}
-                    .button {{ 
-                        display: inline-block; 
-                        padding: 10px 20px; 
-                        background-color: #007bff; 
-                        color: white; 
-                        text-decoration: none; 
-                        border-radius: 5px; 
-                        margin: 20px 0; 
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="header">
-                    <h2>🔔 Inventory Alert Notification</h2>
-                </div>
-                <div class="content">
-                    <div class="alert-box {alert.priority}">
-                        <h3>{alert.message}</h3>
-                    </div>
-                    
-                    <div class="detail">
-                        <span class="label">Alert Type:</span> 
-                        {alert.alert_type.value.replace('_', ' ').title()}
-                    </div>
-                    
-                    <div class="detail">
-                        <span class="label">Priority:</span> 
-                        <strong>{alert.priority.upper()}</strong>
-                    </div>
-                    
-                    <div class="detail">
-                        <span class="label">Current Quantity:</span> 
-                        {alert.current_quantity}
-                    </div>
-                    
-                    <div class="detail">
-                        <span class="label">Threshold Value:</span> 
-                        {alert.threshold_value}
-                    </div>
-                    
-                    {f'<div class="detail"><span class="label">Affected Dishes:</span> {alert.affected_dishes}</div>' if alert.affected_dishes else ''}
-                    
-                    <div class="alert-box">
-                        <strong>📌 Suggested Action:</strong><br>
-                        {alert.suggested_action}
-                    </div>
-                    
-                    <a href="https://yourapp.com/alerts/{alert.id}" class="button">
-                        View Alert Details
-                    </a>
-                    
-                    <hr style="margin: 30px 0; border: none; border-top: 1px solid #ddd;">
-                    
-                    <p style="color: #666; font-size: 12px;">
-                        This is an automated notification from your Inventory Management System.<br>
-                        Alert generated on {alert.alert_date.strftime('%B %d, %Y at %I:%M %p')}
-                    </p>
-                </div>
-            </body>
-            </html>
-            """
-            
-            msg.attach(MIMEText(body, 'html'))
-            
-            # Send email via SMTP
-            logger.debug(f"Connecting to SMTP server {EMAIL_HOST}:{EMAIL_PORT}")
-            server = smtplib.SMTP(EMAIL_HOST, EMAIL_PORT)
-            server.starttls()
-            
-            logger.debug(f"Logging in as {EMAIL_HOST_USER}")
-            server.login(EMAIL_HOST_USER, EMAIL_HOST_PASSWORD)
-            
-            logger.debug(f"Sending message to {user.email}")
-            server.send_message(msg)
-            server.quit()
-            
-            logger.info(f"✓ Email sent successfully to {user.email}")
-            
-            # Log successful delivery
-            notification = AlertNotification(
-                tenant_id=alert.tenant_id,
-                alert_id=alert.id,
-                channel="email",
-                recipient_user_id=user.id,
-                recipient_contact=user.email,
-                status="sent",
-                sent_at=datetime.now()
-            )
-            self.db.add(notification)
+        self._enqueue(self.db.query(InventoryAlert).filter(InventoryAlert.id.in_(alert_ids)).all())
+
+    def _enqueue(self, alerts: List[InventoryAlert]) -> int:
+        """
+        Write the outbox rows for alerts: in_app rows with one multi-row
+        INSERT, email alerts coalesced into per-recipient digests.
+        """
+        now = datetime.now()
+        email_configured = bool(EMAIL_HOST_USER and EMAIL_HOST_PASSWORD)
+        if not email_configured:
+            logger.error("Email credentials not configured. Check EMAIL_HOST_USER and EMAIL_HOST_PASSWORD in .env")
+
+        categories = self._item_categories(alerts)
+        rows = []
+        email_alerts = {}  # (tenant_id, recipient_user_id) -> (recipient, [alert ids])
+        for alert in alerts:
+            routing = get_routing_table(self.db, alert.tenant_id)
+            recipients, channels = routing.resolve(alert.alert_type, categories.get(alert.inventory_item_id))
+            logger.info(f"Queueing notifications for alert {alert.id} to {len(recipients)} recipients")
+
+            for recipient in recipients:
+                # In-app notification: the record is the delivery
+                if "in_app" in channels:
+                    rows.append({
+                        "tenant_id": alert.tenant_id,
+                        "alert_id": alert.id,
+                        "channel": "in_app",
+                        "recipient_user_id": recipient.id,
+                        "recipient_contact": None,
+                        "status": SENT,
+                        "sent_at": now
+                    })
+
+                # Email notification
+                if "email" in channels and email_configured and recipient.email and self._should_send_email(alert, recipient):
+                    email_alerts.setdefault(
+                        (alert.tenant_id, recipient.id), (recipient, [])
+                    )[1].append(alert.id)
+
+                # SMS notification (optional)
+                if "sms" in channels and recipient.mobile_no and self._should_send_sms(alert, recipient):
+                    self._send_sms_notification(alert, recipient)
+
+        if rows:
+            self.db.execute(insert(AlertNotification.__table__), rows)
+        if email_alerts:
+            self._buffer_digests("email", email_alerts, now)
+        return len(rows)
+
+    def _buffer_digests(self, channel: str, pending: dict, now: datetime) -> None:
+        """
+        Add alerts to each recipient's open digest for the channel, or open one.
+
+        A digest is a pending AlertNotification whose next_attempt_at is the
+        end of its coalescing window (NOTIFICATION_DIGEST_WINDOW_SECONDS); the
+        dispatcher only claims it once the window has closed. alert_ids holds
+        every alert it covers.
+        """
+        open_digests = self.db.query(AlertNotification).filter(
+            AlertNotification.tenant_id.in_({tenant_id for tenant_id, _ in pending}),
+            AlertNotification.recipient_user_id.in_({user_id for _, user_id in pending}),
+            AlertNotification.channel == channel,
+            AlertNotification.status == PENDING,
+            AlertNotification.attempts == 0,
+            AlertNotification.next_attempt_at > now
+        ).with_for_update().all()
+        digests = {(digest.tenant_id, digest.recipient_user_id): digest for digest in open_digests}
+
+        window_end = now + timedelta(seconds=settings.NOTIFICATION_DIGEST_WINDOW_SECONDS)
+        rows = []
+        for (tenant_id, user_id), (recipient, alert_ids) in pending.items():
+            covered = [str(alert_id) for alert_id in alert_ids]
+            digest = digests.get((tenant_id, user_id))
+            if digest is not None:
+                already = set(digest.alert_ids or [])
+                digest.alert_ids = list(digest.alert_ids or []) + [a for a in covered if a not in already]
+                continue
+
+            rows.append({
+                "tenant_id": tenant_id,
+                "alert_id": alert_ids[0],
+                "alert_ids": covered,
+                "channel": channel,
+                "recipient_user_id": user_id,
+                "recipient_contact": recipient.email,
+                "status": PENDING,
+                "next_attempt_at": window_end
+            })
+
+        if rows:
+            self.db.execute(insert(AlertNotification.__table__), rows)
+
+    def dispatch_pending(self, channel: str = "email", batch_size: int = None) -> Dict[str, int]:
+        """
+        Deliver one batch of due pending notifications for a channel.
+
+        Rows are claimed with FOR UPDATE SKIP LOCKED so several workers can
+        drain the outbox; the batch is capped by the channel's per-minute rate
+        limit. Commits.
+        """
+        limit = min(batch_size or settings.NOTIFICATION_BATCH_SIZE, self._rate_budget(channel))
+        if limit <= 0:
+            return {"claimed": 0, "sent": 0, "retrying": 0, "failed": 0}
+
+        now = datetime.now()
+        notifications = self.db.query(AlertNotification).filter(
+            AlertNotification.channel == channel,
+            AlertNotification.status == PENDING,
+            or_(AlertNotification.next_attempt_at.is_(None), AlertNotification.next_attempt_at <= now)
+        ).order_by(AlertNotification.created_at).limit(limit).with_for_update(skip_locked=True).all()
+
+        stats = {"claimed": len(notifications), "sent": 0, "retrying": 0, "failed": 0}
+        if not notifications:
             self.db.commit()
-            
-        except smtplib.SMTPAuthenticationError as e:
-            error_msg = "SMTP Authentication failed. Check your EMAIL_HOST_USER and EMAIL_HOST_PASSWORD"
-            logger.error(f"✗ {error_msg}: {str(e)}")
-            self._log_failed_notification(alert, user, "email", error_msg)
-            
-        except smtplib.SMTPException as e:
-            error_msg = f"SMTP error occurred: {str(e)}"
-            logger.error(f"✗ Failed to send email to {user.email}: {error_msg}")
-            self._log_failed_notification(alert, user, "email", error_msg)
-            
-        except Exception as e:
-            error_msg = f"Unexpected error: {str(e)}"
-            logger.error(f"✗ Failed to send email to {user.email}: {error_msg}")
-            self._log_failed_notification(alert, user, "email", error_msg)
+            return stats
+
+        if channel == "email":
+            self._deliver_emails(notifications)
+        else:
+            for notification in notifications:
+                self._schedule_retry(notification, f"No sender for channel {channel}")
+
+        for notification in notifications:
+            if notification.status == SENT:
+                stats["sent"] += 1
+            elif notification.status == FAILED:
+                stats["failed"] += 1
+            else:
+                stats["retrying"] += 1
+
+        self.db.commit()
+        return stats
+
+    def _rate_budget(self, channel: str) -> int:
+        """Sends still allowed for the channel in the current one-minute window"""
+        rate = settings.NOTIFICATION_RATE_LIMITS_PER_MINUTE.get(channel)
+        if rate is None:
+            return settings.NOTIFICATION_BATCH_SIZE
+
+        sent_last_minute = self.db.query(func.count(AlertNotification.id)).filter(
+            AlertNotification.channel == channel,
+            AlertNotification.status == SENT,
+            AlertNotification.sent_at >= datetime.now() - timedelta(minutes=1)
+        ).scalar()
+        return max(rate - sent_last_minute, 0)
+
+    def _deliver_emails(self, notifications: List[AlertNotification]):
+        """Send a batch of digest emails over the process's pooled SMTP sessions"""
+        covered = {
+            notification.id: notification.alert_ids or [str(notification.alert_id)]
+            for notification in notifications
+        }
+        alert_ids = {alert_id for ids in covered.values() for alert_id in ids}
+        alerts = {
+            str(alert.id): alert
+            for alert in self.db.query(InventoryAlert).filter(
+                InventoryAlert.id.in_([UUID(alert_id) for alert_id in alert_ids])
+            ).all()
+        }
+
+        deliverable = []
+        messages = []
+        for notification in notifications:
+            digest_alerts = [alerts[alert_id] for alert_id in covered[notification.id] if alert_id in alerts]
+            if not digest_alerts:
+                notification.status = FAILED
+                notification.error_message = "Alerts no longer exist"
+                continue
+            deliverable.append(notification)
+            messages.append(self._build_email_message(digest_alerts, notification.recipient_contact))
+
+        results = get_smtp_pool().send_messages(messages)
+
+        for notification, error in zip(deliverable, results):
+            if error is None:
+                self._mark_sent(notification)
+                logger.info(f"✓ Email sent successfully to {notification.recipient_contact}")
+            elif isinstance(error, smtplib.SMTPAuthenticationError):
+                error_msg = "SMTP Authentication failed. Check your EMAIL_HOST_USER and EMAIL_HOST_PASSWORD"
+                logger.error(f"✗ {error_msg}: {str(error)}")
+                self._schedule_retry(notification, error_msg)
+            elif isinstance(error, smtplib.SMTPException):
+                error_msg = f"SMTP error occurred: {str(error)}"
+                logger.error(f"✗ Failed to send email to {notification.recipient_contact}: {error_msg}")
+                self._schedule_retry(notification, error_msg)
+            else:
+                error_msg = f"Unexpected error: {str(error)}"
+                logger.error(f"✗ Failed to send email to {notification.recipient_contact}: {error_msg}")
+                self._schedule_retry(notification, error_msg)
+
+    def _mark_sent(self, notification: AlertNotification):
+        notification.status = SENT
+        notification.sent_at = datetime.now()
+        notification.error_message = None
+        notification.attempts = (notification.attempts or 0) + 1
+
+    def _schedule_retry(self, notification: AlertNotification, error_message: str):
+        """Back off exponentially; give up after NOTIFICATION_MAX_ATTEMPTS"""
+        notification.attempts = (notification.attempts or 0) + 1
+        notification.error_message = error_message
+
+        if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            notification.status = FAILED
+            notification.next_attempt_at = None
+        else:
+            delay = settings.NOTIFICATION_RETRY_BACKOFF_SECONDS * (2 ** (notification.attempts - 1))
+            notification.next_attempt_at = datetime.now() + timedelta(seconds=delay)
     
-    def _log_failed_notification(self, alert: InventoryAlert, user: User, channel: str, error_message: str):
-        """Log failed notification delivery"""
-        try:
-            notification = AlertNotification(
-                tenant_id=alert.tenant_id,
-                alert_id=alert.id,
-                channel=channel,
-                recipient_user_id=user.id,
-                recipient_contact=user.email if channel == "email" else user.mobile_no,
-                status="failed",
-                error_message=error_message,
-                sent_at=datetime.now()
-            )
-            self.db.add(notification)
-            self.db.commit()
-        except Exception as e:
-            logger.error(f"Failed to log notification failure: {str(e)}")
-            self.db.rollback()
+    def _item_categories(self, alerts: List[InventoryAlert]) -> Dict[int, int]:
+        """Item category per alerted item; only queried when some tenant routes by category"""
+        item_ids = {
+            alert.inventory_item_id for alert in alerts
+            if alert.inventory_item_id is not None
+            and get_routing_table(self.db, alert.tenant_id).has_category_rules
+        }
+        if not item_ids:
+            return {}
+        return dict(
+            self.db.query(Inventory.id, Inventory.item_category_id).filter(Inventory.id.in_(item_ids)).all()
+        )
+
+    def _build_email_message(self, alerts: List[InventoryAlert], email: str) -> MIMEMultipart:
+        """Build one digest email covering alerts"""
+        alerts = sorted(alerts, key=lambda alert: -PRIORITY_RANK.get(alert.priority, 0))
+        top_priority = (alerts[0].priority or "medium").upper()
+
+        msg = MIMEMultipart()
+        msg['From'] = EMAIL_FROM or EMAIL_HOST_USER
+        msg['To'] = email
+        if len(alerts) == 1:
+            msg['Subject'] = f"[{top_priority}] {alerts[0].alert_type.value.replace('_', ' ').title()}"
+        else:
+            msg['Subject'] = f"[{top_priority}] {len(alerts)} inventory alerts"
+
+        alert_dates = [alert.alert_date for alert in alerts if alert.alert_date]
+        body = DIGEST_EMAIL_TEMPLATE.substitute(
+            summary=f"{len(alerts)} alert(s) need attention",
+            alerts="".join(self._render_alert(alert) for alert in alerts),
+            first_generated=min(alert_dates).strftime('%B %d, %Y at %I:%M %p') if alert_dates else "",
+            last_generated=max(alert_dates).strftime('%B %d, %Y at %I:%M %p') if alert_dates else ""
+        )
+        msg.attach(MIMEText(body, 'html'))
+        return msg
+
+    @staticmethod
+    def _render_alert(alert: InventoryAlert) -> str:
+        affected_dishes = (
+            AFFECTED_DISHES_TEMPLATE.substitute(affected_dishes=escape(alert.affected_dishes))
+            if alert.affected_dishes else ""
+        )
+        return DIGEST_ALERT_TEMPLATE.substitute(
+            priority=escape(alert.priority or ""),
+            priority_label=escape((alert.priority or "").upper()),
+            message=escape(alert.message or ""),
+            alert_type=alert.alert_type.value.replace('_', ' ').title(),
+            current_quantity=alert.current_quantity,
+            threshold_value=alert.threshold_value,
+            affected_dishes=affected_dishes,
+            suggested_action=escape(alert.suggested_action or ""),
+            alert_id=alert.id
+        )
     
-    def _send_sms_notification(self, alert: InventoryAlert, user: User):
+    def _send_sms_notification(self, alert: InventoryAlert, user: Recipient):
         """Send SMS notification using Twilio or similar service"""
         # TODO: Implement SMS sending logic
         # Example using Twilio:
@@ -256,7 +394,7 @@ class NotificationService:
         logger.info(f"SMS notification not implemented yet for user {user.id}")
         pass
     
-    def _should_send_email(self, alert: InventoryAlert, user: User) -> bool:
+    def _should_send_email(self, alert: InventoryAlert, user: Recipient) -> bool:
         """Check if email should be sent based on user preferences"""
         # Check if user has valid email
         if not user.email:
@@ -270,7 +408,7 @@ class NotificationService:
         # For now, send email to all users with valid email addresses
         return True
     
-    def _should_send_sms(self, alert: InventoryAlert, user: User) -> bool:
+    def _should_send_sms(self, alert: InventoryAlert, user: Recipient) -> bool:
         """Check if SMS should be sent (typically only for critical alerts)"""
         # Only send SMS for critical priority alerts
         if alert.priority != "critical":
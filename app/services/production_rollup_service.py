@@ -0,0 +1,231 @@
+"""
+app/services/production_rollup_service.py
+Maintained production counters (DishProductionRollup) behind the production reports
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, Optional, Tuple
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Integer, Select, and_, cast, delete, extract, func, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.dish import Dish, DishPreparationBatchLog, DishProductionRollup
+from app.models.users import User
+
+logger = logging.getLogger(__name__)
+
+# Every UTC offset in use is a multiple of 15 minutes, so 15-minute UTC
+# buckets add up exactly to any tenant's local hours and days
+BUCKET_MINUTES = 15
+
+_KEY = ("tenant_id", "bucket_start", "dish_id", "user_id")
+
+
+def as_utc(moment: datetime) -> datetime:
+    """Aware UTC datetime (naive datetimes are taken as UTC)"""
+    if moment.tzinfo is None:
+        return moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc)
+
+
+def bucket_start(moment: datetime) -> datetime:
+    """Start of the UTC bucket holding moment"""
+    moment = as_utc(moment)
+    return moment.replace(minute=moment.minute - moment.minute % BUCKET_MINUTES, second=0, microsecond=0)
+
+
+def bucket_end(moment: datetime) -> datetime:
+    """moment rounded up to a bucket boundary"""
+    start = bucket_start(moment)
+    return start if start == as_utc(moment) else start + timedelta(minutes=BUCKET_MINUTES)
+
+
+class ProductionRollupService:
+    """
+    Keeps DishProductionRollup in step with DishPreparationBatchLog.
+
+    Preparations add their counters with one upsert in the same transaction
+    (record), so concurrent writers commute. rebuild recomputes a closed
+    window from the logs, which repairs drift and picks up rows removed with
+    a deleted dish. Reports read the rollup, whose size depends on the
+    range and not on how many preparations it covers.
+    """
+
+    # Writes
+
+    @staticmethod
+    def record(db: Session, tenant_id: UUID, logs: Iterable[DishPreparationBatchLog]) -> int:
+        """Add freshly written logs to the rollup (their preparation_date must be set)"""
+        counters: Dict[Tuple, list] = {}
+        for log in logs:
+            key = (bucket_start(log.preparation_date), log.dish_id or 0, log.user_id or 0)
+            quantity = log.quantity_prepared or 0
+            cost = Decimal(str(log.total_cost or 0))
+            cost_per_unit = cost / quantity if quantity else None
+
+            entry = counters.setdefault(key, [0, 0, Decimal(0), Decimal(0), None, None])
+            entry[0] += 1
+            entry[1] += quantity
+            entry[2] += cost
+            if cost_per_unit is not None:
+                entry[3] += cost_per_unit
+                entry[4] = cost_per_unit if entry[4] is None else min(entry[4], cost_per_unit)
+                entry[5] = cost_per_unit if entry[5] is None else max(entry[5], cost_per_unit)
+
+        rows = [
+            {
+                "tenant_id": tenant_id,
+                "bucket_start": bucket,
+                "dish_id": dish_id,
+                "user_id": user_id,
+                "preparations_count": count,
+                "quantity_prepared": quantity,
+                "total_cost": cost,
+                "cost_per_unit_sum": cpu_sum,
+                "cost_per_unit_min": cpu_min,
+                "cost_per_unit_max": cpu_max
+            }
+            # key order keeps lock order stable between concurrent writers
+            for (bucket, dish_id, user_id), (count, quantity, cost, cpu_sum, cpu_min, cpu_max) in sorted(counters.items())
+        ]
+        if not rows:
+            return 0
+
+        R = DishProductionRollup
+        stmt = pg_insert(R).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(_KEY),
+            set_={
+                "preparations_count": R.preparations_count + stmt.excluded.preparations_count,
+                "quantity_prepared": R.quantity_prepared + stmt.excluded.quantity_prepared,
+                "total_cost": R.total_cost + stmt.excluded.total_cost,
+                "cost_per_unit_sum": R.cost_per_unit_sum + stmt.excluded.cost_per_unit_sum,
+                "cost_per_unit_min": func.least(R.cost_per_unit_min, stmt.excluded.cost_per_unit_min),
+                "cost_per_unit_max": func.greatest(R.cost_per_unit_max, stmt.excluded.cost_per_unit_max),
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
+        return len(rows)
+
+    @staticmethod
+    def _bucket_expression(column):
+        """SQL bucket_start of a timestamptz column"""
+        minutes = cast(func.floor(extract("minute", column) / BUCKET_MINUTES), Integer) * BUCKET_MINUTES
+        return func.date_trunc("hour", column) + func.make_interval(0, 0, 0, 0, 0, minutes)
+
+    @staticmethod
+    def rebuild(db: Session, tenant_id: UUID, start: datetime, end: datetime) -> int:
+        """
+        Recompute the tenant's buckets in [start, end) from the logs. Bounds
+        are widened to whole buckets; keep end before the current bucket so
+        preparations being recorded right now are not raced.
+        """
+        start, end = bucket_start(start), bucket_end(end)
+        log = DishPreparationBatchLog
+        R = DishProductionRollup
+
+        db.execute(delete(R).where(R.tenant_id == tenant_id, R.bucket_start >= start, R.bucket_start < end))
+
+        quantity = func.coalesce(log.quantity_prepared, 0)
+        cost_per_unit = func.coalesce(log.total_cost, 0) / func.nullif(quantity, 0)
+        bucket = ProductionRollupService._bucket_expression(log.preparation_date)
+        dish_id, user_id = func.coalesce(log.dish_id, 0), func.coalesce(log.user_id, 0)
+        source = select(
+            log.tenant_id,
+            bucket,
+            dish_id,
+            user_id,
+            func.count(log.id),
+            func.sum(quantity),
+            func.sum(func.coalesce(log.total_cost, 0)),
+            func.coalesce(func.sum(cost_per_unit), 0),
+            func.min(cost_per_unit),
+            func.max(cost_per_unit)
+        ).where(
+            log.tenant_id == tenant_id,
+            log.preparation_date >= start,
+            log.preparation_date < end
+        ).group_by(log.tenant_id, bucket, dish_id, user_id)
+
+        stmt = insert(R).from_select(
+            [*_KEY, "preparations_count", "quantity_prepared", "total_cost",
+             "cost_per_unit_sum", "cost_per_unit_min", "cost_per_unit_max"],
+            source
+        )
+        written = db.execute(stmt).rowcount
+        logger.info(f"Rebuilt production rollup for tenant {tenant_id} [{start}, {end}): {written} buckets")
+        return written
+
+    # Reads (statements, shared by the sync and async endpoints)
+
+    @staticmethod
+    def _window(tenant_id: UUID, start: datetime, end: datetime, dish_id: Optional[int] = None):
+        R = DishProductionRollup
+        criteria = [R.tenant_id == tenant_id, R.bucket_start >= bucket_start(start), R.bucket_start < as_utc(end)]
+        if dish_id is not None:
+            criteria.append(R.dish_id == dish_id)
+        return and_(*criteria)
+
+    @staticmethod
+    def totals_statement(tenant_id: UUID, start: datetime, end: datetime, dish_id: Optional[int] = None) -> Select:
+        """One row of totals over [start, end), start rounded down to its bucket"""
+        R = DishProductionRollup
+        return select(
+            func.coalesce(func.sum(R.preparations_count), 0).label("total_preparations"),
+            func.coalesce(func.sum(R.quantity_prepared), 0).label("total_quantity"),
+            func.coalesce(func.sum(R.total_cost), 0).label("total_cost"),
+            func.coalesce(func.sum(R.cost_per_unit_sum), 0).label("cost_per_unit_sum"),
+            func.min(R.cost_per_unit_min).label("min_cost_per_unit"),
+            func.max(R.cost_per_unit_max).label("max_cost_per_unit")
+        ).where(ProductionRollupService._window(tenant_id, start, end, dish_id))
+
+    @staticmethod
+    def by_dish_statement(tenant_id: UUID, start: datetime, end: datetime) -> Select:
+        R = DishProductionRollup
+        return select(
+            Dish.id,
+            Dish.name,
+            func.sum(R.quantity_prepared).label("total_prepared"),
+            func.sum(R.total_cost).label("total_cost"),
+            func.sum(R.preparations_count).label("preparations_count")
+        ).join(
+            Dish, Dish.id == R.dish_id
+        ).where(
+            ProductionRollupService._window(tenant_id, start, end)
+        ).group_by(Dish.id, Dish.name).order_by(func.sum(R.quantity_prepared).desc())
+
+    @staticmethod
+    def by_chef_statement(tenant_id: UUID, start: datetime, end: datetime) -> Select:
+        R = DishProductionRollup
+        return select(
+            User.id,
+            User.full_name,
+            func.sum(R.preparations_count).label("preparations_count"),
+            func.sum(R.quantity_prepared).label("total_dishes"),
+            func.sum(R.total_cost).label("total_cost")
+        ).join(
+            User, User.id == R.user_id
+        ).where(
+            ProductionRollupService._window(tenant_id, start, end)
+        ).group_by(User.id, User.full_name).order_by(func.sum(R.quantity_prepared).desc())
+
+    @staticmethod
+    def peak_hours_statement(
+        tenant_id: UUID, start: datetime, end: datetime, limit: int = 5, zone: Optional[ZoneInfo] = None
+    ) -> Select:
+        """Busiest hours of the day, in zone's local time (UTC by default)"""
+        R = DishProductionRollup
+        local = R.bucket_start if zone is None or zone.key == "UTC" else func.timezone(zone.key, R.bucket_start)
+        hour = extract("hour", local).label("hour")
+        return select(
+            hour,
+            func.sum(R.preparations_count).label("preparations"),
+            func.sum(R.quantity_prepared).label("dishes")
+        ).where(
+            ProductionRollupService._window(tenant_id, start, end)
+        ).group_by(hour).order_by(func.sum(R.quantity_prepared).desc()).limit(limit)
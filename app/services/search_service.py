@@ -0,0 +1,101 @@
+"""
+app/services/search_service.py
+Ranked, typo-tolerant name search for inventory items and dishes
+
+On PostgreSQL matching is served by the per-tenant pg_trgm GIN indexes
+(tenant_id, name gin_trgm_ops):
+
+- queries of MIN_TRIGRAM_QUERY_LENGTH characters or more match names that
+  contain them (ILIKE '%q%') or contain a word similar to them (q <% name,
+  pg_trgm.word_similarity_threshold, 0.6 by default), which covers
+  partially typed words and small typos;
+- shorter queries match name prefixes only.
+
+Results rank exact names first, then prefix matches, then by word
+similarity. On other databases (SQLite in local development) matching
+falls back to plain ILIKE with the same exact/prefix ordering.
+"""
+from functools import lru_cache
+from typing import Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy import Select, case, func, literal, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.elements import ColumnElement
+
+from app.core.config import settings
+
+# Below this a query has no complete trigram to look up in the index
+MIN_TRIGRAM_QUERY_LENGTH = 3
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+
+@lru_cache(maxsize=1)
+def trigram_enabled() -> bool:
+    return make_url(settings.DATABASE_URL).get_backend_name() == "postgresql"
+
+
+def escape_like(value: str) -> str:
+    """Escape LIKE wildcards so user input only matches literally"""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class SearchService:
+    """Builders for name lookups; the caller adds its own tenant and visibility filters"""
+
+    @staticmethod
+    def normalize(query: Optional[str]) -> str:
+        return " ".join((query or "").split())
+
+    @staticmethod
+    def match(column: ColumnElement, query: str) -> ColumnElement:
+        """WHERE clause for names matching query"""
+        query = SearchService.normalize(query)
+        pattern = escape_like(query)
+        if len(query) < MIN_TRIGRAM_QUERY_LENGTH:
+            return column.ilike(f"{pattern}%", escape="\\")
+        if not trigram_enabled():
+            return column.ilike(f"%{pattern}%", escape="\\")
+        return or_(
+            column.ilike(f"%{pattern}%", escape="\\"),
+            literal(query).op("<%")(column),
+        )
+
+    @staticmethod
+    def rank(column: ColumnElement, query: str) -> list:
+        """ORDER BY terms, best match first"""
+        query = SearchService.normalize(query)
+        order = [
+            case(
+                (func.lower(column) == query.lower(), 0),
+                (column.ilike(f"{escape_like(query)}%", escape="\\"), 1),
+                else_=2
+            )
+        ]
+        if trigram_enabled():
+            order.append(func.word_similarity(query, column).desc())
+        order.append(func.length(column))
+        return order
+
+    @staticmethod
+    def name_search_statement(
+        model,
+        tenant_id: UUID,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0,
+        columns: Optional[Sequence[ColumnElement]] = None
+    ) -> Select:
+        """
+        Ranked page of model rows (or of the given columns) whose name
+        matches query, within one tenant. Ties break on id so offsets are stable.
+        """
+        statement = select(*columns) if columns else select(model)
+        return (
+            statement
+            .where(model.tenant_id == tenant_id, SearchService.match(model.name, query))
+            .order_by(*SearchService.rank(model.name, query), model.id)
+            .limit(limit)
+            .offset(offset)
+        )
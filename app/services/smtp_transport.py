@@ -0,0 +1,260 @@
+"""
+app/services/smtp_transport.py
+Pooled, persistent SMTP sessions for outbound notification email
+"""
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from email.message import Message
+from typing import List, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class _Session:
+    """An authenticated SMTP connection plus its bookkeeping"""
+
+    __slots__ = ("smtp", "created_at", "last_used", "messages_sent")
+
+    def __init__(self, smtp: smtplib.SMTP):
+        self.smtp = smtp
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.messages_sent = 0
+
+
+class SMTPConnectionPool:
+    """
+    Bounded pool of authenticated SMTP sessions for one worker process.
+
+    Connect, EHLO, STARTTLS and login happen once per session; a session then
+    carries many messages until it hits max_messages_per_session or goes
+    stale. Sessions idle for longer than healthcheck_idle_seconds are checked
+    with NOOP before reuse. Counters are exposed through stats().
+    """
+
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        use_starttls: bool = True,
+        size: int = 2,
+        max_messages_per_session: int = 100,
+        healthcheck_idle_seconds: float = 30.0,
+        timeout: float = 30.0
+    ):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_starttls = use_starttls
+        self.size = size
+        self.max_messages_per_session = max_messages_per_session
+        self.healthcheck_idle_seconds = healthcheck_idle_seconds
+        self.timeout = timeout
+
+        self._idle: "queue.LifoQueue[_Session]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._counters = {
+            "connects": 0,
+            "healthcheck_failures": 0,
+            "reconnects": 0,
+            "sent": 0,
+            "errors": 0,
+            "send_seconds_total": 0.0,
+            "send_seconds_max": 0.0
+        }
+
+    # Sessions
+
+    def _connect(self) -> _Session:
+        smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            smtp.ehlo()
+            if self.use_starttls:
+                smtp.starttls()
+                smtp.ehlo()
+            if self.username and self.password:
+                smtp.login(self.username, self.password)
+        except Exception:
+            self._close(smtp)
+            raise
+
+        self._count("connects")
+        return _Session(smtp)
+
+    @staticmethod
+    def _close(smtp: smtplib.SMTP) -> None:
+        try:
+            smtp.quit()
+        except Exception:
+            try:
+                smtp.close()
+            except Exception:
+                pass
+
+    def _healthy(self, session: _Session) -> bool:
+        if session.messages_sent >= self.max_messages_per_session:
+            return False
+        if time.monotonic() - session.last_used < self.healthcheck_idle_seconds:
+            return True
+        try:
+            return session.smtp.noop()[0] == 250
+        except smtplib.SMTPException:
+            self._count("healthcheck_failures")
+            return False
+        except OSError:
+            self._count("healthcheck_failures")
+            return False
+
+    def acquire(self) -> _Session:
+        """Take an idle healthy session or open a new one (blocks while the pool is exhausted)"""
+        if not self._slots.acquire(timeout=self.timeout):
+            raise smtplib.SMTPException("Timed out waiting for a pooled SMTP session")
+
+        try:
+            while True:
+                try:
+                    session = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+
+                if self._healthy(session):
+                    return session
+                self._close(session.smtp)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, session: _Session, discard: bool = False) -> None:
+        """Return a session to the pool, or close it when broken or used up"""
+        try:
+            if discard or session.messages_sent >= self.max_messages_per_session:
+                self._close(session.smtp)
+            else:
+                session.last_used = time.monotonic()
+                self._idle.put(session)
+        finally:
+            self._slots.release()
+
+    def close_all(self) -> None:
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(session.smtp)
+
+    # Sending
+
+    def send_messages(self, messages: List[Message]) -> List[Optional[Exception]]:
+        """
+        Send messages over pooled sessions, in order.
+
+        Returns one entry per message: None when sent, else the exception.
+        A dropped connection is reopened once for the message that hit it;
+        exhausted sessions are swapped for fresh ones mid-batch.
+        """
+        results: List[Optional[Exception]] = []
+        session = None
+        try:
+            for message in messages:
+                if session is not None and session.messages_sent >= self.max_messages_per_session:
+                    self.release(session)
+                    session = None
+
+                try:
+                    if session is None:
+                        session = self.acquire()
+                    self._send_one(session, message)
+                    results.append(None)
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    if session is not None:
+                        self.release(session, discard=True)
+                        session = None
+                    results.append(self._retry_on_new_session(message, e))
+                except smtplib.SMTPException as e:
+                    self._count("errors")
+                    results.append(e)
+        finally:
+            if session is not None:
+                self.release(session)
+
+        return results
+
+    def _retry_on_new_session(self, message: Message, first_error: Exception) -> Optional[Exception]:
+        self._count("reconnects")
+        try:
+            session = self.acquire()
+        except Exception as e:
+            self._count("errors")
+            return e
+
+        try:
+            self._send_one(session, message)
+        except Exception as e:
+            self.release(session, discard=True)
+            self._count("errors")
+            return e
+        self.release(session)
+        return None
+
+    def _send_one(self, session: _Session, message: Message) -> None:
+        started = time.perf_counter()
+        session.smtp.send_message(message)
+        elapsed = time.perf_counter() - started
+
+        session.messages_sent += 1
+        session.last_used = time.monotonic()
+        with self._lock:
+            self._counters["sent"] += 1
+            self._counters["send_seconds_total"] += elapsed
+            self._counters["send_seconds_max"] = max(self._counters["send_seconds_max"], elapsed)
+
+    # Metrics
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self._counters)
+        counters["idle_sessions"] = self._idle.qsize()
+        counters["send_seconds_avg"] = (
+            counters["send_seconds_total"] / counters["sent"] if counters["sent"] else 0.0
+        )
+        return counters
+
+
+_pool: Optional[SMTPConnectionPool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool() -> SMTPConnectionPool:
+    """Process-wide pool built from the SMTP_* environment; rebuilt after fork"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = SMTPConnectionPool(
+                host=os.getenv('SMTP_HOST', 'smtp.gmail.com'),
+                port=int(os.getenv('SMTP_PORT', 587)),
+                username=os.getenv('SMTP_USERNAME'),
+                password=os.getenv('SMTP_PASSWORD'),
+                use_starttls=os.getenv('SMTP_STARTTLS', 'True') == 'True',
+                size=settings.SMTP_POOL_SIZE,
+                max_messages_per_session=settings.SMTP_POOL_MAX_MESSAGES_PER_SESSION,
+                healthcheck_idle_seconds=settings.SMTP_POOL_HEALTHCHECK_IDLE_SECONDS,
+                timeout=settings.SMTP_TIMEOUT_SECONDS
+            )
+            _pool_pid = os.getpid()
+        return _pool
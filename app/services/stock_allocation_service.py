@@ -0,0 +1,389 @@
+"""
+app/services/stock_allocation_service.py
+Set-based FIFO/FEFO stock allocation shared by the preparation paths
+"""
+import logging
+import random
+import time
+from collections import defaultdict
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+from uuid import UUID
+
+from sqlalchemy import and_, case, func, text, update
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.dish import PrePreparedMaterialStock
+from app.models.inventory import Inventory, InventoryBatch, InventoryStockLevel
+from app.services.stock_level_service import NOT_EXPIRED
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# deadlock_detected, serialization_failure, lock_not_available
+RETRYABLE_PGCODES = {"40P01", "40001", "55P03"}
+
+
+class StockConflictError(Exception):
+    """
+    Stock rows changed underneath a deduction; the whole operation can be
+    retried. Not a ValueError: callers answer it with 409, not as bad input.
+    """
+
+
+class StockAllocationService:
+    """
+    Loads every candidate lot for a set of ingredients in one ordered query,
+    splits demand across lots in memory (FEFO, then FIFO) and writes the
+    deductions back with one UPDATE per table.
+
+    A "lot" is a plain dict:
+        {"id", "batch_number", "remaining", "unit_cost", "version", "taken"}
+    (inventory batch lots also carry "lifecycle_stage")
+    `remaining` is decremented in memory as quantity is allocated and
+    `taken` accumulates what has to be deducted in the database.
+
+    Concurrency: with lock=True the pools are read with SELECT ... FOR UPDATE
+    in primary-key order (batches, then semi-finished stock, then inventory
+    rows), so concurrent preparations queue on the same rows instead of
+    deadlocking. Deductions are additionally guarded by the row `version`;
+    a mismatch raises StockConflictError and run_with_retry() replays the
+    whole operation with bounded backoff.
+    """
+
+    @staticmethod
+    def run_with_retry(db: Session, operation: Callable[[], T]) -> T:
+        """
+        Run a deduction transaction, rolling back and replaying it on lock
+        conflicts, deadlocks or version mismatches.
+        """
+        max_retries = settings.STOCK_DEDUCTION_MAX_RETRIES
+        backoff = settings.STOCK_DEDUCTION_RETRY_BACKOFF_MS / 1000
+
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except (StockConflictError, DBAPIError) as e:
+                if isinstance(e, DBAPIError) and getattr(e.orig, "pgcode", None) not in RETRYABLE_PGCODES:
+                    raise
+                db.rollback()
+
+                if attempt >= max_retries:
+                    logger.warning(f"Stock deduction gave up after {attempt + 1} attempts: {e}")
+                    raise StockConflictError(
+                        "Stock is being updated by another preparation. Please try again."
+                    ) from e
+
+                # Exponential backoff with jitter
+                delay = backoff * (2 ** attempt) * (0.5 + random.random())
+                attempt += 1
+                logger.info(f"Stock deduction conflict, retry {attempt}/{max_retries} in {delay:.3f}s")
+                time.sleep(delay)
+
+    @staticmethod
+    def set_lock_timeout(db: Session) -> None:
+        """Bound how long this transaction waits for stock row locks"""
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text(f"SET LOCAL lock_timeout = {int(settings.STOCK_LOCK_TIMEOUT_MS)}"))
+
+    @staticmethod
+    def _fefo_key(row):
+        return (
+            row.expiry_date is None, row.expiry_date or 0,
+            row.created_at is None, row.created_at or 0
+        )
+
+    @staticmethod
+    def load_batch_pool(
+        db: Session,
+        tenant_id: UUID,
+        ingredient_ids: Iterable[int],
+        lock: bool = False
+    ) -> Dict[int, List[dict]]:
+        """
+        Active, non-expired inventory batches for all ingredients, grouped per
+        ingredient in FEFO order. Lots are kept where NOT_EXPIRED holds, the
+        predicate behind InventoryStockLevel.available_quantity, so
+        preparation allocates exactly the stock feasibility counts. An ingredient whose
+        only active batches are expired maps to an empty list: it is batch
+        tracked and has nothing to give, so callers must not fall back to
+        its untracked quantity.
+        """
+        ingredient_ids = {i for i in ingredient_ids if i is not None}
+        if not ingredient_ids:
+            return {}
+
+        query = db.query(
+            InventoryBatch.id,
+            InventoryBatch.inventory_item_id,
+            InventoryBatch.batch_number,
+            InventoryBatch.quantity_remaining,
+            InventoryBatch.unit_cost,
+            InventoryBatch.version,
+            InventoryBatch.lifecycle_stage,
+            InventoryBatch.expiry_date,
+            InventoryBatch.created_at,
+            NOT_EXPIRED.label("allocatable")
+        ).filter(
+            and_(
+                InventoryBatch.tenant_id == tenant_id,
+                InventoryBatch.inventory_item_id.in_(ingredient_ids),
+                InventoryBatch.is_active == True,
+                InventoryBatch.quantity_remaining > 0
+            )
+        )
+
+        if lock:
+            # Lock in primary-key order, then sort FEFO in memory
+            rows = query.order_by(InventoryBatch.id).with_for_update().all()
+            rows.sort(key=lambda r: (r.inventory_item_id, StockAllocationService._fefo_key(r)))
+        else:
+            rows = query.order_by(
+                InventoryBatch.inventory_item_id,
+                InventoryBatch.expiry_date.asc().nullslast(),
+                InventoryBatch.created_at.asc()
+            ).all()
+
+        pool = defaultdict(list)
+        for row in rows:
+            lots = pool[row.inventory_item_id]
+            if not row.allocatable:
+                continue
+            lots.append({
+                "id": row.id,
+                "batch_number": row.batch_number,
+                "remaining": Decimal(row.quantity_remaining),
+                "unit_cost": Decimal(row.unit_cost) if row.unit_cost else Decimal(0),
+                "version": row.version,
+                "lifecycle_stage": row.lifecycle_stage,
+                "taken": Decimal(0)
+            })
+        return dict(pool)
+
+    @staticmethod
+    def load_stock_pool(
+        db: Session,
+        tenant_id: UUID,
+        product_ids: Iterable[UUID],
+        lock: bool = False
+    ) -> Dict[str, List[dict]]:
+        """Active semi-finished stock for all products, grouped per str(product_id) in FEFO order"""
+        product_ids = {p for p in product_ids if p is not None}
+        if not product_ids:
+            return {}
+
+        query = db.query(
+            PrePreparedMaterialStock.id,
+            PrePreparedMaterialStock.product_id,
+            PrePreparedMaterialStock.batch_number,
+            PrePreparedMaterialStock.quantity_remaining,
+            PrePreparedMaterialStock.quantity_produced,
+            PrePreparedMaterialStock.total_cost,
+            PrePreparedMaterialStock.version,
+            PrePreparedMaterialStock.expiry_date,
+            PrePreparedMaterialStock.production_date.label("created_at")
+        ).filter(
+            and_(
+                PrePreparedMaterialStock.tenant_id == tenant_id,
+                PrePreparedMaterialStock.product_id.in_(product_ids),
+                PrePreparedMaterialStock.is_active == True,
+                PrePreparedMaterialStock.quantity_remaining > 0
+            )
+        )
+
+        if lock:
+            # Lock in primary-key order, then sort FEFO in memory
+            rows = query.order_by(PrePreparedMaterialStock.id).with_for_update().all()
+            rows.sort(key=lambda r: (str(r.product_id), StockAllocationService._fefo_key(r)))
+        else:
+            rows = query.order_by(
+                PrePreparedMaterialStock.product_id,
+                PrePreparedMaterialStock.expiry_date.asc().nullslast(),
+                PrePreparedMaterialStock.production_date.asc()
+            ).all()
+
+        pool = defaultdict(list)
+        for row in rows:
+            # Semi-finished stock is costed per unit produced
+            if row.quantity_produced and row.quantity_produced > 0 and row.total_cost:
+                unit_cost = Decimal(row.total_cost) / Decimal(row.quantity_produced)
+            else:
+                unit_cost = Decimal(0)
+
+            pool[str(row.product_id)].append({
+                "id": row.id,
+                "batch_number": row.batch_number,
+                "remaining": Decimal(row.quantity_remaining),
+                "unit_cost": unit_cost,
+                "version": row.version,
+                "taken": Decimal(0)
+            })
+        return dict(pool)
+
+    @staticmethod
+    def load_stock_totals(
+        db: Session,
+        tenant_id: UUID,
+        ingredient_ids: Optional[Iterable[int]] = None,
+        product_ids: Optional[Iterable[UUID]] = None
+    ) -> Tuple[Dict[int, Decimal], Dict[str, Decimal]]:
+        """
+        Read-only snapshot of available quantity: non-expired totals per raw
+        ingredient (read from the maintained InventoryStockLevel rows) and
+        per semi-finished product (keyed by str(product_id)).
+        None means the whole tenant.
+        """
+        level_query = db.query(
+            InventoryStockLevel.inventory_item_id,
+            InventoryStockLevel.available_quantity
+        ).filter(InventoryStockLevel.tenant_id == tenant_id)
+        if ingredient_ids is not None:
+            level_query = level_query.filter(InventoryStockLevel.inventory_item_id.in_(set(ingredient_ids)))
+
+        stock_query = db.query(
+            PrePreparedMaterialStock.product_id,
+            func.sum(PrePreparedMaterialStock.quantity_remaining)
+        ).filter(
+            and_(
+                PrePreparedMaterialStock.tenant_id == tenant_id,
+                PrePreparedMaterialStock.is_active == True,
+                PrePreparedMaterialStock.quantity_remaining > 0
+            )
+        )
+        if product_ids is not None:
+            stock_query = stock_query.filter(PrePreparedMaterialStock.product_id.in_(set(product_ids)))
+
+        ingredient_totals = {
+            item_id: Decimal(available)
+            for item_id, available in level_query.all()
+        }
+        product_totals = {
+            str(product_id): Decimal(total)
+            for product_id, total in stock_query.group_by(PrePreparedMaterialStock.product_id).all()
+        }
+        return ingredient_totals, product_totals
+
+    @staticmethod
+    def load_inventory_items(
+        db: Session,
+        tenant_id: UUID,
+        ingredient_ids: Iterable[int],
+        lock: bool = False
+    ) -> Dict[int, Inventory]:
+        """Inventory rows by id; locked in primary-key order when lock=True"""
+        ingredient_ids = {i for i in ingredient_ids if i is not None}
+        if not ingredient_ids:
+            return {}
+
+        query = db.query(Inventory).filter(
+            and_(
+                Inventory.tenant_id == tenant_id,
+                Inventory.id.in_(ingredient_ids)
+            )
+        ).order_by(Inventory.id)
+        if lock:
+            query = query.with_for_update()
+        return {item.id: item for item in query.all()}
+
+    @staticmethod
+    def available(lots: List[dict]) -> Decimal:
+        """Quantity still unallocated across lots"""
+        return sum((lot["remaining"] for lot in lots), Decimal(0))
+
+    @staticmethod
+    def allocate(lots: List[dict], quantity: Decimal) -> List[Tuple[dict, Decimal]]:
+        """
+        Take quantity from lots in pool order.
+        Callers check availability first; any shortfall is simply left unallocated.
+        """
+        allocations = []
+        qty_remaining = quantity
+
+        for lot in lots:
+            if qty_remaining <= 0:
+                break
+            if lot["remaining"] <= 0:
+                continue
+
+            qty_from_lot = min(lot["remaining"], qty_remaining)
+            lot["remaining"] -= qty_from_lot
+            lot["taken"] += qty_from_lot
+            allocations.append((lot, qty_from_lot))
+            qty_remaining -= qty_from_lot
+
+        return allocations
+
+    @staticmethod
+    def _apply_deductions(db: Session, model, pool: Dict[object, List[dict]]) -> int:
+        """
+        One UPDATE for every touched lot of `model`, guarded by the version
+        each lot was read at. Raises StockConflictError if any row moved on.
+        """
+        touched = [lot for lots in pool.values() for lot in lots if lot["taken"] > 0]
+        if not touched:
+            return 0
+
+        taken = {lot["id"]: lot["taken"] for lot in touched}
+        versions = {lot["id"]: lot["version"] for lot in touched}
+
+        result = db.execute(
+            update(model)
+            .where(
+                model.id.in_(list(taken)),
+                model.version == case(versions, value=model.id)
+            )
+            .values(
+                quantity_remaining=model.quantity_remaining - case(taken, value=model.id),
+                version=model.version + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.rowcount != len(taken):
+            raise StockConflictError(
+                f"{model.__tablename__}: {len(taken) - result.rowcount} of {len(taken)} rows "
+                f"changed during allocation"
+            )
+
+        for lot in touched:
+            lot["version"] += 1
+        return len(taken)
+
+    @staticmethod
+    def apply_batch_deductions(db: Session, pool: Dict[int, List[dict]]) -> int:
+        """Write every batch deduction in the pool with a single UPDATE"""
+        return StockAllocationService._apply_deductions(db, InventoryBatch, pool)
+
+    @staticmethod
+    def apply_stock_deductions(db: Session, pool: Dict[str, List[dict]]) -> int:
+        """Write every semi-finished stock deduction in the pool with a single UPDATE"""
+        return StockAllocationService._apply_deductions(db, PrePreparedMaterialStock, pool)
+
+    @staticmethod
+    def apply_inventory_deductions(
+        db: Session,
+        tenant_id: UUID,
+        deductions: Dict[int, Decimal]
+    ) -> int:
+        """Decrement Inventory.current_quantity for every ingredient with a single UPDATE"""
+        deductions = {k: v for k, v in deductions.items() if k is not None and v}
+        if not deductions:
+            return 0
+
+        db.execute(
+            update(Inventory)
+            .where(
+                Inventory.tenant_id == tenant_id,
+                Inventory.id.in_(list(deductions))
+            )
+            .values(
+                current_quantity=func.coalesce(Inventory.current_quantity, 0)
+                - case(deductions, value=Inventory.id)
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return len(deductions)
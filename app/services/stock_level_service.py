@@ -0,0 +1,228 @@
+"""
+app/services/stock_level_service.py
+Maintained per-ingredient stock aggregate (InventoryStockLevel)
+"""
+import logging
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.models.inventory import Inventory, InventoryBatch, InventoryStockLevel, PerishableLifecycle
+
+logger = logging.getLogger(__name__)
+
+# Batches that count as available stock and that preparations may allocate
+# (StockAllocationService.load_batch_pool); NULL lifecycle_stage counts as usable
+NOT_EXPIRED = InventoryBatch.lifecycle_stage.is_distinct_from(PerishableLifecycle.EXPIRED)
+
+
+class StockLevelService:
+    """
+    Keeps InventoryStockLevel in step with InventoryBatch.
+
+    Batch writes (create_batch, preparations, semi-finished production,
+    wastage) apply signed deltas with one upsert in the same transaction, so
+    concurrent writers commute. Lifecycle transitions and the reconciliation
+    job recompute the aggregate from the batches instead, after locking the
+    level rows so in-flight deltas queue behind them.
+
+    Deltas are dicts of {inventory_item_id: [available, near_expiry, value]}.
+    """
+
+    @staticmethod
+    def add_lot(
+        deltas: Dict[int, List[Decimal]],
+        inventory_item_id: int,
+        lifecycle_stage,
+        quantity: Decimal,
+        unit_cost: Optional[Decimal]
+    ) -> None:
+        """Accumulate a signed batch quantity change into deltas"""
+        if inventory_item_id is None or not quantity:
+            return
+
+        entry = deltas.setdefault(inventory_item_id, [Decimal(0), Decimal(0), Decimal(0)])
+        if lifecycle_stage == PerishableLifecycle.EXPIRED:
+            # Expired stock is not available and carries no value
+            return
+
+        entry[0] += quantity
+        if lifecycle_stage == PerishableLifecycle.NEAR_EXPIRY:
+            entry[1] += quantity
+        entry[2] += quantity * (unit_cost or Decimal(0))
+
+    @staticmethod
+    def deltas_from_pool(batch_pool: Dict[int, List[dict]]) -> Dict[int, List[Decimal]]:
+        """Negative deltas for everything taken from an allocation pool"""
+        deltas = {}
+        for inventory_item_id, lots in batch_pool.items():
+            for lot in lots:
+                if lot["taken"] > 0:
+                    StockLevelService.add_lot(
+                        deltas, inventory_item_id, lot.get("lifecycle_stage"),
+                        -lot["taken"], lot["unit_cost"]
+                    )
+        return deltas
+
+    @staticmethod
+    def apply_deltas(db: Session, tenant_id: UUID, deltas: Dict[int, List[Decimal]]) -> int:
+        """Apply all deltas with a single upsert (rows in key order to keep lock order stable)"""
+        rows = [
+            {
+                "tenant_id": tenant_id,
+                "inventory_item_id": item_id,
+                "available_quantity": available,
+                "near_expiry_quantity": near_expiry,
+                "stock_value": value
+            }
+            for item_id, (available, near_expiry, value) in sorted(deltas.items())
+        ]
+        if not rows:
+            return 0
+
+        stmt = pg_insert(InventoryStockLevel).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InventoryStockLevel.inventory_item_id],
+            set_={
+                "available_quantity": InventoryStockLevel.available_quantity + stmt.excluded.available_quantity,
+                "near_expiry_quantity": InventoryStockLevel.near_expiry_quantity + stmt.excluded.near_expiry_quantity,
+                "stock_value": InventoryStockLevel.stock_value + stmt.excluded.stock_value,
+                "updated_at": func.now()
+            }
+        )
+        db.execute(stmt)
+        return len(rows)
+
+    @staticmethod
+    def _aggregate(tenant_id: UUID, item_ids: Optional[Iterable[int]] = None):
+        """Per-item totals recomputed from active batches (zeros for items without any)"""
+        totals = select(
+            InventoryBatch.inventory_item_id.label("inventory_item_id"),
+            func.sum(case((NOT_EXPIRED, InventoryBatch.quantity_remaining), else_=0)).label("available_quantity"),
+            func.sum(case(
+                (InventoryBatch.lifecycle_stage == PerishableLifecycle.NEAR_EXPIRY, InventoryBatch.quantity_remaining),
+                else_=0
+            )).label("near_expiry_quantity"),
+            func.sum(case(
+                (NOT_EXPIRED, InventoryBatch.quantity_remaining * func.coalesce(InventoryBatch.unit_cost, 0)),
+                else_=0
+            )).label("stock_value")
+        ).where(
+            and_(
+                InventoryBatch.tenant_id == tenant_id,
+                InventoryBatch.is_active == True,
+                InventoryBatch.quantity_remaining > 0
+            )
+        ).group_by(InventoryBatch.inventory_item_id).subquery()
+
+        query = select(
+            Inventory.tenant_id,
+            Inventory.id.label("inventory_item_id"),
+            func.coalesce(totals.c.available_quantity, 0).label("available_quantity"),
+            func.coalesce(totals.c.near_expiry_quantity, 0).label("near_expiry_quantity"),
+            func.coalesce(totals.c.stock_value, 0).label("stock_value")
+        ).select_from(Inventory).outerjoin(
+            totals, totals.c.inventory_item_id == Inventory.id
+        ).where(Inventory.tenant_id == tenant_id)
+
+        if item_ids is not None:
+            query = query.where(Inventory.id.in_(set(item_ids)))
+        return query
+
+    @staticmethod
+    def refresh(db: Session, tenant_id: UUID, item_ids: Optional[Iterable[int]] = None) -> int:
+        """Recompute levels from batches for the given items (all tenant items when None)"""
+        if item_ids is not None:
+            item_ids = sorted({i for i in item_ids if i is not None})
+            if not item_ids:
+                return 0
+
+        # Lock existing level rows first so concurrent deltas wait for us
+        lock_query = db.query(InventoryStockLevel.inventory_item_id).filter(
+            InventoryStockLevel.tenant_id == tenant_id
+        )
+        if item_ids is not None:
+            lock_query = lock_query.filter(InventoryStockLevel.inventory_item_id.in_(item_ids))
+        lock_query.order_by(InventoryStockLevel.inventory_item_id).with_for_update().all()
+
+        source = StockLevelService._aggregate(tenant_id, item_ids)
+        stmt = pg_insert(InventoryStockLevel).from_select(
+            ["tenant_id", "inventory_item_id", "available_quantity", "near_expiry_quantity", "stock_value"],
+            source
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[InventoryStockLevel.inventory_item_id],
+            set_={
+                "available_quantity": stmt.excluded.available_quantity,
+                "near_expiry_quantity": stmt.excluded.near_expiry_quantity,
+                "stock_value": stmt.excluded.stock_value,
+                "updated_at": func.now()
+            }
+        )
+        return db.execute(stmt).rowcount
+
+    @staticmethod
+    def find_drift(db: Session, tenant_id: UUID) -> List[dict]:
+        """Items whose maintained level differs from the batch aggregate"""
+        expected = StockLevelService._aggregate(tenant_id).subquery()
+
+        rows = db.execute(
+            select(
+                expected.c.inventory_item_id,
+                expected.c.available_quantity,
+                expected.c.near_expiry_quantity,
+                expected.c.stock_value,
+                InventoryStockLevel.available_quantity.label("level_available"),
+                InventoryStockLevel.near_expiry_quantity.label("level_near_expiry"),
+                InventoryStockLevel.stock_value.label("level_value")
+            ).select_from(expected).outerjoin(
+                InventoryStockLevel,
+                InventoryStockLevel.inventory_item_id == expected.c.inventory_item_id
+            ).where(
+                or_(
+                    InventoryStockLevel.inventory_item_id.is_(None),
+                    InventoryStockLevel.available_quantity != expected.c.available_quantity,
+                    InventoryStockLevel.near_expiry_quantity != expected.c.near_expiry_quantity,
+                    func.round(InventoryStockLevel.stock_value, 2) != func.round(expected.c.stock_value, 2)
+                )
+            )
+        ).all()
+
+        return [
+            {
+                "inventory_item_id": row.inventory_item_id,
+                "expected_available": float(row.available_quantity),
+                "recorded_available": float(row.level_available) if row.level_available is not None else None,
+                "expected_near_expiry": float(row.near_expiry_quantity),
+                "recorded_near_expiry": float(row.level_near_expiry) if row.level_near_expiry is not None else None
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def reconcile(db: Session, tenant_id: UUID) -> dict:
+        """Detect and repair drift for one tenant; caller commits"""
+        drift = StockLevelService.find_drift(db, tenant_id)
+        if drift:
+            logger.warning(
+                f"Stock level drift for tenant {tenant_id}: {len(drift)} item(s), e.g. {drift[:3]}"
+            )
+            StockLevelService.refresh(db, tenant_id, [d["inventory_item_id"] for d in drift])
+
+        return {"tenant_id": str(tenant_id), "drifted_items": len(drift)}
+
+    @staticmethod
+    def get_levels(
+        db: Session,
+        tenant_id: UUID,
+        item_ids: Optional[Iterable[int]] = None
+    ) -> Dict[int, InventoryStockLevel]:
+        """Maintained levels by inventory item id"""
+        query = db.query(InventoryStockLevel).filter(InventoryStockLevel.tenant_id == tenant_id)
+        if item_ids is not None:
+            query = query.filter(InventoryStockLevel.inventory_item_id.in_(set(item_ids)))
+        return {level.inventory_item_id: level for level in query.all()}
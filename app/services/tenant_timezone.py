@@ -0,0 +1,78 @@
+"""
+app/services/tenant_timezone.py
+Timezone that decides a tenant's (or branch's) local days, cached per process
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional
+from uuid import UUID
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.branch import Branch
+from app.utils.cache import TTLCache, invalidate_on_commit
+from app.utils.time_windows import get_zone
+
+
+@dataclass(frozen=True)
+class TenantZones:
+    """
+    Zones of a tenant's branches. Tenants have no timezone of their own:
+    theirs is the oldest active branch's that has one set, else
+    settings.DEFAULT_TIMEZONE.
+    """
+    default: ZoneInfo
+    branches: Dict[UUID, ZoneInfo]
+
+    def zone(self, branch_id: Optional[UUID] = None) -> ZoneInfo:
+        if branch_id is None:
+            return self.default
+        return self.branches.get(branch_id, self.default)
+
+    @classmethod
+    def from_rows(cls, rows) -> "TenantZones":
+        branches = {row.branch_id: get_zone(row.timezone) for row in rows if row.timezone}
+        default = next((branches[row.branch_id] for row in rows if row.timezone and row.is_active), None)
+        return cls(default or get_zone(None), branches)
+
+
+def timezone_statement(tenant_id: UUID) -> Select:
+    return select(Branch.branch_id, Branch.timezone, Branch.is_active).where(
+        Branch.tenant_id == tenant_id
+    ).order_by(Branch.created_at, Branch.branch_id)
+
+
+_timezone_cache = TTLCache(
+    maxsize=settings.TENANT_TIMEZONE_CACHE_MAX_TENANTS,
+    ttl=settings.TENANT_TIMEZONE_CACHE_TTL_SECONDS
+)
+
+
+def get_tenant_zone(db: Session, tenant_id: UUID, branch_id: Optional[UUID] = None) -> ZoneInfo:
+    """Cached zone of the tenant, or of one of its branches"""
+    zones = _timezone_cache.get_or_set(
+        tenant_id, lambda: TenantZones.from_rows(db.execute(timezone_statement(tenant_id)).all())
+    )
+    return zones.zone(branch_id)
+
+
+async def get_tenant_zone_async(db: AsyncSession, tenant_id: UUID, branch_id: Optional[UUID] = None) -> ZoneInfo:
+    zones = _timezone_cache.get(tenant_id)
+    if zones is None:
+        zones = TenantZones.from_rows((await db.execute(timezone_statement(tenant_id))).all())
+        _timezone_cache.set(tenant_id, zones)
+    return zones.zone(branch_id)
+
+
+def invalidate_tenant_zone(tenant_id: Optional[UUID] = None) -> None:
+    if tenant_id is None:
+        _timezone_cache.clear()
+    else:
+        _timezone_cache.invalidate(tenant_id)
+
+
+# Branches flushed in a transaction drop the tenant's zones once it commits
+invalidate_on_commit((Branch,), "timezone_tenants", invalidate_tenant_zone)
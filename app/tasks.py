@@ -1,77 +1,157 @@
 from app.celery_app import celery_app
+from app.celery_tasks.fanout import fan_out, tenant_job
+from app.core.config import settings
 from app.db.session import SessionLocal
-from app.models.inventory import InventoryBatch,Inventory,ItemCategory
+from app.models.inventory import InventoryBatch,Inventory,ItemCategory,ItemPerishableNonPerishable
+from app.models.tenants import Tenant
+from app.services.production_rollup_service import ProductionRollupService, bucket_start
+from app.services.stock_level_service import StockLevelService
+from app.utils.inventory_batch_helper import lifecycle_stage_expression, next_lifecycle_transition_expression
+from sqlalchemy import func, select, update
 from sqlalchemy.orm import Session
-from datetime import datetime,date
+from datetime import datetime, date, timedelta, timezone
+from typing import Dict
+from uuid import UUID
 import logging
 
 
 logger = logging.getLogger(__name__)
 
 
-def calculate_days_until_expiry(expiry_date: datetime) -> int:
-    today = datetime.utcnow().date()
-    expiry = expiry_date.date() if hasattr(expiry_date,"date") else expiry_date
-    return (expiry - today).days
-
-def find_lifecycle_stage(
-    days_until_expiry: int,
-    fresh_threshold: int,
-) -> str:
-    if days_until_expiry < 0:
-        return "EXPIRED"
-    elif days_until_expiry <= fresh_threshold:
-        return "NEAR_EXPIRY"
-    else:
-        return "FRESH" 
-    
-def update_batch_lifecycle(batch:InventoryBatch, item:Inventory, db:Session):
-    if not batch.expiry_date:
-        return
-    
-    days_until_expiry = calculate_days_until_expiry(batch.expiry_date)
-    old_stage = batch.lifecycle_stage
-
-    batch.lifecycle_stage = find_lifecycle_stage(
-        days_until_expiry,
-        item.fresh_threshold_days or 3,
+def _advance_lifecycles(db: Session, today: date, *criteria) -> Dict[UUID, int]:
+    """
+    Reclassify the perishable batches matching criteria with one UPDATE and
+    refresh the stock levels of the affected items. Only items whose
+    category is PERISHABLE have a lifecycle; dated non-perishable stock
+    never expires out of the available levels. Transitions are aggregated in the
+    database (UPDATE ... RETURNING inside a CTE), so only one row per changed
+    item comes back. Returns transition counts per tenant; caller commits.
+    """
+    updated = (
+        update(InventoryBatch)
+        .where(
+            InventoryBatch.inventory_item_id == Inventory.id,
+            Inventory.item_category_id == ItemCategory.id,
+            ItemCategory.category_type == ItemPerishableNonPerishable.PERISHABLE,
+            InventoryBatch.expiry_date.isnot(None),
+            *criteria
+        )
+        .values(
+            lifecycle_stage=lifecycle_stage_expression(today),
+            next_lifecycle_transition=next_lifecycle_transition_expression(today),
+            version=InventoryBatch.version + 1
+        )
+        .returning(InventoryBatch.tenant_id, InventoryBatch.inventory_item_id)
+        .cte("updated")
     )
+    rows = db.execute(
+        select(updated.c.tenant_id, updated.c.inventory_item_id, func.count())
+        .group_by(updated.c.tenant_id, updated.c.inventory_item_id)
+    ).all()
 
-    if old_stage != batch.lifecycle_stage:
-        logger.info(
-            f"Batch {batch.id} lifecycle updated: {old_stage} -> {batch.lifecycle_stage}"
-            f"(expires in {days_until_expiry} days)"
-        )
+    # Stage changes move quantity between buckets: recompute those levels
+    changed_items = {}
+    counts = {}
+    for tenant_id, inventory_item_id, transitions in rows:
+        changed_items.setdefault(tenant_id, set()).add(inventory_item_id)
+        counts[tenant_id] = counts.get(tenant_id, 0) + transitions
+    for tenant_id, item_ids in changed_items.items():
+        StockLevelService.refresh(db, tenant_id, item_ids)
+
+    return counts
+
+
+def _advance_due_lifecycles(db: Session, today: date) -> Dict[UUID, int]:
+    """Incremental engine: only batches whose scheduled transition is due"""
+    counts = _advance_lifecycles(db, today, InventoryBatch.next_lifecycle_transition <= today)
+    db.commit()
+    return counts
+
+
+def _reclassify_all_lifecycles(db: Session, today: date) -> Dict[UUID, int]:
+    """SQL engine: full reclassification, one statement per tenant chunk"""
+    tenant_ids = [row.tenant_id for row in db.query(Tenant.tenant_id).order_by(Tenant.tenant_id).all()]
+    chunk_size = max(settings.LIFECYCLE_TENANT_CHUNK_SIZE, 1)
+
+    counts = {}
+    for start in range(0, len(tenant_ids), chunk_size):
+        chunk = tenant_ids[start:start + chunk_size]
+        counts.update(_advance_lifecycles(
+            db, today,
+            InventoryBatch.tenant_id.in_(chunk),
+            InventoryBatch.lifecycle_stage.is_distinct_from(lifecycle_stage_expression(today))
+        ))
         db.commit()
+    return counts
+
 
 @celery_app.task(name="app.tasks.update_all_batch_lifecycles")
 def update_batch_lifecycles_status():
+    """
+    Advance batch lifecycle stages.
+
+    The default "incremental" engine relies on next_lifecycle_transition so a
+    run touches only due batches; the "sql" engine (LIFECYCLE_ENGINE) compares
+    every dated batch against its computed stage inside PostgreSQL and
+    rewrites only the ones that differ.
+    """
     db = SessionLocal()
 
-    try: 
-        batches = db.query(InventoryBatch).join(Inventory).filter(
-            InventoryBatch.expiry_date.isnot(None),
-            ItemCategory.category_type == "PERISHABLE"
-        ).all()
+    try:
+        today = datetime.utcnow().date()
 
-        updated_count = 0
-        for batch in batches:
-            previous_batch = batch.lifecycle_stage
-            update_batch_lifecycle(batch, batch.item, db)
+        if settings.LIFECYCLE_ENGINE == "sql":
+            counts = _reclassify_all_lifecycles(db, today)
+        else:
+            counts = _advance_due_lifecycles(db, today)
 
-            if previous_batch != batch.lifecycle_stage:
-                updated_count += 1
+        for tenant_id, transitions in counts.items():
+            logger.info(f"Tenant {tenant_id}: {transitions} batch lifecycle transitions")
 
-        logger.info(f"Batch lifecycle update completed. Updated {updated_count} batches.") 
+        updated_count = sum(counts.values())
+        logger.info(
+            f"Batch lifecycle update completed ({settings.LIFECYCLE_ENGINE}). Updated {updated_count} batches."
+        )
         return {
             "status" : "success",
-            "total_batches": len(batches),
-            "updated_batches": updated_count
-        }              
-    
+            "engine": settings.LIFECYCLE_ENGINE,
+            "updated_batches": updated_count,
+            "tenant_transitions": {str(tenant_id): transitions for tenant_id, transitions in counts.items()}
+        }
+
     except Exception as e:
         logger.error(f"Error updating batch lifecycles: {str(e)}")
         db.rollback()
         raise
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+@tenant_job("reconcile_stock_levels")
+def reconcile_tenant_stock_levels(db: Session, tenant_id: UUID):
+    """Repair drift between InventoryStockLevel and the batch aggregate for one tenant"""
+    result = StockLevelService.reconcile(db, tenant_id)
+    db.commit()
+    return {"drifted_items": result["drifted_items"]}
+
+
+@celery_app.task(name="app.tasks.reconcile_stock_levels")
+def reconcile_stock_levels():
+    """Scheduled stock level reconciliation: fans out per tenant chunk"""
+    return fan_out("reconcile_stock_levels")
+
+
+@tenant_job("rebuild_production_rollups")
+def rebuild_tenant_production_rollups(db: Session, tenant_id: UUID):
+    """Recompute the last PRODUCTION_ROLLUP_REBUILD_DAYS of production buckets, up to the current bucket"""
+    end = bucket_start(datetime.now(timezone.utc))
+    start = end - timedelta(days=settings.PRODUCTION_ROLLUP_REBUILD_DAYS)
+    buckets = ProductionRollupService.rebuild(db, tenant_id, start, end)
+    db.commit()
+    return {"buckets": buckets}
+
+
+@celery_app.task(name="app.tasks.rebuild_production_rollups")
+def rebuild_production_rollups():
+    """Scheduled production rollup repair: fans out per tenant chunk"""
+    return fan_out("rebuild_production_rollups")
@@ -1,24 +1,23 @@
 import re
-from passlib.context import CryptContext
 import hashlib
+from operator import attrgetter
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from typing import Optional
 from app.api.deps import get_db
 from app.core.config import settings
+from app.core.security import get_password_hasher
 from jose import jwt ,JWTError
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer,HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import event, inspect
 from sqlalchemy.orm import Session
 from uuid import UUID
 from app.models.users import User, UserRole
+from app.utils.cache import TTLCache, invalidate_on_commit
 
 security = HTTPBearer()
 
-pwd_context = CryptContext(
-    schemes=["argon2"],
-    deprecated="auto",
-)
-
-
 PASSWORD_REGEX = re.compile(
     r"""
     ^(?=.*[a-z])        # lowercase
@@ -39,11 +38,15 @@ def validate_password(password: str) -> None:
     
 def hash_password(password:str) -> str:
     # digest = hashlib.sha256(password.encode("utf-8")).digest()
-    return pwd_context.hash(password)
+    return get_password_hasher().hash(password)
 
 def verify_password(password: str, hashed: str):
     # digest = hashlib.sha256(password.encode("utf-8")).digest()
-    return pwd_context.verify(password, hashed)
+    return get_password_hasher().verify_and_update(password, hashed)[0]
+
+def verify_and_update_password(password: str, hashed: str):
+    """(matches, new_hash); new_hash is set when hashed used outdated argon2 parameters"""
+    return get_password_hasher().verify_and_update(password, hashed)
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -56,33 +59,129 @@ def create_access_token(data: dict):
 token_authorization = OAuth2PasswordBearer(tokenUrl="/api/v1/auth/login")
 (token_authorization,"TOKEN")
 
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated user handed to endpoints: a detached snapshot of the users row"""
+    id: int
+    tenant_id: Optional[UUID]
+    role: Optional[UserRole]
+    email: Optional[str]
+    full_name: Optional[str]
+    is_active: bool
+    is_super_admin: bool
+    token_version: int
+
+
+_user_cache = TTLCache(
+    maxsize=settings.AUTH_USER_CACHE_MAX_USERS,
+    ttl=settings.AUTH_USER_CACHE_TTL_SECONDS
+)
+
+
+def _load_principal(db: Session, user_id: int) -> Optional[Principal]:
+    row = db.query(
+        User.id, User.tenant_id, User.role, User.email, User.full_name,
+        User.is_active, User.is_super_admin, User.token_version
+    ).filter(User.id == user_id).first()
+    if row is None:
+        return None
+
+    return Principal(
+        id=row.id,
+        tenant_id=row.tenant_id,
+        role=row.role,
+        email=row.email,
+        full_name=row.full_name,
+        is_active=bool(row.is_active),
+        is_super_admin=bool(row.is_super_admin),
+        token_version=row.token_version or 0
+    )
+
+
+def invalidate_user_auth(user_id: Optional[int] = None) -> None:
+    """Drop cached auth state for one user (or everyone) in this process"""
+    if user_id is None:
+        _user_cache.clear()
+    else:
+        _user_cache.invalidate(user_id)
+
+
+def revoke_user_tokens(user: User) -> None:
+    """Invalidate every token issued to the user so far; takes effect on commit"""
+    user.token_version = (user.token_version or 0) + 1
+
+
 def get_current_user(
    credentials: HTTPAuthorizationCredentials = Depends(security),
     db: Session = Depends(get_db),
 ):
+    """
+    Resolve the bearer token to the acting user.
+
+    In the default "stateless" AUTH_MODE the token claims (sub, tenant_id,
+    role, ver) are checked against a cached snapshot of the user's state, so
+    most requests authenticate without a database round trip; the session is
+    only used on a cache miss. A token is rejected once its "ver" no longer
+    matches users.token_version. AUTH_MODE="db" loads the User row on every
+    request instead.
+    """
     token = credentials.credentials
 
-    print("RAW TOKEN", token)
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         if payload.get("type") != "access":
             raise HTTPException(status_code=401, detail="Invalid token type")
         
-        user_id: str | None = payload.get("sub")
+        user_id = int(payload.get("sub") or 0)
         if not user_id:
             raise HTTPException(status_code=401, detail="Invalid token")
         
-    except JWTError:
+    except (JWTError, ValueError):
         raise HTTPException(status_code=401,detail="Invalid Token")   
 
-    user = db.get(User, int(user_id))
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-    
+    if settings.AUTH_MODE == "db":
+        user = db.get(User, user_id)
+    else:
+        user = _user_cache.get(user_id)
+        if user is None:
+            user = _load_principal(db, user_id)
+            if user is not None:
+                _user_cache.set(user_id, user)
+
     if not user or not user.is_active:
         raise HTTPException(status_code=401, detail="User Not Found") 
+
+    # Tokens issued before token_version existed carry no "ver" claim
+    if payload.get("ver", 0) != (user.token_version or 0):
+        raise HTTPException(status_code=401, detail="Token has been revoked")
     
     return user
+
+
+# Revocation: deactivating a user, changing their password, role or tenant
+# bumps token_version, and cached auth state for any flushed user is dropped
+# once the transaction commits. Other processes pick the change up within
+# AUTH_USER_CACHE_TTL_SECONDS; bulk query.update() calls bypass these hooks.
+
+_REVOKING_ATTRIBUTES = ("hashed_password", "role", "tenant_id")
+
+
+@event.listens_for(Session, "before_flush")
+def _revoke_tokens_on_credential_change(session: Session, flush_context, instances) -> None:
+    for obj in session.dirty:
+        if not isinstance(obj, User):
+            continue
+        state = inspect(obj)
+        if state.attrs.token_version.history.has_changes():
+            continue
+        deactivated = state.attrs.is_active.history.has_changes() and not obj.is_active
+        if deactivated or any(state.attrs[name].history.has_changes() for name in _REVOKING_ATTRIBUTES):
+            revoke_user_tokens(obj)
+
+
+# Users changed or deleted in a transaction drop their cached auth state once it commits
+invalidate_on_commit((User,), "auth_user_ids", invalidate_user_auth, key=attrgetter("id"), include_new=False)
+
      
 def require_super_admin(
         current_user: User = Depends(get_current_user),
@@ -135,12 +234,3 @@ def get_tanant_scope(
         )
     
     return current_user.tenant_id
-   
-
-#for production
-# pwd_context = CryptContext(
-#     schemes=["argon2"],
-#     argon2__time_cost=3,
-#     argon2__memory_cost=65536,  # 64 MB
-#     argon2__parallelism=2,
-# )
\ No newline at end of file
@@ -0,0 +1,106 @@
+"""
+app/utils/cache.py
+Small in-process caches
+"""
+import threading
+import time
+from collections import OrderedDict
+from operator import attrgetter
+from typing import Any, Callable, Hashable, Optional, Tuple, Type
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries also expire after ttl seconds.
+
+    Per-process only: other workers keep their own copies, so anything cached
+    here must tolerate up to ttl seconds of staleness once another process
+    changes the underlying rows.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING or entry[0] < time.monotonic():
+                if entry is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        """Cached value, computing and storing it on a miss (factory runs outside the lock)"""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = factory()
+            self.set(key, value)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._data), "hits": self.hits, "misses": self.misses}
+
+
+def invalidate_on_commit(
+    models: Tuple[Type, ...],
+    info_key: str,
+    invalidate: Callable[[Hashable], None],
+    key: Callable[[Any], Hashable] = attrgetter("tenant_id"),
+    include_new: bool = True
+) -> None:
+    """
+    Keep a per-process cache in step with committed writes: remember the
+    key (tenant_id by default) of every instance of models flushed in a
+    transaction under session.info[info_key], call invalidate(key) for each
+    once the transaction commits and forget them on rollback. Bulk
+    query.update()/delete() calls bypass these hooks and are covered by the
+    cache TTL.
+    """
+    def _collect(session: Session, flush_context) -> None:
+        changed = (*session.new, *session.dirty, *session.deleted) if include_new else (*session.dirty, *session.deleted)
+        for obj in changed:
+            if isinstance(obj, models):
+                session.info.setdefault(info_key, set()).add(key(obj))
+
+    def _invalidate(session: Session) -> None:
+        for changed_key in session.info.pop(info_key, ()):
+            invalidate(changed_key)
+
+    def _discard(session: Session) -> None:
+        session.info.pop(info_key, None)
+
+    event.listen(Session, "after_flush", _collect)
+    event.listen(Session, "after_commit", _invalidate)
+    event.listen(Session, "after_rollback", _discard)
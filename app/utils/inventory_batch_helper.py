@@ -1,5 +1,7 @@
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
+from typing import Optional
 from app.models.inventory import Inventory, InventoryBatch, PerishableLifecycle
+from sqlalchemy import case, cast, func, literal, null
 from sqlalchemy.orm import Session
 
 
@@ -37,6 +39,50 @@ def determine_lifecycle_stage(
     else:
         return PerishableLifecycle.FRESH
 
+def next_lifecycle_transition(
+    expiry_date: Optional[date],
+    fresh_threshold: int = 3,
+    today: Optional[date] = None
+) -> Optional[date]:
+    """
+    First date on which determine_lifecycle_stage returns a different stage
+
+    FRESH -> NEAR_EXPIRY on expiry_date - fresh_threshold,
+    NEAR_EXPIRY -> EXPIRED the day after expiry_date, None once expired.
+    """
+    if not expiry_date:
+        return None
+
+    days_until_expiry = (expiry_date - (today or date.today())).days
+    if days_until_expiry < 0:
+        return None
+    if days_until_expiry > fresh_threshold:
+        return expiry_date - timedelta(days=fresh_threshold)
+    return expiry_date + timedelta(days=1)
+
+def lifecycle_stage_expression(today: date):
+    """SQL equivalent of determine_lifecycle_stage over InventoryBatch joined to Inventory"""
+    fresh_threshold = func.coalesce(Inventory.fresh_threshold_days, 3)
+    stage_type = InventoryBatch.lifecycle_stage.type
+    # CASE over bare string literals yields text, which PostgreSQL will not assign to an enum
+    return cast(case(
+        (InventoryBatch.expiry_date < today, literal(PerishableLifecycle.EXPIRED, stage_type)),
+        (
+            InventoryBatch.expiry_date - fresh_threshold <= today,
+            literal(PerishableLifecycle.NEAR_EXPIRY, stage_type)
+        ),
+        else_=literal(PerishableLifecycle.FRESH, stage_type)
+    ), stage_type)
+
+def next_lifecycle_transition_expression(today: date):
+    """SQL equivalent of next_lifecycle_transition over InventoryBatch joined to Inventory"""
+    fresh_threshold = func.coalesce(Inventory.fresh_threshold_days, 3)
+    return case(
+        (InventoryBatch.expiry_date < today, null()),
+        (InventoryBatch.expiry_date - fresh_threshold > today, InventoryBatch.expiry_date - fresh_threshold),
+        else_=InventoryBatch.expiry_date + 1
+    )
+
 def update_batch_lifecycle(batch: InventoryBatch, item: Inventory):
     """Update batch lifecycle stage based on current date"""
     if not batch.expiry_date:
@@ -49,6 +95,10 @@ def update_batch_lifecycle(batch: InventoryBatch, item: Inventory):
         item.fresh_threshold_days or 3,
         item.near_expiry_threshold_days or 1
     )
+    batch.next_lifecycle_transition = next_lifecycle_transition(
+        batch.expiry_date,
+        item.fresh_threshold_days or 3
+    )
 
 def generate_batch_number_sequential(
     item_id: int,
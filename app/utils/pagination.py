@@ -0,0 +1,87 @@
+"""
+app/utils/pagination.py
+Keyset (cursor) pagination helpers
+
+A page is fetched with WHERE (sort columns) < (last row's values) instead of
+OFFSET, so every page costs the same index range scan and no total count is
+needed. The cursor handed to clients is the last row's sort key, encoded as
+URL-safe base64 JSON.
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.sql.elements import ColumnElement
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[ColumnElement]) -> tuple:
+    """Cursor values converted to the columns' Python types; ValueError when malformed"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+    if not isinstance(payload, list) or len(payload) != len(columns):
+        raise ValueError("Invalid cursor")
+
+    values = []
+    for column, value in zip(columns, payload):
+        python_type = column.type.python_type
+        try:
+            if python_type in (datetime, date):
+                values.append(python_type.fromisoformat(value))
+            else:
+                values.append(python_type(value))
+        except (ValueError, TypeError) as e:
+            raise ValueError("Invalid cursor") from e
+    return tuple(values)
+
+
+def keyset_paginate(
+    statement: Select,
+    columns: Sequence[ColumnElement],
+    cursor: Optional[str],
+    limit: int,
+    descending: bool = True
+) -> Select:
+    """
+    Order the statement by columns (which must end in a unique column and
+    be non-null), continue after cursor, and fetch one extra row to detect
+    whether another page exists.
+    """
+    if cursor:
+        key, values = tuple_(*columns), tuple_(*decode_cursor(cursor, columns))
+        statement = statement.where(key < values if descending else key > values)
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    return statement.order_by(None).order_by(*order).limit(limit + 1)
+
+
+@dataclass
+class Page:
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    limit: int = DEFAULT_PAGE_SIZE
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Any], limit: int, key_names: Sequence[str]) -> "Page":
+        """Trim the look-ahead row fetched by keyset_paginate and build the next cursor"""
+        items = list(rows[:limit])
+        next_cursor = None
+        if len(rows) > limit and items:
+            last = items[-1]
+            next_cursor = encode_cursor([getattr(last, name) for name in key_names])
+        return cls(items=items, next_cursor=next_cursor, limit=limit)
+
@@ -0,0 +1,142 @@
+"""
+app/utils/time_windows.py
+Half-open [start, end) timestamp windows over local calendar days
+"""
+import logging
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from sqlalchemy import and_
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAX_WINDOW_DAYS = 366
+
+# Accepted by parse_period (the `period` query parameter of the reports)
+PERIODS = ("today", "yesterday", "this_week", "last_week", "last_<n>_days")
+_LAST_N_DAYS = re.compile(r"last_(\d+)_days")
+
+
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo for an IANA name; settings.DEFAULT_TIMEZONE when unset or unknown"""
+    if name:
+        try:
+            return ZoneInfo(name)
+        except (ZoneInfoNotFoundError, ValueError):
+            logger.warning(f"Unknown timezone {name!r}, using {settings.DEFAULT_TIMEZONE}")
+    return ZoneInfo(settings.DEFAULT_TIMEZONE)
+
+
+def to_utc(moment: datetime, zone: ZoneInfo) -> datetime:
+    """Aware UTC datetime; naive datetimes are read as wall-clock time in zone"""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=zone)
+    return moment.astimezone(timezone.utc)
+
+
+def local_midnight(day: date, zone: ZoneInfo) -> datetime:
+    """Start of day in zone, as aware UTC"""
+    return to_utc(datetime.combine(day, time.min), zone)
+
+
+def local_today(zone: ZoneInfo, now: Optional[datetime] = None) -> date:
+    return (now or datetime.now(timezone.utc)).astimezone(zone).date()
+
+
+@dataclass(frozen=True)
+class TimeWindow:
+    """
+    [start, end) as aware UTC datetimes, covering whole local days of zone.
+
+    clause(column) is a bare range on the column (column >= start AND
+    column < end), so an index on (tenant_id, column) serves it; filters
+    such as date(column) = today or column AT TIME ZONE ... would not.
+    Consecutive windows share a bound and never double count.
+    """
+    start: datetime
+    end: datetime
+    zone: ZoneInfo
+
+    @classmethod
+    def for_days(cls, first_day: date, days: int, zone: ZoneInfo) -> "TimeWindow":
+        """days local calendar days starting with first_day (DST days are 23 or 25 hours)"""
+        if not 1 <= days <= MAX_WINDOW_DAYS:
+            raise ValueError(f"A window covers 1 to {MAX_WINDOW_DAYS} days")
+        return cls(local_midnight(first_day, zone), local_midnight(first_day + timedelta(days=days), zone), zone)
+
+    @property
+    def first_day(self) -> date:
+        return self.start.astimezone(self.zone).date()
+
+    @property
+    def last_day(self) -> date:
+        """Last local day in the window (end is exclusive)"""
+        return (self.end.astimezone(self.zone) - timedelta(microseconds=1)).date()
+
+    @property
+    def days(self) -> int:
+        return (self.last_day - self.first_day).days + 1
+
+    def clause(self, column):
+        return and_(column >= self.start, column < self.end)
+
+    def describe(self) -> dict:
+        """Window as reported back to API clients"""
+        return {
+            "timezone": self.zone.key,
+            "start": self.start.astimezone(self.zone),
+            "end": self.end.astimezone(self.zone),
+            "first_day": self.first_day,
+            "last_day": self.last_day
+        }
+
+
+def today(zone: ZoneInfo, now: Optional[datetime] = None) -> TimeWindow:
+    return TimeWindow.for_days(local_today(zone, now), 1, zone)
+
+
+def yesterday(zone: ZoneInfo, now: Optional[datetime] = None) -> TimeWindow:
+    return TimeWindow.for_days(local_today(zone, now) - timedelta(days=1), 1, zone)
+
+
+def last_n_days(zone: ZoneInfo, days: int, now: Optional[datetime] = None) -> TimeWindow:
+    """The last days local days, today included"""
+    return TimeWindow.for_days(local_today(zone, now) - timedelta(days=days - 1), days, zone)
+
+
+def this_week(zone: ZoneInfo, now: Optional[datetime] = None) -> TimeWindow:
+    """Monday to Sunday of the current local week"""
+    day = local_today(zone, now)
+    return TimeWindow.for_days(day - timedelta(days=day.weekday()), 7, zone)
+
+
+def last_week(zone: ZoneInfo, now: Optional[datetime] = None) -> TimeWindow:
+    day = local_today(zone, now)
+    return TimeWindow.for_days(day - timedelta(days=day.weekday() + 7), 7, zone)
+
+
+def parse_period(period: str, zone: ZoneInfo, now: Optional[datetime] = None) -> TimeWindow:
+    """
+    Window for a named period: today, yesterday, this_week, last_week or
+    last_<n>_days. Raises ValueError for anything else.
+    """
+    period = period.strip().lower()
+    if period == "today":
+        return today(zone, now)
+    if period == "yesterday":
+        return yesterday(zone, now)
+    if period == "this_week":
+        return this_week(zone, now)
+    if period == "last_week":
+        return last_week(zone, now)
+
+    match = _LAST_N_DAYS.fullmatch(period)
+    if match:
+        return last_n_days(zone, int(match.group(1)), now)
+
+    raise ValueError(f"Unknown period {period!r}; expected one of {', '.join(PERIODS)}")
@@ -0,0 +1,131 @@
+"""
+benchmarks/auth_principal.py
+Authentications per second: loading the user per request vs the stateless principal.
+
+N worker threads (standing in for the FastAPI threadpool) resolve the same
+bearer token the way an authenticated request does: open a session as
+get_db would, call get_current_user, close the session. The run is
+repeated with AUTH_MODE="db" and AUTH_MODE="stateless", and the script reports
+throughput, latency and pool checkouts per request for each.
+
+Run against a scratch PostgreSQL database (it creates and deletes its own tenant and user):
+
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.auth_principal --workers 8 --seconds 10
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db.session import SessionLocal, engine
+from app.models.tenants import Tenant
+from app.models.users import User, UserRole
+from app.utils.auth_helper import create_access_token, get_current_user, invalidate_user_auth
+
+
+def seed() -> dict:
+    db = SessionLocal()
+    try:
+        tenant = Tenant(tenant_name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add(tenant)
+        db.flush()
+
+        user = User(tenant_id=tenant.tenant_id, email=f"bench-{uuid.uuid4().hex[:8]}@example.test",
+                    full_name="Bench User", role=UserRole.INVENTORY_CLERK, is_active=True)
+        db.add(user)
+        db.commit()
+
+        token = create_access_token({
+            "sub": str(user.id),
+            "role": user.role.value,
+            "tenant_id": str(tenant.tenant_id),
+            "ver": user.token_version or 0,
+        })
+        return {"tenant_id": tenant.tenant_id, "user_id": user.id, "token": token}
+    finally:
+        db.close()
+
+
+def cleanup(ids: dict) -> None:
+    db = SessionLocal()
+    try:
+        db.query(User).filter(User.id == ids["user_id"]).delete(synchronize_session=False)
+        db.query(Tenant).filter(Tenant.tenant_id == ids["tenant_id"]).delete(synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(mode: str, token: str, workers: int, seconds: float) -> dict:
+    settings.AUTH_MODE = mode
+    invalidate_user_auth()
+    credentials = HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+    checkouts = [0]
+    lock = threading.Lock()
+
+    def on_checkout(*args):
+        with lock:
+            checkouts[0] += 1
+
+    latencies = [[] for _ in range(workers)]
+    deadline = time.perf_counter() + seconds
+
+    def worker(index: int) -> None:
+        samples = latencies[index]
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            db = SessionLocal()
+            try:
+                get_current_user(credentials=credentials, db=db)
+            finally:
+                db.close()
+            samples.append(time.perf_counter() - started)
+
+    event.listen(engine, "checkout", on_checkout)
+    try:
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(workers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        event.remove(engine, "checkout", on_checkout)
+
+    samples = sorted(sample for per_worker in latencies for sample in per_worker)
+    return {
+        "requests": len(samples),
+        "rps": len(samples) / elapsed,
+        "p50_ms": statistics.median(samples) * 1000,
+        "p99_ms": samples[int(len(samples) * 0.99) - 1] * 1000,
+        "checkouts_per_request": checkouts[0] / len(samples),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    ids = seed()
+    try:
+        results = {mode: run(mode, ids["token"], args.workers, args.seconds) for mode in ("db", "stateless")}
+    finally:
+        cleanup(ids)
+
+    for mode, result in results.items():
+        print(f"{mode:10} {result['rps']:10.1f} req/s  p50={result['p50_ms']:.3f}ms p99={result['p99_ms']:.3f}ms "
+              f"checkouts/request={result['checkouts_per_request']:.3f}  ({result['requests']} requests)")
+    print(f"speedup:   {results['stateless']['rps'] / results['db']['rps']:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
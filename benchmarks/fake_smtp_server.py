@@ -0,0 +1,113 @@
+"""
+benchmarks/fake_smtp_server.py
+Minimal local SMTP sink for exercising the notification transport.
+
+Speaks enough ESMTP for smtplib (EHLO/HELO, AUTH PLAIN/LOGIN, MAIL, RCPT,
+DATA, RSET, NOOP, QUIT), accepts every message and counts it. It does not
+offer STARTTLS; --connect-delay-ms and --auth-delay-ms stand in for the
+handshake and login round trips of a real provider.
+
+    python -m benchmarks.fake_smtp_server --port 2525 --connect-delay-ms 40
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def _reply(self, line: str) -> None:
+        self.wfile.write((line + "\r\n").encode())
+
+    def handle(self) -> None:
+        server = self.server
+        time.sleep(server.connect_delay)
+        self._reply("220 fake-smtp ready")
+
+        while True:
+            raw = self.rfile.readline()
+            if not raw:
+                return
+            command = raw.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+
+            if verb == "EHLO":
+                self._reply("250-fake-smtp")
+                self._reply("250-AUTH PLAIN LOGIN")
+                self._reply("250 8BITMIME")
+            elif verb == "HELO":
+                self._reply("250 fake-smtp")
+            elif verb == "AUTH":
+                time.sleep(server.auth_delay)
+                parts = command.split()
+                if len(parts) >= 2 and parts[1].upper() == "LOGIN":
+                    # username and password prompts
+                    if len(parts) == 2:
+                        self._reply("334 VXNlcm5hbWU6")
+                        self.rfile.readline()
+                    self._reply("334 UGFzc3dvcmQ6")
+                    self.rfile.readline()
+                elif len(parts) == 2:
+                    self._reply("334 ")
+                    self.rfile.readline()
+                self._reply("235 Authentication successful")
+            elif verb in ("MAIL", "RCPT", "RSET", "NOOP"):
+                self._reply("250 OK")
+            elif verb == "DATA":
+                self._reply("354 End data with <CR><LF>.<CR><LF>")
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line in (b".\r\n", b".\n"):
+                        break
+                server.record_message()
+                self._reply("250 Queued")
+            elif verb == "QUIT":
+                self._reply("221 Bye")
+                return
+            else:
+                self._reply("502 Command not implemented")
+
+
+class FakeSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0,
+                 connect_delay_ms: float = 0, auth_delay_ms: float = 0):
+        super().__init__((host, port), _Handler)
+        self.connect_delay = connect_delay_ms / 1000
+        self.auth_delay = auth_delay_ms / 1000
+        self.messages = 0
+        self._lock = threading.Lock()
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def record_message(self) -> None:
+        with self._lock:
+            self.messages += 1
+
+    def start_background(self) -> "FakeSMTPServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=2525)
+    parser.add_argument("--connect-delay-ms", type=float, default=0)
+    parser.add_argument("--auth-delay-ms", type=float, default=0)
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(args.host, args.port, args.connect_delay_ms, args.auth_delay_ms)
+    print(f"fake SMTP listening on {args.host}:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"received {server.messages} messages")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+benchmarks/inventory_search.py
+Latency benchmark for inventory name lookups over a large catalogue.
+
+Seeds one throwaway tenant with N inventory items (100k by default) named
+from a small vocabulary, then times the old unindexed lookup
+(name ILIKE '%q%', unranked) against SearchService's ranked trigram lookup
+for a mix of full words, prefixes as typed into a POS search box, and
+misspellings. Prints p50/p95 per query kind and, with --explain, the plan
+of one lookup so index use can be confirmed.
+
+Run against a scratch PostgreSQL database migrated to head (it creates and
+deletes its own tenant):
+
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.inventory_search --items 100000
+"""
+import argparse
+import random
+import statistics
+import time
+import uuid
+
+from sqlalchemy import delete, insert, select, text
+
+from app.db.session import SessionLocal
+from app.models.inventory import Inventory
+from app.models.tenants import Tenant
+from app.services.inventory_service import InventoryService
+
+WORDS = (
+    "tomato", "onion", "garlic", "ginger", "potato", "carrot", "spinach", "paneer", "chicken", "mutton",
+    "basmati", "rice", "flour", "butter", "cream", "yogurt", "cumin", "coriander", "turmeric", "chilli",
+    "cardamom", "cinnamon", "pepper", "mustard", "lentil", "chickpea", "coconut", "cashew", "almond", "saffron",
+)
+QUERIES = {
+    "word": ("tomato", "paneer", "cardamom", "basmati rice"),
+    "prefix": ("to", "pan", "card", "basm"),
+    "typo": ("tomatoe", "panner", "cardamon", "cinamon"),
+}
+
+
+def seed(items: int, seed_value: int) -> uuid.UUID:
+    rng = random.Random(seed_value)
+    db = SessionLocal()
+    try:
+        tenant = Tenant(tenant_name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add(tenant)
+        db.flush()
+        tenant_id = tenant.tenant_id
+
+        for start in range(0, items, 5000):
+            db.execute(insert(Inventory), [
+                {
+                    "tenant_id": tenant_id,
+                    "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+                    "type": rng.choice(("vegetable", "dairy", "spice", "grain", "meat")),
+                    "quantity": 1,
+                    "is_active": True,
+                }
+                for i in range(start, min(start + 5000, items))
+            ])
+        db.commit()
+        db.execute(text("ANALYZE inventory"))
+        db.commit()
+        return tenant_id
+    finally:
+        db.close()
+
+
+def cleanup(tenant_id: uuid.UUID) -> None:
+    db = SessionLocal()
+    try:
+        db.execute(delete(Inventory).where(Inventory.tenant_id == tenant_id))
+        db.execute(delete(Tenant).where(Tenant.tenant_id == tenant_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def legacy_statement(tenant_id: uuid.UUID, query: str, limit: int):
+    return (
+        select(Inventory.id, Inventory.name)
+        .where(Inventory.tenant_id == tenant_id, Inventory.is_active == True, Inventory.name.ilike(f"%{query}%"))
+        .limit(limit)
+    )
+
+
+def lookup_statement(tenant_id: uuid.UUID, query: str, limit: int):
+    return InventoryService.lookup_statement(tenant_id, query, limit, fields=["id", "name"])
+
+
+def time_queries(build, tenant_id: uuid.UUID, limit: int, repeats: int) -> dict:
+    db = SessionLocal()
+    try:
+        results = {}
+        for kind, queries in QUERIES.items():
+            samples, hits = [], 0
+            for _ in range(repeats):
+                for query in queries:
+                    started = time.perf_counter()
+                    rows = db.execute(build(tenant_id, query, limit)).all()
+                    samples.append(time.perf_counter() - started)
+                    hits += bool(rows)
+            samples.sort()
+            results[kind] = {
+                "p50_ms": statistics.median(samples) * 1000,
+                "p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000,
+                "hit_rate": hits / len(samples),
+            }
+        return results
+    finally:
+        db.close()
+
+
+def explain(tenant_id: uuid.UUID, query: str, limit: int) -> str:
+    db = SessionLocal()
+    try:
+        compiled = lookup_statement(tenant_id, query, limit).compile(
+            dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+        )
+        return "\n".join(row[0] for row in db.execute(text(f"EXPLAIN ANALYZE {compiled}")))
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--items", type=int, default=100_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--explain", action="store_true", help="print the plan of one lookup")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    tenant_id = seed(args.items, args.seed)
+    print(f"seeded {args.items} items in {time.perf_counter() - started:.1f}s")
+    try:
+        for label, build in (("ILIKE '%q%'", legacy_statement), ("trigram lookup", lookup_statement)):
+            print(label)
+            for kind, r in time_queries(build, tenant_id, args.limit, args.repeats).items():
+                print(f"  {kind:7} p50={r['p50_ms']:7.2f}ms p95={r['p95_ms']:7.2f}ms hit_rate={r['hit_rate']:.2f}")
+        if args.explain:
+            print(explain(tenant_id, "tomatoe", args.limit))
+    finally:
+        cleanup(tenant_id)
+
+
+if __name__ == "__main__":
+    main()
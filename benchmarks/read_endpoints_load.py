@@ -0,0 +1,89 @@
+"""
+benchmarks/read_endpoints_load.py
+Closed-loop load test for the read-heavy endpoints.
+
+C concurrent clients each loop over the read endpoints (inventory list and
+search, alerts, dish history and today's report) with one bearer token
+for the given duration, then the script prints throughput, latency
+percentiles and error counts per endpoint. Point it at a running API
+before and after a change to compare them:
+
+    uvicorn app.main:app --workers 1 &
+    python -m benchmarks.read_endpoints_load --base-url http://127.0.0.1:8000 \\
+        --token "$TOKEN" --clients 200 --seconds 30
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import defaultdict
+
+import httpx
+
+ENDPOINTS = (
+    "/api/v1/inventory/",
+    "/api/v1/inventory/search?name=a",
+    "/api/v1/alerts/",
+    "/api/v1/alerts/active",
+    "/api/v1/alerts/stats",
+    "/api/v1/dish/history?limit=50",
+    "/api/v1/dish/today-report",
+)
+
+
+async def client_loop(client: httpx.AsyncClient, offset: int, deadline: float, results: dict) -> None:
+    index = offset
+    while time.perf_counter() < deadline:
+        path = ENDPOINTS[index % len(ENDPOINTS)]
+        index += 1
+        started = time.perf_counter()
+        try:
+            response = await client.get(path)
+            ok = response.status_code == 200
+        except httpx.HTTPError:
+            ok = False
+        elapsed = time.perf_counter() - started
+        results[path]["latencies"].append(elapsed)
+        if not ok:
+            results[path]["errors"] += 1
+
+
+def percentile(samples: list, fraction: float) -> float:
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def run(base_url: str, token: str, clients: int, seconds: float) -> None:
+    results = defaultdict(lambda: {"latencies": [], "errors": 0})
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {token}"},
+                                 limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop(client, i, deadline, results) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(r["latencies"]) for r in results.values())
+    errors = sum(r["errors"] for r in results.values())
+    print(f"{clients} clients, {elapsed:.1f}s: {total / elapsed:.1f} req/s, {total} requests, {errors} errors")
+    for path in ENDPOINTS:
+        samples = sorted(results[path]["latencies"])
+        if not samples:
+            continue
+        print(f"  {path:36} {len(samples) / elapsed:8.1f} req/s  p50={statistics.median(samples) * 1000:7.1f}ms "
+              f"p95={percentile(samples, 0.95) * 1000:7.1f}ms p99={percentile(samples, 0.99) * 1000:7.1f}ms "
+              f"errors={results[path]['errors']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--token", required=True, help="access token of a tenant user")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=30)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.base_url, args.token, args.clients, args.seconds))
+
+
+if __name__ == "__main__":
+    main()
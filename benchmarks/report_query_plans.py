@@ -0,0 +1,200 @@
+"""
+benchmarks/report_query_plans.py
+Query-plan regression check for the time-windowed report and history queries.
+
+Seeds one throwaway tenant with a year of preparation logs and alerts
+(200k / 50k by default), rebuilds its production rollup and runs
+EXPLAIN (FORMAT JSON) on the statements behind the reports for windows from
+app.utils.time_windows (today, last 7 / 30 days, this week). Each check
+names the table it reads and the indexes allowed to serve it; a Seq Scan on
+that table, or none of the indexes in the plan, fails the check and the
+script exits 1. The old date(preparation_date) = today filter is explained
+too, for contrast, without being checked.
+
+Run against a scratch PostgreSQL database migrated to head (it creates and
+deletes its own tenant):
+
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.report_query_plans --timezone Asia/Kolkata
+"""
+import argparse
+import json
+import random
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, insert, select, text
+
+from app.db.session import SessionLocal
+from app.models.dish import Dish, DishPreparationBatchLog, DishProductionRollup
+from app.models.inventory import AlertStatus, AlertType, InventoryAlert
+from app.models.tenants import Tenant
+from app.services.dish_service import DishPreparationService
+from app.services.production_rollup_service import ProductionRollupService
+from app.utils.time_windows import get_zone, last_n_days, local_today, this_week, today
+
+LOG_INDEXES = {"ix_dish_prep_logs_tenant_date_id"}
+ALERT_INDEXES = {"ix_inventory_alert_tenant_alert_date"}
+ROLLUP_INDEXES = {"dish_production_rollups_pkey", "ix_dish_production_rollups_tenant_dish_bucket"}
+
+
+def seed(logs: int, alerts: int, dishes: int, seed_value: int) -> tuple:
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    year = 365 * 24 * 3600
+    db = SessionLocal()
+    try:
+        tenant = Tenant(tenant_name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add(tenant)
+        db.flush()
+        tenant_id = tenant.tenant_id
+
+        dish_ids = list(db.execute(insert(Dish).returning(Dish.id), [
+            {"tenant_id": tenant_id, "name": f"bench dish {i}", "is_active": True} for i in range(dishes)
+        ]).scalars())
+
+        for start in range(0, logs, 5000):
+            db.execute(insert(DishPreparationBatchLog), [
+                {
+                    "tenant_id": tenant_id,
+                    "dish_id": rng.choice(dish_ids),
+                    "quantity_prepared": rng.randint(1, 20),
+                    "total_cost": rng.randint(50, 2000),
+                    "preparation_date": now - timedelta(seconds=rng.randrange(year)),
+                }
+                for _ in range(start, min(start + 5000, logs))
+            ])
+        for start in range(0, alerts, 5000):
+            db.execute(insert(InventoryAlert), [
+                {
+                    "tenant_id": tenant_id,
+                    "alert_type": rng.choice(list(AlertType)),
+                    "status": AlertStatus.RESOLVED,
+                    "priority": rng.choice(("low", "medium", "high")),
+                    "alert_date": now - timedelta(seconds=rng.randrange(year)),
+                }
+                for _ in range(start, min(start + 5000, alerts))
+            ])
+        ProductionRollupService.rebuild(db, tenant_id, now - timedelta(days=366), now + timedelta(days=1))
+        db.commit()
+
+        for table in ("dish_preparation_batch_logs", "inventory_alert", "dish_production_rollups"):
+            db.execute(text(f"ANALYZE {table}"))
+        db.commit()
+        return tenant_id, dish_ids
+    finally:
+        db.close()
+
+
+def cleanup(tenant_id: uuid.UUID) -> None:
+    db = SessionLocal()
+    try:
+        for model in (DishProductionRollup, DishPreparationBatchLog, InventoryAlert, Dish):
+            db.execute(delete(model).where(model.tenant_id == tenant_id))
+        db.execute(delete(Tenant).where(Tenant.tenant_id == tenant_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def alert_stats_statement(tenant_id: uuid.UUID, window):
+    """As GET /alerts/stats?period=..."""
+    return select(
+        InventoryAlert.alert_type,
+        InventoryAlert.status,
+        func.count(InventoryAlert.id)
+    ).where(
+        InventoryAlert.tenant_id == tenant_id,
+        window.clause(InventoryAlert.alert_date)
+    ).group_by(InventoryAlert.alert_type, InventoryAlert.status)
+
+
+def checks(tenant_id: uuid.UUID, dish_id: int, zone) -> list:
+    """(label, statement, table, allowed indexes)"""
+    day, week, month = today(zone), last_n_days(zone, 7), last_n_days(zone, 30)
+    history = DishPreparationService.preparation_history_statement
+    rollup = ProductionRollupService
+    return [
+        ("history today", history(tenant_id, start_date=day.start, end_date=day.end),
+         "dish_preparation_batch_logs", LOG_INDEXES),
+        ("history last 7 days, one dish", history(tenant_id, dish_id=dish_id, start_date=week.start, end_date=week.end),
+         "dish_preparation_batch_logs", LOG_INDEXES),
+        ("history this week", history(tenant_id, start_date=this_week(zone).start, end_date=this_week(zone).end),
+         "dish_preparation_batch_logs", LOG_INDEXES),
+        ("alert stats today", alert_stats_statement(tenant_id, day), "inventory_alert", ALERT_INDEXES),
+        ("alert stats last 7 days", alert_stats_statement(tenant_id, week), "inventory_alert", ALERT_INDEXES),
+        ("report totals today", rollup.totals_statement(tenant_id, day.start, day.end),
+         "dish_production_rollups", ROLLUP_INDEXES),
+        ("report by dish today", rollup.by_dish_statement(tenant_id, day.start, day.end),
+         "dish_production_rollups", ROLLUP_INDEXES),
+        ("report peak hours today", rollup.peak_hours_statement(tenant_id, day.start, day.end, zone=zone),
+         "dish_production_rollups", ROLLUP_INDEXES),
+        ("dish statistics last 30 days", rollup.totals_statement(tenant_id, month.start, month.end, dish_id=dish_id),
+         "dish_production_rollups", ROLLUP_INDEXES),
+    ]
+
+
+def plan_nodes(node: dict):
+    yield node
+    for child in node.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def explain(db, statement) -> dict:
+    compiled = statement.compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]["Plan"]
+
+
+def check_plan(plan: dict, table: str, indexes: set) -> tuple:
+    """(ok, scans of table as 'Node Type [index]')"""
+    # Bitmap Index Scan nodes name the index but not the table
+    scans = [
+        node for node in plan_nodes(plan)
+        if node.get("Relation Name") == table or node.get("Index Name") in indexes
+    ]
+    described = [f"{node['Node Type']} [{node.get('Index Name', '-')}]" for node in scans]
+    ok = (
+        not any(node["Node Type"] == "Seq Scan" for node in scans)
+        and any(node.get("Index Name") in indexes for node in scans)
+    )
+    return ok, described
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--logs", type=int, default=200_000)
+    parser.add_argument("--alerts", type=int, default=50_000)
+    parser.add_argument("--dishes", type=int, default=200)
+    parser.add_argument("--timezone", default="UTC", help="IANA zone the windows are built in")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    zone = get_zone(args.timezone)
+    tenant_id, dish_ids = seed(args.logs, args.alerts, args.dishes, args.seed)
+    print(f"seeded {args.logs} logs, {args.alerts} alerts; windows in {zone.key}")
+    failures = 0
+    db = SessionLocal()
+    try:
+        for label, statement, table, indexes in checks(tenant_id, dish_ids[0], zone):
+            ok, scans = check_plan(explain(db, statement), table, indexes)
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {label:32} {', '.join(scans) or 'no scan of ' + table}")
+
+        legacy = select(func.count(DishPreparationBatchLog.id)).where(
+            DishPreparationBatchLog.tenant_id == tenant_id,
+            func.date(DishPreparationBatchLog.preparation_date) == local_today(zone)
+        )
+        _, scans = check_plan(explain(db, legacy), "dish_preparation_batch_logs", LOG_INDEXES)
+        print(f"     {'(old) date(preparation_date) = today':32} {', '.join(scans)}")
+    finally:
+        db.close()
+        cleanup(tenant_id)
+
+    if failures:
+        print(f"{failures} plan check(s) failed")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+benchmarks/smtp_transport.py
+Messages per second: pooled SMTP sessions vs a connection per message.
+
+Starts the local fake SMTP server in-process and sends the same messages
+twice: once the way notifications used to go out (connect, EHLO, login,
+send, QUIT per email) and once through SMTPConnectionPool. Use the delay
+flags to model provider handshake and login latency.
+
+    python -m benchmarks.smtp_transport --messages 500 --connect-delay-ms 40 --auth-delay-ms 20
+"""
+import argparse
+import smtplib
+import time
+from email.mime.text import MIMEText
+
+from benchmarks.fake_smtp_server import FakeSMTPServer
+from app.services.smtp_transport import SMTPConnectionPool
+
+
+def build_messages(count: int) -> list:
+    messages = []
+    for i in range(count):
+        msg = MIMEText(f"<p>Alert {i}</p>", "html")
+        msg["From"] = "alerts@example.test"
+        msg["To"] = f"user{i % 20}@example.test"
+        msg["Subject"] = f"[HIGH] Expiry Warning {i}"
+        messages.append(msg)
+    return messages
+
+
+def per_message(port: int, messages: list) -> float:
+    started = time.perf_counter()
+    for msg in messages:
+        server = smtplib.SMTP("127.0.0.1", port)
+        server.login("bench", "bench")
+        server.send_message(msg)
+        server.quit()
+    return time.perf_counter() - started
+
+
+def pooled(port: int, messages: list, batch_size: int, pool_size: int) -> tuple:
+    pool = SMTPConnectionPool("127.0.0.1", port, "bench", "bench", use_starttls=False, size=pool_size)
+    started = time.perf_counter()
+    for start in range(0, len(messages), batch_size):
+        errors = [e for e in pool.send_messages(messages[start:start + batch_size]) if e is not None]
+        if errors:
+            raise RuntimeError(f"pooled send failed: {errors[0]}")
+    elapsed = time.perf_counter() - started
+    pool.close_all()
+    return elapsed, pool.stats()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--pool-size", type=int, default=2)
+    parser.add_argument("--connect-delay-ms", type=float, default=20)
+    parser.add_argument("--auth-delay-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    server = FakeSMTPServer(connect_delay_ms=args.connect_delay_ms, auth_delay_ms=args.auth_delay_ms).start_background()
+    messages = build_messages(args.messages)
+
+    baseline = per_message(server.port, messages)
+    pooled_seconds, stats = pooled(server.port, messages, args.batch_size, args.pool_size)
+    server.shutdown()
+
+    print(f"messages:            {args.messages} (server received {server.messages})")
+    print(f"per-message connect: {args.messages / baseline:9.1f} msg/s  ({baseline:.2f}s)")
+    print(f"pooled sessions:     {args.messages / pooled_seconds:9.1f} msg/s  ({pooled_seconds:.2f}s)")
+    print(f"speedup:             {baseline / pooled_seconds:9.1f}x")
+    print(f"pool: connects={stats['connects']} reconnects={stats['reconnects']} errors={stats['errors']} "
+          f"avg_send={stats['send_seconds_avg'] * 1000:.2f}ms max_send={stats['send_seconds_max'] * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+benchmarks/stock_contention.py
+Contention benchmark for the stock deduction path.
+
+N worker threads repeatedly prepare the same dish, which draws on a single
+shared ingredient, and the script reports throughput, latency and retries.
+It finishes by checking that the stock consumed in the database matches
+what the successful preparations recorded, so any overselling shows up.
+
+Run against a scratch PostgreSQL database (it creates and deletes its own tenant):
+
+    DATABASE_URL=postgresql+psycopg2://... python -m benchmarks.stock_contention --workers 16 --seconds 20
+"""
+import argparse
+import statistics
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import delete, func
+
+from app.db.session import SessionLocal
+from app.models.dish import Dish, DishIngredient, DishPreparationBatchLog, PreparationIngredientHistory
+from app.models.inventory import Inventory, InventoryBatch
+from app.models.tenants import Tenant
+from app.services.dish_service import DishPreparationService
+from app.services.stock_allocation_service import StockConflictError
+
+
+def seed(batches: int, batch_quantity: Decimal) -> dict:
+    db = SessionLocal()
+    try:
+        tenant = Tenant(tenant_name=f"bench-{uuid.uuid4().hex[:8]}")
+        db.add(tenant)
+        db.flush()
+
+        item = Inventory(tenant_id=tenant.tenant_id, name="bench-oil", unit="liter",
+                         current_quantity=batch_quantity * batches)
+        db.add(item)
+        db.flush()
+
+        db.add_all([
+            InventoryBatch(
+                tenant_id=tenant.tenant_id,
+                inventory_item_id=item.id,
+                batch_number=f"BENCH-{i:04d}",
+                quantity_received=batch_quantity,
+                quantity_remaining=batch_quantity,
+                unit_cost=Decimal("1.00"),
+                is_active=True
+            )
+            for i in range(batches)
+        ])
+
+        dish = Dish(tenant_id=tenant.tenant_id, name="bench-dish")
+        db.add(dish)
+        db.flush()
+        db.add(DishIngredient(tenant_id=tenant.tenant_id, dish_id=dish.id, ingredient_id=item.id,
+                              ingredient_name="bench-oil", quantity_required=0.5, unit="liter"))
+        db.commit()
+
+        return {"tenant_id": tenant.tenant_id, "item_id": item.id, "dish_id": dish.id,
+                "initial": batch_quantity * batches}
+    finally:
+        db.close()
+
+
+def cleanup(tenant_id) -> None:
+    db = SessionLocal()
+    try:
+        for model in (PreparationIngredientHistory, DishPreparationBatchLog, DishIngredient,
+                      Dish, InventoryBatch, Inventory):
+            db.execute(delete(model).where(model.tenant_id == tenant_id))
+        db.execute(delete(Tenant).where(Tenant.tenant_id == tenant_id))
+        db.commit()
+    finally:
+        db.close()
+
+
+def worker(ctx: dict, deadline: float, stats: dict, lock: threading.Lock) -> None:
+    db = SessionLocal()
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                DishPreparationService.prepare_dish(db, ctx["tenant_id"], ctx["dish_id"], 1, None)
+                outcome = "ok"
+            except StockConflictError:
+                outcome = "conflict"
+            except ValueError:
+                outcome = "insufficient"
+            finally:
+                db.rollback()
+            elapsed = time.perf_counter() - started
+
+            with lock:
+                stats[outcome] += 1
+                stats["latencies"].append(elapsed)
+            if outcome == "insufficient":
+                break
+    finally:
+        db.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--batches", type=int, default=20)
+    parser.add_argument("--batch-quantity", type=Decimal, default=Decimal("500"))
+    args = parser.parse_args()
+
+    ctx = seed(args.batches, args.batch_quantity)
+    stats = {"ok": 0, "conflict": 0, "insufficient": 0, "latencies": []}
+    lock = threading.Lock()
+
+    try:
+        deadline = time.perf_counter() + args.seconds
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=worker, args=(ctx, deadline, stats, lock))
+            for _ in range(args.workers)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - started
+
+        db = SessionLocal()
+        try:
+            remaining = db.query(func.coalesce(func.sum(InventoryBatch.quantity_remaining), 0)).filter(
+                InventoryBatch.inventory_item_id == ctx["item_id"]
+            ).scalar()
+            recorded = db.query(func.coalesce(func.sum(PreparationIngredientHistory.quantity_consumed), 0)).filter(
+                PreparationIngredientHistory.tenant_id == ctx["tenant_id"]
+            ).scalar()
+        finally:
+            db.close()
+
+        latencies = sorted(stats["latencies"]) or [0.0]
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if len(latencies) > 1 else latencies[0]
+        print(f"workers={args.workers} wall={wall:.2f}s")
+        print(f"prepared={stats['ok']} ({stats['ok'] / wall:.1f}/s) "
+              f"conflicts={stats['conflict']} insufficient={stats['insufficient']}")
+        print(f"latency p50={statistics.median(latencies) * 1000:.1f}ms p95={p95 * 1000:.1f}ms")
+
+        consumed = Decimal(ctx["initial"]) - Decimal(remaining)
+        status = "OK" if consumed == Decimal(recorded) and remaining >= 0 else "MISMATCH"
+        print(f"consumed={consumed} recorded={recorded} remaining={remaining} -> {status}")
+    finally:
+        cleanup(ctx["tenant_id"])
+
+
+if __name__ == "__main__":
+    main()